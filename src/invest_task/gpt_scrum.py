@@ -1,22 +1,22 @@
 """
 script to generate user stories
+
+usage:
+    python -m src.invest_task.gpt_scrum                         # sprint1.md
+    python -m src.invest_task.gpt_scrum --batch projects.txt    # one backlog per project
 """
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-USER_STORY_PROMPT = """
-create three INVEST user stories for a Social Media Sentiment Analysis project. 
-The project aims to analyze customer feedback and social media posts to understand public sentiment about products and services.
+import re
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
 
+INVEST_GUIDELINES = """
 for each story, follow these guidelines:
 1. Make it Independent - each story should be self-contained
 2. Make it Negotiable - leave room for discussion and refinement
@@ -29,7 +29,12 @@ format each story as:
 "As a [role], I want [goal] so that [benefit]"
 
 acceptance criteria should be specific and measurable.
-focus on these areas:
+"""
+
+USER_STORY_PROMPT = """
+create three INVEST user stories for a Social Media Sentiment Analysis project. 
+The project aims to analyze customer feedback and social media posts to understand public sentiment about products and services.
+""" + INVEST_GUIDELINES + """focus on these areas:
 - data collection and preprocessing
 - model training and evaluation
 - visualization and reporting
@@ -37,6 +42,13 @@ focus on these areas:
 - user interface
 """
 
+PROJECT_STORY_PROMPT = """
+create three INVEST user stories for the following project:
+{description}
+""" + INVEST_GUIDELINES
+
+CHECKPOINT_FILE = ".batch_checkpoint.jsonl"
+
 def get_gpt_response(prompt):
     """
     get response from GPT model.
@@ -48,7 +60,7 @@ def get_gpt_response(prompt):
     returns:
         dict: Response containing the content and token usage
     """
-    response = client.chat.completions.create(
+    response = get_gateway().chat(
         model="gpt-4o",
         messages=[
             {
@@ -76,10 +88,152 @@ def save_response_to_file(response, filename):
     with open(f"backlog/{filename}", "w", encoding="utf-8") as f:
         f.write(response["response"])
 
+def slugify(text, max_length=60):
+    slug = re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+    return slug[:max_length].rstrip("-") or "project"
+
+def load_projects(path):
+    """
+    read project descriptions from a file.
+
+    args:
+        path (str): .jsonl/.json with {"id", "description"} objects, or plain text
+            with one project per paragraph (blocks separated by blank lines)
+
+    returns:
+        list: dicts with a unique "id" and a "description". the id is a slug of the
+            given id (or the first line) plus a hash of the description, so it does
+            not depend on the order of the file and cannot clash with sprint1.md;
+            a project listed twice is returned once
+    """
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+
+    if path.suffix == ".jsonl":
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif path.suffix == ".json":
+        items = json.loads(text)
+    else:
+        items = [{"description": block.strip()} for block in re.split(r"\n\s*\n", text) if block.strip()]
+
+    projects, seen = [], set()
+    for item in items:
+        description = item["description"].strip()
+        digest = hashlib.sha256(description.encode("utf-8")).hexdigest()[:8]
+        project_id = f"{slugify(str(item.get('id') or description.splitlines()[0]), 50)}-{digest}"
+        if project_id in seen:
+            continue
+        seen.add(project_id)
+        projects.append({"id": project_id, "description": description})
+    return projects
+
+def load_checkpoint(out_dir):
+    """ids of projects whose backlog was already written by an earlier run"""
+    checkpoint = Path(out_dir) / CHECKPOINT_FILE
+    if not checkpoint.exists():
+        return set()
+
+    done = set()
+    with open(checkpoint, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line torn by a crash mid-write
+            if (Path(out_dir) / entry["file"]).exists():
+                done.add(entry["id"])
+    return done
+
+class RateLimiter:
+    """allow at most `requests_per_minute` calls, spaced evenly"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def generate_project_backlog(project, out_dir, limiter, semaphore, checkpoint):
+    """generate one backlog, write it to its own file, then record it in the checkpoint"""
+    async with semaphore:
+        await limiter.wait()
+        response = await get_gateway().achat(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": PROJECT_STORY_PROMPT.format(description=project["description"])}],
+            max_tokens=2000,
+            temperature=0.7
+        )
+
+    filename = f"{project['id']}.md"
+    tmp_path = Path(out_dir) / f".{filename}.tmp"
+    tmp_path.write_text(response.choices[0].message.content, encoding="utf-8")
+    os.replace(tmp_path, Path(out_dir) / filename)
+
+    checkpoint.write(json.dumps({"id": project["id"], "file": filename}) + "\n")
+    checkpoint.flush()
+    os.fsync(checkpoint.fileno())
+
+async def run_batch(projects_file, out_dir="backlog", concurrency=8, requests_per_minute=60):
+    """
+    generate backlogs for every project in `projects_file` concurrently.
+
+    finished projects are checkpointed, so rerunning after an interruption only
+    generates the ones that are missing; failed projects are retried on the next run.
+
+    returns:
+        dict: counts of generated, skipped and failed projects
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    projects = load_projects(projects_file)
+    done = load_checkpoint(out_dir)
+    pending = [project for project in projects if project["id"] not in done]
+    print(f"{len(projects)} projects, {len(projects) - len(pending)} already done, {len(pending)} to generate")
+
+    limiter = RateLimiter(requests_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = []
+
+    with open(Path(out_dir) / CHECKPOINT_FILE, "a", encoding="utf-8") as checkpoint:
+        async def run_one(project):
+            try:
+                await generate_project_backlog(project, out_dir, limiter, semaphore, checkpoint)
+                print(f"done: {project['id']}")
+            except Exception as e:
+                failed.append(project["id"])
+                print(f"failed: {project['id']}: {e}")
+
+        await asyncio.gather(*(run_one(project) for project in pending))
+
+    return {
+        "generated": len(pending) - len(failed),
+        "skipped": len(projects) - len(pending),
+        "failed": failed,
+    }
+
 def main():
-    """generate user stories and save them to a file."""
+    """generate user stories and save them to a file, or a backlog per project with --batch."""
+    parser = argparse.ArgumentParser(description="Generate INVEST user stories")
+    parser.add_argument("--batch", help="file of project descriptions, one backlog is written per project")
+    parser.add_argument("--out-dir", default="backlog")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=60, help="max requests per minute")
+    args = parser.parse_args()
+
+    if args.batch:
+        summary = asyncio.run(run_batch(args.batch, args.out_dir, args.concurrency, args.rpm))
+        print(f"Generated {summary['generated']}, skipped {summary['skipped']}, failed {len(summary['failed'])}")
+        return
+
     response = get_gpt_response(USER_STORY_PROMPT)
     save_response_to_file(response, "sprint1.md")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    get_gateway(meter=get_meter())
+    main()
\ No newline at end of file
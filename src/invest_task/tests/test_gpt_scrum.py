@@ -0,0 +1,49 @@
+import json
+from src.invest_task.gpt_scrum import CHECKPOINT_FILE, load_checkpoint, load_projects
+
+PROJECTS = [
+    "Hotel booking assistant\nA chatbot that books hotel rooms.",
+    "Hotel booking assistant\nA dashboard for hotel booking managers.",
+    "Sprint1\nA sprint planning helper.",
+]
+
+
+def write_text_projects(path, descriptions):
+    path.write_text("\n\n".join(descriptions), encoding="utf-8")
+    return path
+
+
+def test_ids_do_not_depend_on_the_order_of_the_file(tmp_path):
+    forward = load_projects(write_text_projects(tmp_path / "a.txt", PROJECTS))
+    backward = load_projects(write_text_projects(tmp_path / "b.txt", PROJECTS[::-1]))
+
+    assert {p["description"]: p["id"] for p in forward} == {p["description"]: p["id"] for p in backward}
+    ids = [project["id"] for project in forward]
+    assert len(set(ids)) == 3
+    assert all(project_id.startswith("hotel-booking-assistant-") for project_id in ids[:2])
+    # a project called "Sprint1" does not overwrite the single-run sprint1.md
+    assert ids[2].startswith("sprint1-") and ids[2] != "sprint1"
+
+
+def test_explicit_ids_and_duplicate_projects(tmp_path):
+    path = tmp_path / "projects.jsonl"
+    items = [
+        {"id": "Booking Bot", "description": PROJECTS[0]},
+        {"id": "Booking Bot", "description": PROJECTS[0]},
+        {"description": PROJECTS[1]},
+    ]
+    path.write_text("\n".join(json.dumps(item) for item in items), encoding="utf-8")
+
+    projects = load_projects(path)
+    assert len(projects) == 2
+    assert projects[0]["id"].startswith("booking-bot-")
+
+
+def test_checkpoint_skips_torn_lines_and_missing_files(tmp_path):
+    (tmp_path / "a.md").write_text("stories", encoding="utf-8")
+    (tmp_path / CHECKPOINT_FILE).write_text(
+        '{"id": "a", "file": "a.md"}\n{"id": "b", "file": "b.md"}\n{"id": "c", "fi',
+        encoding="utf-8",
+    )
+    assert load_checkpoint(tmp_path) == {"a"}
+    assert load_checkpoint(tmp_path / "missing") == set()
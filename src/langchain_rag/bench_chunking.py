@@ -0,0 +1,108 @@
+"""
+Compare the chunkers on a document folder: throughput and chunk size in tokens.
+
+Text is extracted once through the extracted-text cache, so the timings cover
+splitting only. --repeat multiplies the corpus to get stable timings from a
+small folder.
+
+usage:
+    python bench_chunking.py docs --repeat 50 --workers 4
+"""
+import time
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+from chunking import TokenChunker, build_splitter
+from metering import estimate_tokens_batch
+from text_cache import ExtractedTextCache
+
+
+def load_texts(path: str) -> List[str]:
+    from docs_to_storage import EnhancedDocumentUploader
+
+    cache = ExtractedTextCache()
+    texts = []
+    for file_path in sorted(Path(path).rglob("*")):
+        if not file_path.is_file() or not EnhancedDocumentUploader.is_supported(file_path):
+            continue
+        loader_class = EnhancedDocumentUploader.FILE_LOADERS[file_path.suffix.lower()]
+        file_hash = cache.file_hash(file_path)
+        pages = cache.get(file_hash, loader_class.__name__)
+        if pages is None:
+            pages = [{"content": doc.page_content, "metadata": doc.metadata}
+                     for doc in loader_class(str(file_path)).load()]
+            cache.put(file_hash, loader_class.__name__, pages)
+        texts.extend(page["content"] for page in pages)
+    return texts
+
+
+def percentile(values: List[int], pct: float) -> int:
+    values = sorted(values)
+    return values[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def measure(name: str, splitter, texts: List[str], budget: int) -> Dict[str, object]:
+    start = time.perf_counter()
+    if hasattr(splitter, "split_many"):
+        splits = splitter.split_many(texts)
+    else:
+        splits = [splitter.split_text(text) for text in texts]
+    seconds = time.perf_counter() - start
+
+    chunks = [chunk for split in splits for chunk in split]
+    tokens = estimate_tokens_batch(chunks) if chunks else [0]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    return {
+        "chunker": name,
+        "seconds": round(seconds, 3),
+        "mb_per_s": round(megabytes / seconds, 2) if seconds else 0.0,
+        "chunks": len(chunks),
+        "tokens_p5": percentile(tokens, 5),
+        "tokens_p50": percentile(tokens, 50),
+        "tokens_p95": percentile(tokens, 95),
+        "tokens_max": max(tokens),
+        "tokens_stdev": round(statistics.pstdev(tokens), 1),
+        "over_budget": sum(1 for count in tokens if count > budget),
+        "total_tokens": sum(tokens),
+    }
+
+
+def print_report(rows: List[Dict[str, object]]):
+    columns = list(rows[0])
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(widths[column]) for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recursive and token chunkers")
+    parser.add_argument("path", nargs="?", default=str(Path(__file__).parent / "docs"))
+    parser.add_argument("--repeat", type=int, default=20, help="copies of the corpus to split")
+    parser.add_argument("--chunk-tokens", type=int, default=250)
+    parser.add_argument("--overlap-tokens", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4, help="processes for the parallel token run")
+    args = parser.parse_args()
+
+    texts = load_texts(args.path) * args.repeat
+    if not texts:
+        parser.error(f"no supported documents in {args.path}")
+    print(f"{len(texts)} texts, {sum(map(len, texts)) / 1e6:.1f}M characters\n")
+
+    rows = [
+        measure("recursive", build_splitter(), texts, args.chunk_tokens),
+        measure("token", TokenChunker(args.chunk_tokens, args.overlap_tokens), texts, args.chunk_tokens),
+    ]
+    if args.workers > 1:
+        rows.append(measure(
+            f"token x{args.workers}",
+            TokenChunker(args.chunk_tokens, args.overlap_tokens, workers=args.workers),
+            texts, args.chunk_tokens
+        ))
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
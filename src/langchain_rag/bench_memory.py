@@ -0,0 +1,111 @@
+"""
+Peak memory of embedded chunks: the dict-and-list layout split_documents and
+embed_chunks used before against the records in records.py.
+
+Both runs split the same synthetic pages into chunks and embed them in batches
+of 50 with the same fake embedder (random vectors, no API calls), keeping every
+chunk in memory as ingestion does until the upload. Memory is measured with
+tracemalloc, so only Python allocations count.
+
+usage:
+    python bench_memory.py --chunks 5000 --dimensions 1536
+"""
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from records import ChunkRecord, VectorBatch
+
+BATCH_SIZE = 50
+TAGS = ["europe", "city"]
+
+
+def fake_embeddings(dimensions: int, seed: int = 7) -> Callable[[List[str]], List[List[float]]]:
+    rng = random.Random(seed)
+
+    def embed_documents(texts: List[str]) -> List[List[float]]:
+        return [[rng.uniform(-1, 1) for _ in range(dimensions)] for _ in texts]
+
+    return embed_documents
+
+
+def synthetic_chunks(count: int, chunk_chars: int) -> List[str]:
+    words = "hotel river museum breakfast station harbour terrace suite old town view".split()
+    rng = random.Random(3)
+    return [" ".join(rng.choice(words) for _ in range(chunk_chars // 7))[:chunk_chars] for _ in range(count)]
+
+
+def as_dicts(texts: List[str], embed: Callable) -> List[Dict[str, Any]]:
+    chunks = [
+        {
+            'content': text, 'title': 'Brochure', 'source': 'docs/brochure.pdf', 'chunk_id': i,
+            'id': f"{i:040x}", 'page': i // 4 + 1, 'file_type': 'pdf',
+            'ingested_at': '2026-01-02T03:04:05+00:00', 'tags': list(TAGS)
+        }
+        for i, text in enumerate(texts)
+    ]
+    for i in range(0, len(chunks), BATCH_SIZE):
+        batch = chunks[i:i + BATCH_SIZE]
+        for chunk, embedding in zip(batch, embed([chunk['content'] for chunk in batch])):
+            chunk['content_vector'] = embedding
+    return chunks
+
+
+def as_records(texts: List[str], embed: Callable) -> List[ChunkRecord]:
+    tags = tuple(TAGS)
+    chunks = [
+        ChunkRecord(
+            id=f"{i:040x}", content=text, title='Brochure', source='docs/brochure.pdf', chunk_id=i,
+            page=i // 4 + 1, file_type='pdf', ingested_at='2026-01-02T03:04:05+00:00', tags=tags
+        )
+        for i, text in enumerate(texts)
+    ]
+    for i in range(0, len(chunks), BATCH_SIZE):
+        batch = chunks[i:i + BATCH_SIZE]
+        vectors = VectorBatch.from_lists(embed([chunk.content for chunk in batch]))
+        for row, chunk in enumerate(batch):
+            chunk.set_vector(vectors, row)
+    return chunks
+
+
+def measure(name: str, build: Callable, texts: List[str], dimensions: int) -> Dict[str, Any]:
+    embed = fake_embeddings(dimensions)
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = build(texts, embed)
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del chunks
+    return {
+        "layout": name,
+        "chunks": len(texts),
+        "retained_mb": round(current / 1e6, 1),
+        "peak_mb": round(peak / 1e6, 1),
+        "kb_per_chunk": round(current / len(texts) / 1e3, 1),
+        "seconds": round(seconds, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of dict and record chunks")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.chunks, args.chunk_chars)
+    rows = [
+        measure("dicts", as_dicts, texts, args.dimensions),
+        measure("records", as_records, texts, args.dimensions),
+    ]
+    from bench_chunking import print_report
+
+    print_report(rows)
+    print(f"\npeak memory reduced {rows[0]['peak_mb'] / rows[1]['peak_mb']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
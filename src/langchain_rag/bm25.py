@@ -0,0 +1,377 @@
+"""
+In-process BM25 keyword index over the chunks produced by split_documents.
+
+Postings are kept per term as two parallel arrays (ascending document numbers
+and term frequencies) and saved as delta/varint-encoded blocks in a single
+file. Queries use MaxScore: terms are ordered by their score upper bound, and
+once the top-k threshold is high enough the low-impact terms are only probed
+for documents that can still make it into the result.
+
+Stdlib-only, so the benchmark and tests can use it without Azure.
+"""
+import os
+import re
+import json
+import math
+import heapq
+import struct
+import operator
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BM25IDX1"
+STORED_FIELDS = ("id", "content", "title", "source", "chunk_id", "page", "file_type", "ingested_at", "tags")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with".split()
+)
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+PAGE_BOUNDS = {"gte": operator.ge, "lte": operator.le, "gt": operator.gt, "lt": operator.lt}
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def encode_varints(values: Iterable[int], out: bytearray):
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_varints(buf: bytes, offset: int, count: int) -> Tuple[array, int]:
+    values = array("I")
+    for _ in range(count):
+        value, shift = 0, 0
+        while True:
+            byte = buf[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        values.append(value)
+    return values, offset
+
+
+def matches_filters(fields: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """the local equivalent of retrievers.build_odata_filter"""
+    if not filters:
+        return True
+    for key, value in filters.items():
+        if value is None or value == [] or value == "":
+            continue
+        if key in ("source", "title", "file_type"):
+            values = value if isinstance(value, list) else [value]
+            if fields.get(key) not in values:
+                return False
+        elif key == "page":
+            page = fields.get("page")
+            if page is None:
+                return False
+            if isinstance(value, dict):
+                if not all(PAGE_BOUNDS[op](page, int(bound)) for op, bound in value.items()):
+                    return False
+            elif page not in [int(p) for p in (value if isinstance(value, list) else [value])]:
+                return False
+        elif key == "tags":
+            tags = value if isinstance(value, list) else [value]
+            if not set(tags) & set(fields.get("tags") or []):
+                return False
+        elif key in ("ingested_after", "ingested_before"):
+            ingested_at = fields.get("ingested_at")
+            if not ingested_at:
+                return False
+            stamp = datetime.fromisoformat(str(ingested_at).replace("Z", "+00:00"))
+            bound = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if bound.tzinfo is None:
+                bound = bound.replace(tzinfo=timezone.utc)
+            if stamp.tzinfo is None:
+                stamp = stamp.replace(tzinfo=timezone.utc)
+            if (key == "ingested_after" and stamp < bound) or (key == "ingested_before" and stamp > bound):
+                return False
+        else:
+            raise ValueError(f"Unknown filter: {key}")
+    return True
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, compact_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._ids: Dict[str, int] = {}
+        # term -> (document numbers, term frequencies), both ascending by document number
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._max_tf: Dict[str, int] = {}
+        self._deleted = set()
+        self._next_docno = 0
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def documents(self) -> List[Dict[str, Any]]:
+        """the stored fields of every indexed chunk"""
+        with self._lock:
+            return [dict(fields) for fields in self._docs.values()]
+
+    @property
+    def avg_length(self) -> float:
+        return self._total_length / len(self._docs) if self._docs else 0.0
+
+    def add(self, chunks: Iterable[Dict[str, Any]]) -> int:
+        """index chunks; a chunk whose id is already indexed replaces the old one"""
+        added = 0
+        with self._lock:
+            for chunk in chunks:
+                chunk_id = str(chunk["id"])
+                if chunk_id in self._ids:
+                    self._delete_docno(self._ids[chunk_id])
+
+                docno = self._next_docno
+                self._next_docno += 1
+                frequencies: Dict[str, int] = {}
+                for token in tokenize(f"{chunk.get('title') or ''} {chunk.get('content') or ''}"):
+                    frequencies[token] = frequencies.get(token, 0) + 1
+
+                for term, tf in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("I"))
+                    postings[0].append(docno)
+                    postings[1].append(tf)
+                    if tf > self._max_tf.get(term, 0):
+                        self._max_tf[term] = tf
+
+                length = sum(frequencies.values())
+                self._docs[docno] = {field: chunk.get(field) for field in STORED_FIELDS}
+                self._docs[docno]["id"] = chunk_id
+                self._lengths[docno] = length
+                self._ids[chunk_id] = docno
+                self._total_length += length
+                added += 1
+        return added
+
+    def _delete_docno(self, docno: int):
+        fields = self._docs.pop(docno)
+        self._ids.pop(fields["id"], None)
+        self._total_length -= self._lengths.pop(docno)
+        self._deleted.add(docno)
+
+    def delete(self, chunk_ids: Iterable[str]) -> int:
+        deleted = 0
+        with self._lock:
+            for chunk_id in chunk_ids:
+                docno = self._ids.get(str(chunk_id))
+                if docno is not None:
+                    self._delete_docno(docno)
+                    deleted += 1
+            if self._deleted and len(self._deleted) > self.compact_ratio * max(len(self._docs), 1):
+                self.compact()
+        return deleted
+
+    def delete_source(self, source: str) -> int:
+        with self._lock:
+            ids = [fields["id"] for fields in self._docs.values() if fields.get("source") == source]
+        return self.delete(ids)
+
+    def compact(self):
+        """drop deleted documents from the postings"""
+        with self._lock:
+            if not self._deleted:
+                return
+            deleted = self._deleted
+            for term in list(self._postings):
+                docnos, tfs = self._postings[term]
+                kept = [(d, tf) for d, tf in zip(docnos, tfs) if d not in deleted]
+                if not kept:
+                    del self._postings[term]
+                    del self._max_tf[term]
+                    continue
+                self._postings[term] = (array("I", (d for d, _ in kept)), array("I", (tf for _, tf in kept)))
+                self._max_tf[term] = max(tf for _, tf in kept)
+            self._deleted = set()
+
+    def _idf(self, df: int) -> float:
+        n = len(self._docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 3,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """top_k (score, stored fields) pairs, best first"""
+        with self._lock:
+            terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+            if not terms or top_k <= 0:
+                return []
+
+            k1, b, avg_length = self.k1, self.b, self.avg_length or 1.0
+            lengths, docs, deleted = self._lengths, self._docs, self._deleted
+
+            cursors = []
+            for term in terms:
+                docnos, tfs = self._postings[term]
+                idf = self._idf(len(docnos))
+                max_tf = self._max_tf[term]
+                # the score can never exceed this, whatever the document length
+                upper_bound = idf * max_tf * (k1 + 1) / (max_tf + k1 * (1 - b))
+                cursors.append([upper_bound, idf, docnos, tfs, 0])
+            cursors.sort(key=lambda cursor: cursor[0])
+
+            # cumulative[i]: best possible score from terms 0..i alone
+            cumulative, total = [], 0.0
+            for cursor in cursors:
+                total += cursor[0]
+                cumulative.append(total)
+
+            heap: List[Tuple[float, int]] = []
+            threshold = 0.0
+            first_essential = 0
+
+            while True:
+                candidate = None
+                for cursor in cursors[first_essential:]:
+                    if cursor[4] < len(cursor[2]):
+                        docno = cursor[2][cursor[4]]
+                        if candidate is None or docno < candidate:
+                            candidate = docno
+                if candidate is None:
+                    break
+
+                if candidate in deleted:
+                    score = None
+                else:
+                    length_norm = k1 * (1 - b + b * lengths[candidate] / avg_length)
+                    score = 0.0
+
+                for cursor in cursors[first_essential:]:
+                    position = cursor[4]
+                    if position < len(cursor[2]) and cursor[2][position] == candidate:
+                        if score is not None:
+                            tf = cursor[3][position]
+                            score += cursor[1] * tf * (k1 + 1) / (tf + length_norm)
+                        cursor[4] = position + 1
+
+                if score is None:
+                    continue
+
+                # non-essential terms: probe only while the document can still beat the threshold
+                for i in range(first_essential - 1, -1, -1):
+                    if score + cumulative[i] <= threshold:
+                        score = None
+                        break
+                    cursor = cursors[i]
+                    position = bisect_left(cursor[2], candidate, cursor[4])
+                    cursor[4] = position
+                    if position < len(cursor[2]) and cursor[2][position] == candidate:
+                        tf = cursor[3][position]
+                        score += cursor[1] * tf * (k1 + 1) / (tf + length_norm)
+
+                if score is None or (len(heap) == top_k and score <= threshold):
+                    continue
+                if not matches_filters(docs[candidate], filters):
+                    continue
+
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, -candidate))
+                else:
+                    heapq.heapreplace(heap, (score, -candidate))
+                if len(heap) == top_k:
+                    threshold = heap[0][0]
+                    while first_essential < len(cursors) and cumulative[first_essential] <= threshold:
+                        first_essential += 1
+
+            ranked = sorted(heap, reverse=True)
+            return [(score, dict(docs[-negative_docno])) for score, negative_docno in ranked]
+
+    def save(self, path):
+        """write the index atomically: header json, then varint postings"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.compact()
+            # renumber documents densely so saved deltas stay small
+            renumber = {docno: i for i, docno in enumerate(sorted(self._docs))}
+            blob = bytearray()
+            terms = []
+            for term in sorted(self._postings):
+                docnos, tfs = self._postings[term]
+                offset = len(blob)
+                previous = 0
+                deltas = []
+                for docno in docnos:
+                    new_docno = renumber[docno]
+                    deltas.append(new_docno - previous)
+                    previous = new_docno
+                encode_varints(deltas, blob)
+                encode_varints(tfs, blob)
+                terms.append([term, offset, len(docnos), self._max_tf[term]])
+
+            header = json.dumps({
+                "k1": self.k1,
+                "b": self.b,
+                "docs": [self._docs[docno] for docno in sorted(self._docs)],
+                "lengths": [self._lengths[docno] for docno in sorted(self._docs)],
+                "terms": terms,
+            }, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(blob)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved BM25 index with {len(self._docs)} chunks to {path}")
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a BM25 index")
+        header_start = len(MAGIC) + 8
+        (header_length,) = struct.unpack_from("<Q", data, len(MAGIC))
+        header = json.loads(data[header_start:header_start + header_length])
+        blob = memoryview(data)[header_start + header_length:]
+
+        index = cls(k1=header["k1"], b=header["b"])
+        for docno, (fields, length) in enumerate(zip(header["docs"], header["lengths"])):
+            index._docs[docno] = fields
+            index._lengths[docno] = length
+            index._ids[fields["id"]] = docno
+            index._total_length += length
+        index._next_docno = len(header["docs"])
+
+        for term, offset, count, max_tf in header["terms"]:
+            deltas, position = decode_varints(blob, offset, count)
+            tfs, _ = decode_varints(blob, position, count)
+            docnos, previous = array("I"), 0
+            for delta in deltas:
+                previous += delta
+                docnos.append(previous)
+            index._postings[term] = (docnos, tfs)
+            index._max_tf[term] = max_tf
+        return index
+
+    @classmethod
+    def open(cls, path, **kwargs) -> "BM25Index":
+        """load the index at path, or start an empty one if it does not exist yet"""
+        if Path(path).exists():
+            return cls.load(path)
+        return cls(**kwargs)
+
+
+def default_index_path() -> str:
+    return os.getenv("BM25_INDEX_PATH", ".cache/bm25/index.bin")
@@ -0,0 +1,250 @@
+"""
+Model cascade for the RAG answer step.
+
+With FAST_CHAT_MODEL set, a question first goes to that (smaller, faster)
+deployment and is escalated to CHAT_MODEL when:
+
+- it looks complex before anything is generated: long, multi-part,
+  comparative or planning questions, or context drawn from many files;
+- the fast answer refuses or hedges ("the context does not mention ...");
+- the fast answer is poorly grounded: too few of its content words, or any
+  of its numbers, appear in the retrieved context or the question.
+
+Without FAST_CHAT_MODEL every question goes to CHAT_MODEL as before. Each
+answer is logged on the ``rag.cascade`` logger with the tier, latency and
+escalation reason (custom_dimensions, so Application Insights can chart the
+escalation rate and per-tier latency); `stats()` has the in-process totals.
+
+Settings (environment):
+    FAST_CHAT_MODEL              deployment tried first (unset: no cascade)
+    CASCADE_GROUNDING_MIN        share of answer words that must be in the context (default 0.6)
+    CASCADE_COMPLEX_WORDS        questions longer than this go straight to CHAT_MODEL (default 30)
+
+Comparing the cascade with CHAT_MODEL alone on the benchmark questions:
+    python cascade.py --questions ../rag/benchmark_questions.json
+"""
+import os
+import re
+import json
+import time
+import argparse
+import logging
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from deadline import invoke_llm
+
+logger = logging.getLogger("rag.cascade")
+
+FAST = "fast"
+STRONG = "strong"
+
+_COMPLEX_PATTERNS = re.compile(
+    r"\b(compare|comparison|difference|differences|versus|vs\.?|better|best .+ or|pros and cons|"
+    r"itinerary|plan|planning|step by step|explain why|why)\b",
+    re.IGNORECASE,
+)
+_REFUSAL_PATTERNS = re.compile(
+    r"(i don't know|i do not know|i'm not sure|i am not sure|cannot find|can't find|unable to|"
+    r"no information|not (?:mentioned|provided|specified|available|included) in|"
+    r"(?:context|brochures?) (?:does|do) not|there is no mention)",
+    re.IGNORECASE,
+)
+_WORDS = re.compile(r"[^\W\d_]{4,}", re.UNICODE)
+_NUMBERS = re.compile(r"\d+(?:[.,]\d+)?")
+_STOPWORDS = {
+    "about", "also", "answer", "based", "been", "being", "brochure", "brochures", "context", "could",
+    "does", "each", "from", "have", "here", "information", "into", "just", "like", "more", "most",
+    "offer", "offers", "only", "other", "over", "provide", "provided", "such", "than", "that", "their",
+    "them", "then", "there", "these", "they", "this", "those", "very", "were", "what", "when", "where",
+    "which", "while", "will", "with", "would", "your", "travel", "travelers", "travellers",
+}
+
+
+def classify_question(question: str, sources: int = 0, complex_words: int = 30) -> Optional[str]:
+    """a reason to skip the fast tier, or None for a simple question"""
+    if len(question.split()) > complex_words:
+        return "long_question"
+    if question.count("?") > 1:
+        return "multi_part"
+    if _COMPLEX_PATTERNS.search(question):
+        return "complex_wording"
+    if sources >= 4:
+        return "many_sources"
+    return None
+
+
+def grounding_score(answer: str, evidence: str) -> float:
+    """share of the answer's content words that also occur in the evidence"""
+    words = [word for word in _WORDS.findall(answer.lower()) if word not in _STOPWORDS]
+    if not words:
+        return 1.0
+    evidence_words = set(_WORDS.findall(evidence.lower()))
+    return sum(1 for word in words if word in evidence_words) / len(words)
+
+
+def check_answer(answer: str, question: str, context: str, grounding_min: float = 0.6) -> Optional[str]:
+    """a reason to escalate a fast answer, or None when it looks grounded"""
+    if not answer.strip():
+        return "empty_answer"
+    if _REFUSAL_PATTERNS.search(answer):
+        return "refusal"
+    evidence = f"{context}\n{question}"
+    # prices, dates and distances are where small models invent things
+    evidence_numbers = set(_NUMBERS.findall(evidence))
+    if any(number not in evidence_numbers for number in _NUMBERS.findall(answer)):
+        return "ungrounded_number"
+    if grounding_score(answer, evidence) < grounding_min:
+        return "low_grounding"
+    return None
+
+
+class ModelCascade:
+    def __init__(self, strong_llm, fast_llm=None, grounding_min: float = 0.6, complex_words: int = 30,
+                 latency_window: int = 1000):
+        self.strong_llm = strong_llm
+        self.fast_llm = fast_llm
+        self.grounding_min = grounding_min
+        self.complex_words = complex_words
+        self._latencies = {FAST: deque(maxlen=latency_window), STRONG: deque(maxlen=latency_window)}
+        self._answers = Counter()
+        self._reasons = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fast_llm is not None
+
+    def _invoke(self, tier: str, prompt_text: str) -> Tuple[str, float]:
+        llm = self.fast_llm if tier == FAST else self.strong_llm
+        start = time.perf_counter()
+        # bounded by the request deadline, if there is one
+        content = invoke_llm(llm, prompt_text).content
+        latency = time.perf_counter() - start
+        with self._lock:
+            self._latencies[tier].append(latency)
+        return content, latency
+
+    def generate(self, prompt_text: str, question: str, context: str, sources: int = 0,
+                 force_strong: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """answer with the cheapest tier that passes the checks; returns (answer, route)"""
+        start = time.perf_counter()
+        reason = None
+        if not self.enabled or force_strong:
+            tier = STRONG
+        else:
+            reason = classify_question(question, sources, self.complex_words)
+            tier = STRONG if reason else FAST
+
+        content, latency = self._invoke(tier, prompt_text)
+        route = {"tier": tier, "escalated": False, "fast_latency_ms": None}
+        if tier == FAST:
+            reason = check_answer(content, question, context, self.grounding_min)
+            if reason:
+                route.update(escalated=True, fast_latency_ms=round(latency * 1000, 2))
+                content, _ = self._invoke(STRONG, prompt_text)
+                route["tier"] = STRONG
+        route["reason"] = reason
+        route["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        with self._lock:
+            self._answers[route["tier"]] += 1
+            if route["escalated"]:
+                self._answers["escalated"] += 1
+            if reason:
+                self._reasons[reason] += 1
+        if self.enabled:
+            logger.info(
+                f"Answered by {route['tier']} tier" + (f" after escalation ({reason})" if route["escalated"] else ""),
+                extra={"custom_dimensions": {"metric": "cascade_route", **route}}
+            )
+        return content, route
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            answers = dict(self._answers)
+            reasons = dict(self._reasons)
+            latencies = {tier: sorted(values) for tier, values in self._latencies.items()}
+        fast_attempts = answers.get(FAST, 0) + answers.get("escalated", 0)
+        stats = {
+            "answers": answers,
+            "escalation_rate": answers.get("escalated", 0) / fast_attempts if fast_attempts else 0.0,
+            "reasons": reasons,
+        }
+        for tier, values in latencies.items():
+            if values:
+                stats[f"{tier}_p50_ms"] = round(values[len(values) // 2] * 1000, 2)
+                stats[f"{tier}_p95_ms"] = round(values[min(int(len(values) * 0.95), len(values) - 1)] * 1000, 2)
+        return stats
+
+
+def cascade_from_env(strong_llm, make_llm) -> ModelCascade:
+    """`make_llm(deployment)` builds the chat model for FAST_CHAT_MODEL"""
+    fast_deployment = os.getenv("FAST_CHAT_MODEL")
+    return ModelCascade(
+        strong_llm,
+        make_llm(fast_deployment) if fast_deployment else None,
+        grounding_min=float(os.getenv("CASCADE_GROUNDING_MIN", "0.6")),
+        complex_words=int(os.getenv("CASCADE_COMPLEX_WORDS", "30")),
+    )
+
+
+def _overlap_f1(a: str, b: str) -> float:
+    a_words, b_words = Counter(_WORDS.findall(a.lower())), Counter(_WORDS.findall(b.lower()))
+    common = sum((a_words & b_words).values())
+    if not common:
+        return 0.0
+    precision, recall = common / sum(a_words.values()), common / sum(b_words.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def compare(rag, questions: List[str]) -> Dict[str, Any]:
+    """answer every question with the cascade and with CHAT_MODEL alone"""
+    cascade_ms, strong_ms, agreement, routes = [], [], [], Counter()
+    for question in questions:
+        start = time.perf_counter()
+        cascaded, _, details = rag.answer(question)
+        cascade_ms.append((time.perf_counter() - start) * 1000)
+        routes[details["route"]["tier"] + ("_escalated" if details["route"]["escalated"] else "")] += 1
+
+        start = time.perf_counter()
+        strong, _, _ = rag.answer(question, force_strong=True)
+        strong_ms.append((time.perf_counter() - start) * 1000)
+        agreement.append(_overlap_f1(cascaded, strong))
+
+    def median(values):
+        values = sorted(values)
+        return round(values[len(values) // 2], 1) if values else 0.0
+
+    return {
+        "questions": len(questions),
+        "cascade_median_ms": median(cascade_ms),
+        "strong_median_ms": median(strong_ms),
+        "routes": dict(routes),
+        "mean_agreement_f1": round(sum(agreement) / len(agreement), 3) if agreement else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the model cascade with CHAT_MODEL alone")
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "..", "rag", "benchmark_questions.json"))
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [item["question"] if isinstance(item, dict) else item for item in json.load(f)]
+    if args.limit:
+        questions = questions[:args.limit]
+
+    from main import SimpleTravelRAG
+
+    rag = SimpleTravelRAG()
+    if not rag.cascade.enabled:
+        parser.error("set FAST_CHAT_MODEL to compare the cascade")
+    print(json.dumps(compare(rag, questions), indent=2))
+    print(json.dumps(rag.cascade.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Chunkers for EnhancedDocumentUploader.split_documents.
+
+CHUNKER selects the splitter:
+
+    recursive   (default) RecursiveCharacterTextSplitter, 1000 characters with 200 overlap
+    token       TokenChunker: chunks sized in tokens, cut on structure
+
+TokenChunker scans each text once, cutting it into blocks at blank lines,
+and counts the tokens of all blocks in one batch. Blocks are then packed
+greedily up to CHUNK_TOKENS (default 250). A heading starts a new chunk once
+the current one is reasonably full, so sections stay together. Overlap is
+whole trailing paragraphs or sentences up to CHUNK_OVERLAP_TOKENS (default
+40), never carried across a heading. Only blocks larger than a chunk are split
+further, by sentences and then by words. Loaders that return one document per
+PDF page keep page boundaries, because each page is chunked on its own.
+
+CHUNKER_WORKERS > 1 splits documents in that many processes.
+
+Compare the chunkers with bench_chunking.py.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from metering import estimate_tokens_batch
+
+_BLOCKS = re.compile(r"\n[ \t]*\n+")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+
+PARAGRAPH = "\n\n"
+SENTENCE = " "
+
+# (text, tokens, separator placed before it, starts a section)
+Piece = Tuple[str, int, str, bool]
+
+
+def is_heading(block: str) -> bool:
+    if _MARKDOWN_HEADING.match(block):
+        return True
+    # a short single line without closing punctuation, like the titles in the brochures
+    return "\n" not in block and len(block) <= 80 and not block.rstrip().endswith((".", ",", ";", ":", "!", "?"))
+
+
+class TokenChunker:
+    def __init__(self, chunk_tokens: int = 250, overlap_tokens: int = 40, workers: int = 0,
+                 min_fill: float = 0.5):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk size")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.workers = workers
+        self.min_fill = min_fill
+
+    @classmethod
+    def from_env(cls) -> "TokenChunker":
+        return cls(
+            chunk_tokens=int(os.getenv("CHUNK_TOKENS", "250")),
+            overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "40")),
+            workers=int(os.getenv("CHUNKER_WORKERS", "0")),
+        )
+
+    def _pieces(self, text: str) -> List[Piece]:
+        blocks = [block.strip() for block in _BLOCKS.split(text)]
+        blocks = [block for block in blocks if block]
+        pieces = []
+        for block, tokens in zip(blocks, estimate_tokens_batch(blocks)):
+            if tokens <= self.chunk_tokens:
+                pieces.append((block, tokens, PARAGRAPH, is_heading(block)))
+                continue
+            sentences = [sentence for sentence in _SENTENCES.split(block) if sentence.strip()]
+            for i, (sentence, sentence_tokens) in enumerate(zip(sentences, estimate_tokens_batch(sentences))):
+                separator = PARAGRAPH if i == 0 else SENTENCE
+                if sentence_tokens <= self.chunk_tokens:
+                    pieces.append((sentence, sentence_tokens, separator, False))
+                else:
+                    for j, part in enumerate(self._split_words(sentence, sentence_tokens)):
+                        pieces.append((*part, separator if j == 0 else SENTENCE, False))
+        return pieces
+
+    def _split_words(self, text: str, tokens: int) -> List[Tuple[str, int]]:
+        """a run-on block (tables, lists without punctuation) in roughly equal word windows"""
+        words = text.split()
+        parts = -(-tokens // self.chunk_tokens)
+        size = -(-len(words) // parts)
+        windows = [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+        return list(zip(windows, estimate_tokens_batch(windows)))
+
+    def split_text(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        current: List[Piece] = []
+        current_tokens = 0
+
+        def emit():
+            chunks.append("".join(
+                (piece[2] if i else "") + piece[0] for i, piece in enumerate(current)
+            ))
+
+        for piece in self._pieces(text):
+            _, tokens, _, heading = piece
+            if current and (
+                current_tokens + tokens > self.chunk_tokens
+                or (heading and current_tokens >= self.chunk_tokens * self.min_fill)
+            ):
+                # a heading never ends a chunk; it moves on with the content it introduces
+                carry: List[Piece] = []
+                while current and current[-1][3]:
+                    carry.insert(0, current.pop())
+                carry_tokens = sum(previous[1] for previous in carry)
+                if carry and carry_tokens + tokens > self.chunk_tokens:
+                    current, carry, carry_tokens = current + carry, [], 0
+                if current:
+                    emit()
+                overlap: List[Piece] = carry
+                overlap_tokens = carry_tokens
+                if not heading and not carry:
+                    for previous in reversed(current):
+                        if previous[3] or overlap_tokens + previous[1] > self.overlap_tokens:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_tokens += previous[1]
+                    # the overlap must leave room for the piece that did not fit
+                    while overlap and overlap_tokens + tokens > self.chunk_tokens:
+                        overlap_tokens -= overlap.pop(0)[1]
+                current, current_tokens = overlap, overlap_tokens
+            current.append(piece)
+            current_tokens += tokens
+        if current:
+            emit()
+        return chunks
+
+    def split_many(self, texts: List[str]) -> List[List[str]]:
+        if self.workers > 1 and len(texts) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(self.split_text, texts, chunksize=max(1, len(texts) // (self.workers * 4))))
+        return [self.split_text(text) for text in texts]
+
+
+def build_splitter():
+    """the chunker selected by CHUNKER"""
+    if os.getenv("CHUNKER", "recursive").lower() == "token":
+        return TokenChunker.from_env()
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
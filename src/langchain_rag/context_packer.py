@@ -0,0 +1,178 @@
+"""
+Context packing between retrieval and the prompt.
+
+The retriever over-fetches CONTEXT_CANDIDATES chunks (default 8). The packer
+then, in score order:
+
+- stops at the first large score gap, so a query with one good match sends one
+  chunk and a broad query sends several (adaptive k, between
+  CONTEXT_MIN_CHUNKS and CONTEXT_MAX_CHUNKS);
+- drops chunks that mostly repeat one already chosen (word trigram
+  containment of at least CONTEXT_REDUNDANCY);
+- cuts the splitter overlap off a chunk that continues or precedes one
+  already chosen from the same file;
+- fills CONTEXT_TOKEN_BUDGET prompt tokens (default 1000); only the best chunk
+  is ever shortened to fit, the others are taken whole or not at all.
+
+Stats report tokens_saved against the previous fixed context of the first
+three retrieved chunks (negative when the adaptive k sends more).
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from metering import estimate_tokens
+from retrievers import SCORE_KEY
+
+BASELINE_K = 3
+SEPARATOR = "\n\n"
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def score_of(document: Document) -> Optional[float]:
+    # fan-out results carry a score normalised across shards; prefer it
+    score = document.metadata.get("normalized_score")
+    if score is None:
+        score = document.metadata.get(SCORE_KEY)
+    return score
+
+
+def shingles(text: str, size: int = 3) -> set:
+    words = _WORDS.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def containment(a: set, b: set) -> float:
+    """share of the smaller set found in the other one"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def overlap_length(first: str, second: str, max_overlap: int = 400, probe: int = 40) -> int:
+    """length of the longest end of `first` that `second` starts with (the splitter's overlap)"""
+    if len(second) < probe or len(first) < probe:
+        return 0
+    start = first.find(second[:probe], max(0, len(first) - max_overlap))
+    while start != -1:
+        length = len(first) - start
+        if second.startswith(first[start:]):
+            return length
+        start = first.find(second[:probe], start + 1)
+    return 0
+
+
+def truncate_start(text: str, max_tokens: int) -> str:
+    """keep the beginning of `text` within roughly max_tokens"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:int(len(text) * max_tokens / tokens)].rstrip() + "..."
+
+
+@dataclass
+class PackedContext:
+    documents: List[Document]
+    text: str
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+class ContextPacker:
+    def __init__(self, token_budget: int = 1000, min_chunks: int = 1, max_chunks: int = 6,
+                 score_gap: float = 0.35, min_relative_score: float = 0.5, redundancy: float = 0.6):
+        self.token_budget = token_budget
+        self.min_chunks = min_chunks
+        self.max_chunks = max_chunks
+        self.score_gap = score_gap
+        self.min_relative_score = min_relative_score
+        self.redundancy = redundancy
+
+    @classmethod
+    def from_env(cls) -> "ContextPacker":
+        return cls(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000")),
+            min_chunks=int(os.getenv("CONTEXT_MIN_CHUNKS", "1")),
+            max_chunks=int(os.getenv("CONTEXT_MAX_CHUNKS", "6")),
+            score_gap=float(os.getenv("CONTEXT_SCORE_GAP", "0.35")),
+            redundancy=float(os.getenv("CONTEXT_REDUNDANCY", "0.6")),
+        )
+
+    def adaptive_cut(self, documents: List[Document]) -> int:
+        """how many of the score-ordered documents are worth sending"""
+        scores = [score_of(document) for document in documents]
+        if any(score is None for score in scores) or not scores or scores[0] <= 0:
+            # no comparable scores: fall back to the fixed k
+            return min(len(documents), max(self.min_chunks, BASELINE_K), self.max_chunks)
+
+        k = 1
+        while k < min(len(documents), self.max_chunks):
+            previous, current = scores[k - 1], scores[k]
+            if k >= self.min_chunks and (
+                current < previous * (1 - self.score_gap) or current < scores[0] * self.min_relative_score
+            ):
+                break
+            k += 1
+        return k
+
+    def pack(self, documents: List[Document]) -> PackedContext:
+        ranked = sorted(documents, key=lambda document: score_of(document) or 0.0, reverse=True)
+        cut = self.adaptive_cut(ranked)
+
+        chosen: List[Document] = []
+        chosen_shingles: List[set] = []
+        redundant = over_budget = trimmed_chars = 0
+        remaining = self.token_budget
+        for document in ranked[:cut]:
+            text = document.page_content.strip()
+            source = document.metadata.get("source")
+            document_shingles = shingles(text)
+            if any(containment(document_shingles, other) >= self.redundancy for other in chosen_shingles):
+                redundant += 1
+                continue
+
+            for other in chosen:
+                if source is None or other.metadata.get("source") != source:
+                    continue
+                # chunk continues `other`: drop the repeated start; chunk precedes it: drop the repeated end
+                head = overlap_length(other.page_content, text)
+                if head:
+                    text, trimmed_chars = text[head:].lstrip(), trimmed_chars + head
+                tail = overlap_length(text, other.page_content)
+                if tail:
+                    text, trimmed_chars = text[:len(text) - tail].rstrip(), trimmed_chars + tail
+            if not text:
+                redundant += 1
+                continue
+
+            cost = estimate_tokens(text) + (estimate_tokens(SEPARATOR) if chosen else 0)
+            if cost > remaining:
+                if chosen:
+                    over_budget += 1
+                    continue
+                text = truncate_start(text, remaining)
+                cost = estimate_tokens(text)
+
+            chosen.append(Document(page_content=text, metadata=document.metadata))
+            chosen_shingles.append(document_shingles)
+            remaining -= cost
+
+        packed_text = SEPARATOR.join(document.page_content for document in chosen)
+        context_tokens = estimate_tokens(packed_text) if packed_text else 0
+        baseline_tokens = sum(estimate_tokens(document.page_content) for document in documents[:BASELINE_K])
+        return PackedContext(chosen, packed_text, {
+            "candidates": len(documents),
+            "adaptive_k": cut,
+            "chunks": len(chosen),
+            "dropped_redundant": redundant,
+            "dropped_over_budget": over_budget,
+            "trimmed_overlap_chars": trimmed_chars,
+            "context_tokens": context_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": baseline_tokens - context_tokens
+        })
@@ -0,0 +1,171 @@
+"""
+Server-side conversation memory for SimpleTravelRAG.
+
+Each session keeps its most recent turns verbatim and folds older turns into a
+rolling summary, so the history sent with a follow-up question stays under a
+fixed token budget however long the chat gets. Summarising is an LLM call, so
+it runs on a background worker after the answer has been returned; until it
+finishes, the oldest verbatim turns are simply left out of the prompt.
+
+Settings (environment):
+    CONVERSATION_HISTORY_TOKENS   history budget per prompt (default 1200)
+    CONVERSATION_RECENT_TURNS     turns kept verbatim (default 3)
+    CONVERSATION_IDLE_TTL         seconds before an idle session is dropped (default 3600)
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from metering import entry_point, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# summarize(previous_summary, turns) -> new summary
+Summarizer = Callable[[str, List["Turn"]], str]
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+    def text(self) -> str:
+        return f"User: {self.question}\nAssistant: {self.answer}"
+
+
+@dataclass
+class ConversationSession:
+    session_id: str
+    summary: str = ""
+    turns: List[Turn] = field(default_factory=list)
+    last_active: float = field(default_factory=time.monotonic)
+    compressing: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """keep the end of `text` (the most recent part) within roughly max_tokens"""
+    if max_tokens <= 0:
+        return ""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep_chars = int(len(text) * max_tokens / tokens)
+    return "..." + text[len(text) - keep_chars:]
+
+
+class ConversationStore:
+    def __init__(self, history_tokens: int = 1200, recent_turns: int = 3,
+                 max_sessions: int = 10000, idle_ttl: float = 3600):
+        self.history_tokens = history_tokens
+        self.recent_turns = recent_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # the summary gets at most a third of the budget, recent turns the rest
+        self.summary_tokens = history_tokens // 3
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> ConversationSession:
+        """the session for `session_id`, created on first use"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = ConversationSession(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_active = now
+            return session
+
+    def _evict_idle(self, now: float):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active < self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def history(self, session: ConversationSession) -> str:
+        """summary plus as many recent turns as fit in the token budget"""
+        with session.lock:
+            summary = truncate_to_tokens(session.summary, self.summary_tokens)
+            turns = list(session.turns)
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation: {summary}")
+        budget = self.history_tokens - sum(estimate_tokens(part) for part in parts)
+        kept = []
+        for turn in reversed(turns):
+            text = turn.text()
+            cost = estimate_tokens(text)
+            if cost > budget:
+                if not kept:
+                    # always keep at least the last exchange, shortened if need be
+                    kept.append(truncate_to_tokens(text, budget))
+                break
+            kept.append(text)
+            budget -= cost
+
+        parts.extend(reversed(kept))
+        return "\n".join(parts)
+
+    def add_turn(self, session: ConversationSession, question: str, answer: str,
+                 summarize: Optional[Summarizer] = None):
+        with session.lock:
+            session.turns.append(Turn(question, answer))
+            needs_compression = len(session.turns) > self.recent_turns and not session.compressing
+            if needs_compression and summarize is not None:
+                session.compressing = True
+                self._executor.submit(self._compress, session, summarize)
+
+    def _compress(self, session: ConversationSession, summarize: Summarizer):
+        with session.lock:
+            older = session.turns[:-self.recent_turns]
+            previous_summary = session.summary
+        try:
+            with entry_point("rag.summarize"):
+                summary = summarize(previous_summary, older)
+        except Exception as e:
+            logger.warning(f"Could not summarise session {session.session_id}: {e}")
+            with session.lock:
+                # keep the history bounded even without a summary
+                session.turns = session.turns[-self.recent_turns:]
+                session.compressing = False
+            return
+
+        with session.lock:
+            session.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+            # turns added while summarising stay; only the summarised ones go
+            session.turns = session.turns[len(older):]
+            session.compressing = False
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """process-wide store, so sessions survive the RAG system being rebuilt"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore(
+                    history_tokens=int(os.getenv("CONVERSATION_HISTORY_TOKENS", "1200")),
+                    recent_turns=int(os.getenv("CONVERSATION_RECENT_TURNS", "3")),
+                    idle_ttl=float(os.getenv("CONVERSATION_IDLE_TTL", "3600")),
+                )
+    return _store
@@ -0,0 +1,272 @@
+"""
+Per-request deadlines and hedged calls for the ask path.
+
+function_app gives every /ask request a deadline: timeout_ms in the body or
+query string, or the X-Request-Timeout-Ms header, capped by REQUEST_TIMEOUT_MS
+(default 30000, also used when the caller sends nothing). The deadline lives
+in a context variable, so each stage of SimpleTravelRAG.answer sees how much
+time is left without it being passed around:
+
+- a stage (condensing, retrieval, generation) is not started when less than
+  DEADLINE_RESERVE_MS (default 250) is left, and fails with DeadlineExceeded;
+- chat calls go through `invoke_llm`: the chat models are built without the
+  OpenAI client's own retries, and each attempt here gets only the time that
+  is left, so retries cannot run past the deadline; an error raised after
+  the deadline passed is reported as DeadlineExceeded;
+- retrieval is hedged: when the first search has not answered within the
+  p95 of recent searches, a duplicate is sent and whichever answers first wins.
+
+Hedging at the p95 duplicates about one search in twenty. HEDGE_MAX_RATIO
+(default 0.1) caps the share of hedged calls, so a backend that is slow for
+everyone does not also get twice the load. An attempt that lost the race or
+outlived the deadline keeps its worker thread until it returns; its result is
+ignored. Search HTTP calls are bounded by the time left as well
+(retrievers.py), so such attempts end soon after the deadline, and no hedge
+is sent while every worker is busy.
+
+function_app turns DeadlineExceeded into a 504.
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("request_deadline", default=None)
+
+# the failures the OpenAI client would have retried itself (timeouts are connection errors)
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    __slots__ = ("timeout", "expires_at", "reserve")
+
+    def __init__(self, timeout: float, reserve: Optional[float] = None):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self.reserve = reserve if reserve is not None else float(os.getenv("DEADLINE_RESERVE_MS", "250")) / 1000
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str):
+        """raise DeadlineExceeded when too little time is left to start `stage`"""
+        if self.remaining() <= self.reserve:
+            raise DeadlineExceeded(stage)
+
+
+@contextmanager
+def deadline(timeout: float, reserve: Optional[float] = None):
+    """Bound everything run inside the block, in this context, to `timeout` seconds."""
+    token = _current.set(Deadline(timeout, reserve))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    """seconds left for the current request, or None without a deadline"""
+    current = _current.get()
+    return current.remaining() if current is not None else None
+
+
+def timeout_kwargs() -> Dict[str, float]:
+    """keyword arguments that bound a chat model call to the time left"""
+    left = remaining()
+    return {"timeout": left} if left is not None else {}
+
+
+def invoke_llm(llm, prompt, attempts: int = 3, backoff: float = 0.5):
+    """
+    llm.invoke with up to `attempts` tries on transient errors. Under a
+    deadline every attempt is bounded by the time left and no retry starts
+    unless its backoff still leaves time for it.
+    """
+    for attempt in range(attempts):
+        try:
+            return llm.invoke(prompt, **timeout_kwargs())
+        except RETRYABLE_ERRORS:
+            delay = backoff * 2 ** attempt
+            current = _current.get()
+            if attempt == attempts - 1 or (current is not None and current.remaining() <= delay + current.reserve):
+                raise
+            time.sleep(delay)
+
+
+@contextmanager
+def stage(name: str):
+    """Check the deadline before a stage and attribute failures after it passed to the deadline."""
+    current = _current.get()
+    if current is not None:
+        current.check(name)
+    try:
+        yield current
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        if current is not None and current.expired():
+            raise DeadlineExceeded(name) from e
+        raise
+
+
+def request_timeout(requested_ms: Any = None) -> float:
+    """
+    The deadline in seconds for a request: the caller's timeout in
+    milliseconds, capped by REQUEST_TIMEOUT_MS.
+
+    Raises:
+        ValueError: when the requested timeout is not a positive number
+    """
+    default_ms = float(os.getenv("REQUEST_TIMEOUT_MS", "30000"))
+    if requested_ms is None or requested_ms == "":
+        return default_ms / 1000
+    value = float(requested_ms)
+    if not value > 0:
+        raise ValueError("timeout_ms must be a positive number of milliseconds")
+    return min(value, default_ms) / 1000
+
+
+class Hedger:
+    """
+    Runs a call on worker threads, sends a duplicate when the first attempt is
+    slower than the observed p95 and returns the first successful result.
+    """
+
+    def __init__(self, name: str = "retrieval", max_ratio: float = 0.1, min_samples: int = 20,
+                 min_delay: float = 0.02, window: int = 200, max_workers: int = 16):
+        self.name = name
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=window)
+        self._hedged = deque(maxlen=window)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-hedge")
+
+    @classmethod
+    def from_env(cls, name: str = "retrieval") -> "Hedger":
+        return cls(name, max_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.1")))
+
+    def hedge_delay(self) -> Optional[float]:
+        """the p95 of recent calls, or None until enough calls were seen to know it"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            values = sorted(self._latencies)
+        return max(values[min(int(len(values) * 0.95), len(values) - 1)], self.min_delay)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            # a hedge that would queue behind busy workers cannot answer sooner
+            if self._in_flight >= self.max_workers:
+                return False
+            return sum(self._hedged) < self.max_ratio * max(len(self._hedged), 1)
+
+    def _run(self, fn: Callable, args: tuple):
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _submit(self, fn: Callable, args: tuple):
+        with self._lock:
+            self._in_flight += 1
+        # each attempt runs in a copy of this context, so it sees the same deadline
+        return self._executor.submit(contextvars.copy_context().run, self._run, fn, args)
+
+    def _record(self, latency: Optional[float], hedged: bool, outcome: str):
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._hedged.append(hedged)
+            self._counts["calls"] += 1
+            self._counts[outcome] += 1
+            if hedged:
+                self._counts["hedged"] += 1
+
+    def call(self, fn: Callable, *args) -> Tuple[Any, Dict[str, Any]]:
+        """
+        fn(*args) within the current deadline.
+
+        Returns:
+            tuple: (result, {"hedged": bool, "hedge_won": bool, "latency_ms": float})
+
+        Raises:
+            DeadlineExceeded: when the deadline passes before any attempt answers
+        """
+        current = _current.get()
+        if current is not None:
+            current.check(self.name)
+
+        start = time.perf_counter()
+        first = self._submit(fn, args)
+        pending = {first}
+        hedged = False
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = wait(pending, timeout=min(delay, current.remaining()) if current else delay)
+            if not done and not (current and current.expired()) and self._may_hedge():
+                pending.add(self._submit(fn, args))
+                hedged = True
+                logger.info(f"{self.name} slower than {delay * 1000:.0f} ms, sent a hedged request")
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=current.remaining() if current else None,
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                # the first attempt took at least this long, whichever attempt won
+                latency = time.perf_counter() - start
+                hedge_won = future is not first
+                self._record(latency, hedged, "hedge_won" if hedge_won else "ok")
+                return result, {"hedged": hedged, "hedge_won": hedge_won, "latency_ms": round(latency * 1000, 2)}
+
+        if pending or error is None:
+            self._record(time.perf_counter() - start, hedged, "deadline_exceeded")
+            raise DeadlineExceeded(self.name)
+        self._record(None, hedged, "failed")
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            hedged = list(self._hedged)
+        delay = self.hedge_delay()
+        return {
+            **counts,
+            "hedge_rate": sum(hedged) / len(hedged) if hedged else 0.0,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+        }
@@ -1,9 +1,11 @@
 import os
 import json
+import argparse
 import logging
 import tempfile
 from pathlib import Path
-from typing import List, Dict, Any
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 from langchain_community.document_loaders import (
     PyPDFLoader, 
@@ -11,7 +13,6 @@ from langchain_community.document_loaders import (
     Docx2txtLoader,
     UnstructuredMarkdownLoader
 )
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import AzureOpenAIEmbeddings
 from azure.search.documents import SearchClient
 from azure.core.credentials import AzureKeyCredential
@@ -27,52 +28,60 @@ from azure.search.documents.indexes.models import (
     SearchField,
     SearchFieldDataType
 )
+from metering import entry_point, estimate_tokens, get_meter
+from text_cache import ExtractedTextCache
+from sharding import ShardRouter, get_index_pointer, search_indexes
+from bm25 import BM25Index, default_index_path
+from ingest_journal import IngestJournal, chunk_key
+from logging_pipeline import configure_logging
+from profiling import profile_request, span
+from retrievers import build_odata_filter
+from chunking import build_splitter
+from records import ChunkRecord, DocumentRecord, VectorBatch
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+class IncompleteUploadError(RuntimeError):
+    """some files' new chunks were not all acknowledged; their previous chunks were kept"""
+    
+    def __init__(self, sources: List[str]):
+        super().__init__(f"{len(sources)} files were not fully uploaded: {', '.join(sources)}")
+        self.sources = sources
+
 class EnhancedDocumentUploader:
-    def __init__(self):
+    def __init__(self, index_names: Optional[Dict[str, str]] = None):
+        """
+        index_names maps logical index names to the physical indexes to write;
+        by default each name goes to the generation currently serving it.
+        """
         load_dotenv()
+        self.index_names = index_names or {}
         self._setup_components()
         
     def _setup_components(self):
         """Initialize Azure components and configurations"""
         try:
+            self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
             self.embeddings = AzureOpenAIEmbeddings(
-                azure_deployment=os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"),
+                azure_deployment=self.embedding_model,
                 api_version="2024-02-01",
                 azure_endpoint=os.getenv("OPENAI_ENDPOINT"),
                 api_key=os.getenv("OPENAI_API_KEY")
             )
             
-            self.search_endpoint = os.getenv("SEARCH_ENDPOINT")
-            self.search_key = os.getenv("SEARCH_KEY")
-            self.index_name = os.getenv("NEW_INDEX_NAME")
+            # RETRIEVER_BACKEND=bm25 indexes chunks locally instead of in Azure AI Search
+            self.backend = os.getenv("RETRIEVER_BACKEND", "azure").lower()
+            if self.backend == "bm25":
+                self.local_index_path = default_index_path()
+                self.local_index = BM25Index.open(self.local_index_path)
+            else:
+                self._setup_search_clients()
             
-            if not all([self.search_endpoint, self.search_key, self.index_name]):
-                raise ValueError("Missing Azure Search configuration")
+            self.text_cache = ExtractedTextCache()
             
-            credential = AzureKeyCredential(self.search_key)
-            self.search_client = SearchClient(
-                endpoint=self.search_endpoint,
-                index_name=self.index_name,
-                credential=credential
-            )
-            self.index_client = SearchIndexClient(
-                endpoint=self.search_endpoint,
-                credential=credential
-            )
-            
-            self.text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-                separators=["\n\n", "\n", " ", ""]
-            )
+            # CHUNKER=token sizes chunks in tokens instead of characters (chunking.py)
+            self.text_splitter = build_splitter()
             
             logger.info("Document uploader components initialized successfully")
             
@@ -80,132 +89,265 @@ class EnhancedDocumentUploader:
             logger.error(f"Failed to initialize components: {e}")
             raise
         
+    def _setup_search_clients(self):
+        self.search_endpoint = os.getenv("SEARCH_ENDPOINT")
+        self.search_key = os.getenv("SEARCH_KEY")
+        indexes = search_indexes()
+        
+        if not all([self.search_endpoint, self.search_key, indexes]):
+            raise ValueError("Missing Azure Search configuration")
+        
+        # chunks are routed to one of the shard indexes by SHARD_ROUTING
+        self.router = ShardRouter.from_env(indexes)
+        self.index_name = self.router.default
+        pointer = get_index_pointer()
+        self.physical_indexes = {
+            index_name: self.index_names.get(index_name) or pointer.resolve(index_name)
+            for index_name in self.router.indexes
+        }
+        
+        credential = AzureKeyCredential(self.search_key)
+        self.search_clients = {
+            index_name: SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=self.physical_indexes[index_name],
+                credential=credential
+            )
+            for index_name in self.router.indexes
+        }
+        self.search_client = self.search_clients[self.index_name]
+        self.index_client = SearchIndexClient(
+            endpoint=self.search_endpoint,
+            credential=credential
+        )
+    
+    @staticmethod
+    def _metadata_fields():
+        """filterable loader metadata carried on every chunk"""
+        return [
+            SimpleField(name="page", type=SearchFieldDataType.Int32, filterable=True, sortable=True),
+            SimpleField(name="file_type", type=SearchFieldDataType.String, filterable=True, facetable=True),
+            SimpleField(name="ingested_at", type=SearchFieldDataType.DateTimeOffset, filterable=True, sortable=True),
+            SimpleField(
+                name="tags",
+                type=SearchFieldDataType.Collection(SearchFieldDataType.String),
+                filterable=True,
+                facetable=True
+            )
+        ]
+    
     def create_search_index(self):
         try:
             existing_indexes = [idx.name for idx in self.index_client.list_indexes()]
-            if self.index_name in existing_indexes:
-                logger.info(f"Index {self.index_name} already exists")
-                return
-            
-            fields = [
-                SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-                SearchableField(name="content", type=SearchFieldDataType.String),
-                SearchableField(name="title", type=SearchFieldDataType.String),
-                SimpleField(name="source", type=SearchFieldDataType.String),
-                SimpleField(name="chunk_id", type=SearchFieldDataType.Int32),
-                SearchField(
-                    name="content_vector",
-                    type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-                    searchable=True,
-                    vector_search_dimensions=1536,  # for text-embedding-ada-002
-                    vector_search_profile_name="my-vector-config"
-                )
-            ]
-            
-            vector_search = VectorSearch(
-                profiles=[
-                    VectorSearchProfile(
-                        name="my-vector-config",
-                        algorithm_configuration_name="my-hnsw"
-                    )
-                ],
-                algorithms=[
-                    HnswAlgorithmConfiguration(
-                        name="my-hnsw",
-                        kind=VectorSearchAlgorithmKind.HNSW
-                    )
-                ]
-            )
-            
-            index = SearchIndex(
-                name=self.index_name,
-                fields=fields,
-                vector_search=vector_search
-            )
-            
-            self.index_client.create_index(index)
-            logger.info(f"Index {self.index_name} created successfully")
+            for index_name in self.physical_indexes.values():
+                if index_name in existing_indexes:
+                    logger.info(f"Index {index_name} already exists")
+                    self._add_missing_fields(index_name)
+                    continue
+                self._create_index(index_name)
             
         except Exception as e:
             logger.error(f"Error creating index: {e}")
             raise
     
-    def load_documents(self, documents_path: str) -> List[Dict[str, Any]]:
-        documents = []
+    def _add_missing_fields(self, index_name: str):
+        # new fields can be added to a live index; existing fields cannot change attributes
+        index = self.index_client.get_index(index_name)
+        existing_fields = {field.name for field in index.fields}
+        missing = [field for field in self._metadata_fields() if field.name not in existing_fields]
+        if not missing:
+            return
+        
+        index.fields.extend(missing)
+        self.index_client.create_or_update_index(index)
+        logger.info(f"Added fields to {index_name}: {', '.join(field.name for field in missing)}")
+    
+    def _create_index(self, index_name: str):
+        fields = [
+            SimpleField(name="id", type=SearchFieldDataType.String, key=True),
+            SearchableField(name="content", type=SearchFieldDataType.String),
+            SearchableField(name="title", type=SearchFieldDataType.String, filterable=True, facetable=True),
+            SimpleField(name="source", type=SearchFieldDataType.String, filterable=True, facetable=True),
+            SimpleField(name="chunk_id", type=SearchFieldDataType.Int32),
+            SearchField(
+                name="content_vector",
+                type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+                searchable=True,
+                vector_search_dimensions=1536,  # for text-embedding-ada-002
+                vector_search_profile_name="my-vector-config"
+            ),
+            *self._metadata_fields()
+        ]
+        
+        vector_search = VectorSearch(
+            profiles=[
+                VectorSearchProfile(
+                    name="my-vector-config",
+                    algorithm_configuration_name="my-hnsw"
+                )
+            ],
+            algorithms=[
+                HnswAlgorithmConfiguration(
+                    name="my-hnsw",
+                    kind=VectorSearchAlgorithmKind.HNSW
+                )
+            ]
+        )
+        
+        index = SearchIndex(
+            name=index_name,
+            fields=fields,
+            vector_search=vector_search
+        )
+        
+        self.index_client.create_index(index)
+        logger.info(f"Index {index_name} created successfully")
+    
+    FILE_LOADERS = {
+        '.pdf': PyPDFLoader,
+        '.txt': TextLoader,
+        '.docx': Docx2txtLoader,
+        '.md': UnstructuredMarkdownLoader
+    }
+    
+    @classmethod
+    def is_supported(cls, file_path) -> bool:
+        return Path(file_path).suffix.lower() in cls.FILE_LOADERS
+    
+    def load_documents(self, documents_path: str, tags: Optional[List[str]] = None) -> List[DocumentRecord]:
         documents_path = Path(documents_path)
         
         if not documents_path.exists():
             raise FileNotFoundError(f"Path {documents_path} not found")
         
-        file_loaders = {
-            '.pdf': PyPDFLoader,
-            '.txt': TextLoader,
-            '.docx': Docx2txtLoader,
-            '.md': UnstructuredMarkdownLoader
-        }
+        return self.load_files(
+            [file_path for file_path in documents_path.rglob('*') if file_path.is_file() and self.is_supported(file_path)],
+            tags
+        )
+    
+    def load_files(self, file_paths: List[Path], tags: Optional[List[str]] = None) -> List[DocumentRecord]:
+        documents = []
+        ingested_at = datetime.now(timezone.utc).isoformat()
+        tags = tuple(tags or ())
         
-
         processed_files = 0
-        for file_path in documents_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in file_loaders:
-                try:
-                    loader_class = file_loaders[file_path.suffix.lower()]
+        for file_path in file_paths:
+            file_path = Path(file_path)
+            try:
+                loader_class = self.FILE_LOADERS[file_path.suffix.lower()]
+                file_hash = self.text_cache.file_hash(file_path)
+                pages = self.text_cache.get(file_hash, loader_class.__name__)
+                
+                if pages is None:
                     loader = loader_class(str(file_path))
-                    docs = loader.load()
-                    
-                    for doc in docs:
-                        documents.append({
-                            'content': doc.page_content,
-                            'metadata': doc.metadata,
-                            'source': str(file_path),
-                            'title': file_path.stem
-                        })
-                    
-                    processed_files += 1
+                    pages = [
+                        {'content': doc.page_content, 'metadata': doc.metadata}
+                        for doc in loader.load()
+                    ]
+                    self.text_cache.put(file_hash, loader_class.__name__, pages)
                     logger.info(f"Loaded file: {file_path.name}")
-                    
-                except Exception as e:
-                    logger.error(f"Error loading file {file_path}: {e}")
+                else:
+                    logger.info(f"Loaded file from text cache: {file_path.name}")
+                
+                source = str(file_path)
+                title = file_path.stem
+                file_type = file_path.suffix.lower().lstrip('.')
+                for page in pages:
+                    documents.append(DocumentRecord(
+                        content=page['content'],
+                        page=page['metadata'].get('page'),
+                        source=source,
+                        file_hash=file_hash,
+                        title=title,
+                        file_type=file_type,
+                        ingested_at=ingested_at,
+                        tags=tags
+                    ))
+                
+                processed_files += 1
+                
+            except Exception as e:
+                logger.error(f"Error loading file {file_path}: {e}")
         
         logger.info(f"Loaded {len(documents)} documents from {processed_files} files")
         return documents
     
-    def split_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def split_documents(self, documents: List[DocumentRecord]) -> List[ChunkRecord]:
         chunks = []
+        seen_ids = set()
+        
+        texts = [doc.content for doc in documents]
+        if hasattr(self.text_splitter, 'split_many'):
+            # splits the whole batch at once, in parallel with CHUNKER_WORKERS
+            split_texts = self.text_splitter.split_many(texts)
+        else:
+            split_texts = [None] * len(documents)
         
         for doc_idx, doc in enumerate(documents):
             try:
-                text_chunks = self.text_splitter.split_text(doc['content'])
+                text_chunks = split_texts[doc_idx]
+                if text_chunks is None:
+                    text_chunks = self.text_splitter.split_text(doc.content)
+                
+                # loaders number pages from 0; the index stores 1-based page numbers
+                page = doc.page + 1 if isinstance(doc.page, int) else None
                 
                 for chunk_idx, chunk_text in enumerate(text_chunks):
-                    chunk_id = f"{doc_idx}_{chunk_idx}_{len(chunks)}"
-                    chunks.append({
-                        'content': chunk_text,
-                        'title': doc['title'],
-                        'source': doc['source'],
-                        'chunk_id': chunk_idx,
-                        'id': chunk_id
-                    })
+                    # content-derived, so a rerun over the same files produces the same keys
+                    chunk_id = chunk_key(doc.source, doc.file_hash, page, chunk_idx, chunk_text)
+                    if chunk_id in seen_ids:
+                        # the same path listed twice
+                        continue
+                    seen_ids.add(chunk_id)
+                    chunks.append(ChunkRecord(
+                        id=chunk_id,
+                        content=chunk_text,
+                        title=doc.title,
+                        source=doc.source,
+                        chunk_id=chunk_idx,
+                        page=page,
+                        file_type=doc.file_type,
+                        ingested_at=doc.ingested_at,
+                        tags=doc.tags
+                    ))
             except Exception as e:
                 logger.error(f"Error splitting document {doc_idx}: {e}")
         
         logger.info(f"Created {len(chunks)} chunks from {len(documents)} documents")
         return chunks
     
-    def embed_chunks(self, chunks): 
+    def embed_chunks(self, chunks: List[ChunkRecord], journal: Optional[IngestJournal] = None) -> List[ChunkRecord]:
         if not chunks:
             return chunks
         
-        texts = [chunk['content'] for chunk in chunks]
+        if journal is not None:
+            # vectors saved by an interrupted attempt of the same run are not paid for twice
+            saved = journal.embeddings()
+            for chunk in chunks:
+                if chunk.id in saved:
+                    chunk.set_vector(*saved[chunk.id])
+        
+        pending = [chunk for chunk in chunks if not chunk.has_vector]
+        if len(pending) < len(chunks):
+            logger.info(f"Reusing journaled embeddings for {len(chunks) - len(pending)}/{len(chunks)} chunks")
+        
+        texts = [chunk.content for chunk in pending]
         batch_size = 50
         
         try:
             for i in range(0, len(texts), batch_size):
                 batch_texts = texts[i:i + batch_size]
-                batch_embeddings = self.embeddings.embed_documents(batch_texts)
+                with get_meter().measure("embedding", self.embedding_model) as usage:
+                    usage["prompt_tokens"] = sum(estimate_tokens(text) for text in batch_texts)
+                    # the lists of floats from the API live only until they are packed
+                    vectors = VectorBatch.from_lists(self.embeddings.embed_documents(batch_texts))
+                
+                batch_chunks = pending[i:i + batch_size]
+                for j, chunk in enumerate(batch_chunks):
+                    chunk.set_vector(vectors, j)
                 
-                for j, embedding in enumerate(batch_embeddings):
-                    chunks[i + j]['content_vector'] = embedding
+                if journal is not None:
+                    journal.record_embeddings([chunk.id for chunk in batch_chunks], vectors)
                 
                 logger.info(f"Generated embeddings: {min(i + batch_size, len(texts))}/{len(texts)}")
             
@@ -215,66 +357,241 @@ class EnhancedDocumentUploader:
         
         return chunks
     
-    def upload_to_azure_search(self, chunks: List[Dict[str, Any]]):
+    def upload_to_azure_search(self, chunks: List[ChunkRecord], journal: Optional[IngestJournal] = None) -> int:
+        """upload the chunks to their shards; returns how many the service acknowledged"""
         try:
             batch_size = 100
             total_uploaded = 0
             
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]
-                result = self.search_client.upload_documents(documents=batch)
-                
-                success_count = sum(1 for r in result if r.succeeded)
-                total_uploaded += success_count
-                
-                if success_count < len(batch):
-                    failed_count = len(batch) - success_count
-                    logger.warning(f"Batch {i//batch_size + 1}: {failed_count} documents failed to upload")
+            # chunks per source still waiting for an acknowledged upload
+            remaining = {}
+            for chunk in chunks:
+                remaining[chunk.source] = remaining.get(chunk.source, 0) + 1
+            
+            for index_name, shard_chunks in self.router.partition(chunks).items():
+                search_client = self.search_clients[index_name]
                 
-                logger.info(f"Uploaded batch {i//batch_size + 1}: {success_count}/{len(batch)} documents")
+                for i in range(0, len(shard_chunks), batch_size):
+                    batch = shard_chunks[i:i + batch_size]
+                    # vectors are expanded to lists of floats one upload batch at a time
+                    result = search_client.upload_documents(documents=[chunk.to_wire() for chunk in batch])
+                    
+                    succeeded = [r.key for r in result if r.succeeded]
+                    success_count = len(succeeded)
+                    total_uploaded += success_count
+                    
+                    if journal is not None:
+                        journal.record_uploaded(succeeded)
+                        sources = {chunk.id: chunk.source for chunk in batch}
+                        for key in succeeded:
+                            source = sources.get(key)
+                            if source is None:
+                                continue
+                            remaining[source] -= 1
+                            if remaining[source] == 0:
+                                journal.record_file_done(source)
+                    
+                    if success_count < len(batch):
+                        failed_count = len(batch) - success_count
+                        logger.warning(f"{index_name} batch {i//batch_size + 1}: {failed_count} documents failed to upload")
+                    
+                    logger.info(f"Uploaded {index_name} batch {i//batch_size + 1}: {success_count}/{len(batch)} documents")
             
             logger.info(f"Total documents uploaded: {total_uploaded}/{len(chunks)}")
+            return total_uploaded
             
         except Exception as e:
             logger.error(f"Error uploading to Azure Search: {e}")
             raise
     
-    def process_documents(self, documents_path: str):
+    def index_locally(self, chunks: List[ChunkRecord]):
+        self.local_index.add(chunk.fields() for chunk in chunks)
+        self.local_index.save(self.local_index_path)
+        logger.info(f"Indexed {len(chunks)} chunks locally, {len(self.local_index)} in total")
+    
+    def _embed_and_upload(self, chunks: List[ChunkRecord]) -> Dict[str, Any]:
+        """embed and upload under a run journal, so a failed run resumes where it stopped"""
+        journal = IngestJournal.for_run(
+            [chunk.id for chunk in chunks], self.embedding_model, *self.physical_indexes.values()
+        )
+        pending = [chunk for chunk in chunks if chunk.id not in journal.uploaded_keys]
+        resume = {
+            "resumed": journal.resumed,
+            "skipped_uploaded": len(chunks) - len(pending),
+            "files_completed_before": len(journal.finished_files)
+        }
+        if journal.resumed:
+            logger.info(
+                f"Resuming ingestion run {journal.run_dir.name}: {resume['skipped_uploaded']} chunks "
+                f"already uploaded, {resume['files_completed_before']} files complete"
+            )
+        
+        with span("embed"):
+            chunks_with_embeddings = self.embed_chunks(pending, journal)
+        
+        with span("upload"):
+            self.upload_to_azure_search(chunks_with_embeddings, journal)
+        
+        failed = [chunk for chunk in chunks if chunk.id not in journal.uploaded_keys]
+        if failed:
+            # keep the journal: the next run over the same files retries only these
+            logger.warning(f"{len(failed)} chunks were not acknowledged; rerun to retry them")
+        else:
+            journal.complete()
+        resume["failed"] = len(failed)
+        resume["failed_sources"] = sorted({chunk.source for chunk in failed})
+        return resume
+    
+    def process_documents(self, documents_path: str, tags: Optional[List[str]] = None):
+        with entry_point("rag.ingest"), profile_request("process_documents"):
+            return self._process_documents(documents_path, tags)
+
+    def _process_documents(self, documents_path: str, tags: Optional[List[str]] = None):
         try:
             logger.info(f"Starting document processing for path: {documents_path}")
             
-            self.create_search_index()
+            if self.backend != "bm25":
+                with span("create_index"):
+                    self.create_search_index()
             
-            documents = self.load_documents(documents_path)
+            text_cache_start = self.text_cache.counters()
+            with span("load"):
+                documents = self.load_documents(documents_path, tags)
+            text_cache_summary = self.text_cache.summary(since=text_cache_start)
+            logger.info(
+                f"Text cache: {text_cache_summary['hits']} hits, {text_cache_summary['misses']} misses, "
+                f"{text_cache_summary['entries']} entries, {text_cache_summary['bytes']} bytes on disk"
+            )
             if not documents:
                 logger.warning("No documents found to process")
-                return {"documents_count": 0, "chunks_count": 0}
+                return {"documents_count": 0, "chunks_count": 0, "text_cache": text_cache_summary}
             
-            chunks = self.split_documents(documents)
+            with span("split"):
+                chunks = self.split_documents(documents)
             if not chunks:
                 logger.warning("No chunks created from documents")
-                return {"documents_count": len(documents), "chunks_count": 0}
+                return {"documents_count": len(documents), "chunks_count": 0, "text_cache": text_cache_summary}
             
-            chunks_with_embeddings = self.embed_chunks(chunks)
+            summary = {
+                "documents_count": len(documents),
+                "chunks_count": len(chunks),
+                "text_cache": text_cache_summary
+            }
             
-            self.upload_to_azure_search(chunks_with_embeddings)
+            if self.backend == "bm25":
+                with span("index_locally"):
+                    self.index_locally(chunks)
+            else:
+                summary["resume"] = self._embed_and_upload(chunks)
             
             logger.info("Document processing completed successfully")
+            return summary
             
         except Exception as e:
             logger.error(f"Document processing failed: {e}")
             raise
     
+    def ensure_incremental_index(self):
+        """
+        Create missing indexes and check that chunks can be found by file:
+        process_files and delete_sources filter on source, which indexes
+        created before it was filterable do not allow.
+        """
+        if self.backend == "bm25" or getattr(self, "_index_ready", False):
+            return
+        self.create_search_index()
+        for index_name in self.physical_indexes.values():
+            index = self.index_client.get_index(index_name)
+            source = next((field for field in index.fields if field.name == "source"), None)
+            if source is None or not source.filterable:
+                raise RuntimeError(
+                    f"Index {index_name} has no filterable source field, so changed and deleted files "
+                    f"cannot replace their chunks; rebuild it with reindex.py"
+                )
+        self._index_ready = True
+    
+    def process_files(self, file_paths: List[str], tags: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        ingest just these files, replacing whatever was indexed for them before
+        
+        Raises:
+            IncompleteUploadError: when some chunks of a file were not uploaded; that
+                file keeps its previous chunks and can be retried, the others are done
+        """
+        with entry_point("rag.ingest"), profile_request("process_files"):
+            self.ensure_incremental_index()
+            
+            documents = self.load_files(file_paths, tags)
+            chunks = self.split_documents(documents)
+            # only files that loaded; a half-written file keeps its previous chunks until it loads
+            sources = {doc.source for doc in documents}
+            
+            if self.backend == "bm25":
+                removed = sum(self.local_index.delete_source(source) for source in sources)
+                self.index_locally(chunks)
+            else:
+                failed_sources = []
+                if chunks:
+                    failed_sources = self._embed_and_upload(chunks)["failed_sources"]
+                # new chunks are searchable before the old ones of a changed file go away, and a
+                # file whose new chunks did not all upload keeps its old ones until a retry succeeds
+                removed = self._remove_chunks(sources - set(failed_sources), keep_ids={chunk.id for chunk in chunks})
+                if failed_sources:
+                    raise IncompleteUploadError(failed_sources)
+            
+            return {"files_count": len(sources), "chunks_count": len(chunks), "removed_count": removed}
+    
+    def delete_sources(self, sources: List[str]) -> int:
+        """remove every chunk that came from these files"""
+        if self.backend == "bm25":
+            removed = sum(self.local_index.delete_source(source) for source in sources)
+            self.local_index.save(self.local_index_path)
+        else:
+            self.ensure_incremental_index()
+            removed = self._remove_chunks(set(sources))
+        logger.info(f"Removed {removed} chunks of {len(sources)} deleted files")
+        return removed
+    
+    def _remove_chunks(self, sources, keep_ids=frozenset()) -> int:
+        if not sources:
+            return 0
+        source_filter = build_odata_filter({"source": sorted(sources)})
+        removed = 0
+        for index_name, search_client in self.search_clients.items():
+            stale = [
+                {"id": result["id"]}
+                for result in search_client.search(search_text="*", filter=source_filter, select=["id"])
+                if result["id"] not in keep_ids
+            ]
+            for i in range(0, len(stale), 1000):
+                search_client.delete_documents(documents=stale[i:i + 1000])
+            if stale:
+                logger.info(f"Deleted {len(stale)} stale chunks from {index_name}")
+            removed += len(stale)
+        return removed
+    
 DocumentUploader = EnhancedDocumentUploader
 
 def main():
-    """Main function for testing"""
-    documents_folder = r"src\langchain_rag\docs"
+    parser = argparse.ArgumentParser(description="Upload documents to the search index")
+    parser.add_argument("path", nargs="?", default=str(Path(__file__).parent / "docs"),
+                        help="folder with the documents (default: the docs folder next to this script)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and ingest files as they are added, changed or deleted")
+    parser.add_argument("--initial", action="store_true",
+                        help="with --watch, ingest what is already in the folder first")
+    parser.add_argument("--tags", default="", help="comma separated tags stored on every chunk")
+    args = parser.parse_args()
+    tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
     
     try:
         uploader = EnhancedDocumentUploader()
-        result = uploader.process_documents(documents_folder)
-        print(f"Processing completed: {result}")
+        if not args.watch or args.initial:
+            result = uploader.process_documents(args.path, tags)
+            print(f"Processing completed: {result}")
+        if args.watch:
+            from folder_watch import FolderWatcher
+            FolderWatcher(uploader, args.path, tags).run()
         
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,221 @@
+"""
+Watch mode for EnhancedDocumentUploader.
+
+A watchdog observer reports file events under a folder; events are debounced
+per file (an editor or a copy fires several in a row) and the files that have
+been quiet for WATCH_DEBOUNCE_SECONDS are ingested together as one small batch.
+Whether a path is ingested or removed is decided when its batch runs: a file
+that still exists is (re)ingested and replaces its previous chunks, a missing
+one has its chunks deleted. Nothing is rescanned, so a drop is searchable in
+roughly the debounce time plus the ingestion time of that one batch.
+
+After each batch the lag from the first event to searchable is logged on the
+``ingest.lag`` logger with ``custom_dimensions`` (shipped as a metric by
+AzureLogHandler).
+
+Settings (environment):
+    WATCH_DEBOUNCE_SECONDS   quiet time before a changed file is ingested (default 2)
+    WATCH_MAX_WAIT_SECONDS   a file that keeps changing is ingested after this anyway (default 30)
+    WATCH_MAX_BATCH_FILES    files per micro-batch (default 50)
+    WATCH_POLLING            1 to poll instead of using OS events (network shares, some containers)
+
+usage:
+    python docs_to_storage.py docs --watch
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+logger = logging.getLogger(__name__)
+lag_logger = logging.getLogger("ingest.lag")
+
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class PendingChange:
+    first_seen: float       # wall clock of the first event, for the lag metric
+    last_event: float       # monotonic time of the latest event
+    first_event: float      # monotonic time of the first event
+    attempts: int = 0
+
+
+class ChangeBatcher:
+    """collects changed paths and hands out batches of the ones that have settled"""
+
+    def __init__(self, debounce: float = 2.0, max_wait: float = 30.0, max_files: int = 50):
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.max_files = max_files
+        self._pending: Dict[str, PendingChange] = {}
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, path: str, change: Optional[PendingChange] = None):
+        now = time.monotonic()
+        with self._cond:
+            existing = self._pending.get(path)
+            if change is not None:
+                self._pending[path] = change
+            elif existing is None:
+                self._pending[path] = PendingChange(time.time(), now, now)
+            else:
+                existing.last_event = now
+            self._cond.notify()
+
+    def _ready(self, now: float) -> List[str]:
+        return [
+            path for path, change in self._pending.items()
+            if now - change.last_event >= self.debounce or now - change.first_event >= self.max_wait
+        ]
+
+    def next_batch(self, stop: threading.Event) -> Dict[str, PendingChange]:
+        """block until some paths have settled (or `stop` is set) and take up to max_files of them"""
+        with self._cond:
+            while not stop.is_set():
+                now = time.monotonic()
+                ready = self._ready(now)
+                if ready:
+                    ready.sort(key=lambda path: self._pending[path].first_event)
+                    return {path: self._pending.pop(path) for path in ready[:self.max_files]}
+                if self._pending:
+                    wait = min(
+                        min(change.last_event + self.debounce, change.first_event + self.max_wait)
+                        for change in self._pending.values()
+                    ) - now
+                else:
+                    wait = 0.5
+                self._cond.wait(max(min(wait, 0.5), 0.01))
+        return {}
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "FolderWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type in ("opened", "closed_no_write"):
+            return
+        self.watcher.notify(event.src_path)
+        dest_path = getattr(event, "dest_path", "")
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class FolderWatcher:
+    def __init__(self, uploader, path: str, tags: Optional[List[str]] = None,
+                 debounce: Optional[float] = None, max_wait: Optional[float] = None,
+                 max_files: Optional[int] = None, polling: Optional[bool] = None):
+        self.uploader = uploader
+        self.path = Path(path)
+        self.tags = tags
+        self.batcher = ChangeBatcher(
+            debounce=debounce if debounce is not None else float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2")),
+            max_wait=max_wait if max_wait is not None else float(os.getenv("WATCH_MAX_WAIT_SECONDS", "30")),
+            max_files=max_files or int(os.getenv("WATCH_MAX_BATCH_FILES", "50")),
+        )
+        if polling is None:
+            polling = os.getenv("WATCH_POLLING", "0").lower() in ("1", "true", "yes", "on")
+        self._observer = PollingObserver() if polling else Observer()
+        self._stop = threading.Event()
+        self.lags = deque(maxlen=1000)
+        self.batches = 0
+
+    def notify(self, path: str):
+        path = Path(path)
+        # editor swap files and Office lock files are never documents
+        if path.name.startswith((".", "~$")) or not self.uploader.is_supported(path):
+            return
+        self.batcher.add(str(path))
+
+    def process_batch(self, batch: Dict[str, PendingChange]):
+        present = [path for path in batch if os.path.isfile(path)]
+        missing = [path for path in batch if path not in present]
+        try:
+            if missing:
+                self.uploader.delete_sources(missing)
+            if present:
+                self.uploader.process_files(present, self.tags)
+        except Exception as e:
+            # an incomplete upload names the files to retry; any other error retries the batch
+            failed = set(getattr(e, "sources", None) or batch) & set(batch)
+            logger.exception(f"Ingesting {len(failed)} of {len(batch)} changed files failed")
+            for path in failed:
+                change = batch.pop(path)
+                change.attempts += 1
+                if change.attempts < MAX_ATTEMPTS:
+                    # keep first_seen, so the lag includes the failed attempts
+                    change.last_event = time.monotonic()
+                    self.batcher.add(path, change)
+                else:
+                    logger.error(f"Giving up on {path} after {change.attempts} attempts")
+            if not batch:
+                return
+            present = [path for path in present if path in batch]
+
+        self.batches += 1
+        now = time.time()
+        batch_lags = [now - change.first_seen for change in batch.values()]
+        self.lags.extend(batch_lags)
+        lag_logger.info(
+            f"Ingested {len(present)} changed and {len(missing)} deleted files, "
+            f"lag {max(batch_lags):.1f}s",
+            extra={"custom_dimensions": {
+                "metric": "ingestion_lag_seconds",
+                "max": round(max(batch_lags), 3),
+                "mean": round(sum(batch_lags) / len(batch_lags), 3),
+                "files": len(batch),
+                "pending": len(self.batcher)
+            }}
+        )
+
+    def stats(self) -> Dict[str, float]:
+        lags = sorted(self.lags)
+        if not lags:
+            return {"batches": self.batches, "files": 0}
+        return {
+            "batches": self.batches,
+            "files": len(lags),
+            "lag_p50": lags[len(lags) // 2],
+            "lag_p95": lags[min(int(len(lags) * 0.95), len(lags) - 1)],
+            "lag_max": lags[-1]
+        }
+
+    def start(self):
+        if not self.path.is_dir():
+            raise FileNotFoundError(f"Path {self.path} not found")
+        # fail now rather than on every batch when the index cannot replace a file's chunks
+        self.uploader.ensure_incremental_index()
+        self._observer.schedule(_ChangeHandler(self), str(self.path), recursive=True)
+        self._observer.start()
+        logger.info(f"Watching {self.path} for document changes")
+
+    def stop(self):
+        self._stop.set()
+        self._observer.stop()
+        self._observer.join()
+
+    def run(self):
+        """ingest changes until interrupted"""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                batch = self.batcher.next_batch(self._stop)
+                if batch:
+                    self.process_batch(batch)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            logger.info(f"Stopped watching {self.path}: {self.stats()}")
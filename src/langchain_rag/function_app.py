@@ -3,10 +3,18 @@ import json
 import logging
 import tempfile
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from main import SimpleTravelRAG
 from docs_to_storage import DocumentUploader
+from metering import BudgetExceededError
+from deadline import DeadlineExceeded, deadline, request_timeout
+from retrievers import build_odata_filter
+from logging_pipeline import queue_handler
+from precompute import PrecomputeScheduler
+from profiling import header_requests_profile, profile_request, span
+from sharding import get_index_pointer
 import uuid
 
 from opencensus.ext.azure.log_exporter import AzureLogHandler
@@ -15,24 +23,62 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 if os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING'):
-    handler = AzureLogHandler()
+    # AzureLogHandler runs on the queue listener thread, not on the request path
+    handler = queue_handler(AzureLogHandler())
     logger.addHandler(handler)
+    logging.getLogger("llm.usage").addHandler(handler)
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
 rag_system = None
+rag_system_key = None
 document_uploader = None
+document_uploader_version = None
+uploads_processed = 0
+_components_lock = threading.Lock()
+index_pointer = get_index_pointer()
+
+def _rag_system_key():
+    # a new index generation (reindex.py) or new uploads call for a fresh RAG system
+    return index_pointer.version(), uploads_processed
 
 def get_rag_system():
-    global rag_system
-    if rag_system is None:
-        rag_system = SimpleTravelRAG()
+    """
+    The RAG system for the live index generation. When it is out of date one
+    request builds the replacement while the others keep answering from the
+    current one; the swap is a single reference assignment under the lock.
+    """
+    global rag_system, rag_system_key
+    if rag_system is not None and rag_system_key == _rag_system_key():
+        return rag_system
+    if not _components_lock.acquire(blocking=rag_system is None):
+        return rag_system
+    try:
+        key = _rag_system_key()
+        if rag_system is None or rag_system_key != key:
+            switched = rag_system_key is not None and rag_system_key[0] != key[0]
+            rag_system, rag_system_key = SimpleTravelRAG(), key
+            if switched:
+                logger.info(f"Serving index generation version {key[0]}")
+                precompute_scheduler.schedule()
+    finally:
+        _components_lock.release()
     return rag_system
 
+# answers for popular questions are recomputed whenever an upload changes the index
+precompute_scheduler = PrecomputeScheduler(
+    lambda: get_rag_system(),
+    top_n=int(os.environ.get('PRECOMPUTE_TOP', 300))
+)
+
 def get_document_uploader():
-    global document_uploader
-    if document_uploader is None:
-        document_uploader = DocumentUploader()
+    global document_uploader, document_uploader_version
+    version = index_pointer.version()
+    # uploads always go to the generation that is live now
+    if document_uploader is None or document_uploader_version != version:
+        with _components_lock:
+            if document_uploader is None or document_uploader_version != version:
+                document_uploader, document_uploader_version = DocumentUploader(), version
     return document_uploader
 
 def raise_error():
@@ -46,8 +92,13 @@ def ask_rag(req: func.HttpRequest) -> func.HttpResponse:
     HTTP trigger function for travel questions using RAG system.
     
     Usage:
-    POST: {"question": "What hotels are available in Paris?"}
-    GET: ?question=What hotels are available in Paris?
+    POST: {"question": "What hotels are available in Paris?", "filters": {"title": "Paris Brochure"},
+           "session_id": "optional id that keeps conversation context between questions",
+           "timeout_ms": 5000}
+    GET: ?question=What hotels are available in Paris?&filters={"file_type": "pdf"}&timeout_ms=5000
+    Send the header X-Profile: 1 to write a profile of the request (see profiling.py).
+    The timeout can also be sent as the X-Request-Timeout-Ms header; it is capped
+    by REQUEST_TIMEOUT_MS, and a request that runs out of time gets a 504.
     
     Returns:
     JSON response with answer and metadata
@@ -59,11 +110,17 @@ def ask_rag(req: func.HttpRequest) -> func.HttpResponse:
         logger.info(f"trace_id={trace_id} Processing request")
 
         question = None
+        filters = None
+        session_id = None
+        timeout_ms = None
         
         if req.method == "POST":
             try:
                 req_body = req.get_json()
                 question = req_body.get("question") if req_body else None
+                filters = req_body.get("filters") if req_body else None
+                session_id = req_body.get("session_id") if req_body else None
+                timeout_ms = req_body.get("timeout_ms") if req_body else None
             except ValueError:
                 return func.HttpResponse(
                     json.dumps({"error": "Invalid JSON", "status": "error"}),
@@ -72,18 +129,84 @@ def ask_rag(req: func.HttpRequest) -> func.HttpResponse:
                 )
         else: 
             question = req.params.get("question")
+            session_id = req.params.get("session_id")
+            timeout_ms = req.params.get("timeout_ms")
 
             if req.params.get("test_error") == "true":
                 raise_error()
+            
+            if req.params.get("filters"):
+                try:
+                    filters = json.loads(req.params.get("filters"))
+                except ValueError:
+                    return func.HttpResponse(
+                        json.dumps({"error": "filters must be a JSON object", "status": "error"}),
+                        status_code=400,
+                        mimetype="application/json"
+                    )
         
-        rag = get_rag_system()
-        result = rag.ask(question.strip())
+        if not isinstance(question, str) or not question.strip():
+            return func.HttpResponse(
+                json.dumps({"error": "Question is required", "status": "error"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        try:
+            build_odata_filter(filters)
+        except (TypeError, ValueError) as e:
+            return func.HttpResponse(
+                json.dumps({"error": f"Invalid filters: {str(e)}", "status": "error"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        try:
+            timeout = request_timeout(timeout_ms if timeout_ms is not None else req.headers.get("X-Request-Timeout-Ms"))
+        except (TypeError, ValueError) as e:
+            return func.HttpResponse(
+                json.dumps({"error": f"Invalid timeout_ms: {str(e)}", "status": "error"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        with deadline(timeout), profile_request("ask_rag", force=header_requests_profile(req.headers)):
+            rag = get_rag_system()
+            result = rag.ask(question.strip(), filters=filters, session_id=session_id or None)
+            
+            with span("json_serialization"):
+                body = json.dumps(result, ensure_ascii=False)
         
         return func.HttpResponse(
-            json.dumps(result, ensure_ascii=False),
+            body,
             status_code=200,
             mimetype="application/json"
         )
+
+    except BudgetExceededError as e:
+        logger.warning(f"trace_id={trace_id} LLM budget exceeded: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "status": "error",
+                "timestamp": datetime.now().isoformat()
+            }),
+            status_code=429,
+            mimetype="application/json"
+        )
+    
+    except DeadlineExceeded as e:
+        logger.warning(f"trace_id={trace_id} {str(e)}")
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "stage": e.stage,
+                "status": "error",
+                "timestamp": datetime.now().isoformat()
+            }),
+            status_code=504,
+            mimetype="application/json"
+        )
         
     except Exception as e:
         logger.exception(f"trace_id={trace_id} Error in ask_rag: {str(e)}")
@@ -169,11 +292,16 @@ def upload_documents(req: func.HttpRequest) -> func.HttpResponse:
                     mimetype="application/json"
                 )
             
+            tags = [tag.strip() for tag in (req.form.get('tags') or "").split(",") if tag.strip()]
+            
             uploader = get_document_uploader()
-            uploader.process_documents(temp_dir)
+            with profile_request("upload_documents", force=header_requests_profile(req.headers)):
+                uploader.process_documents(temp_dir, tags=tags)
             
-            global rag_system
-            rag_system = None
+            global uploads_processed
+            with _components_lock:
+                uploads_processed += 1
+            precompute_scheduler.schedule()
             
             response_data = {
                 "status": "success",
@@ -0,0 +1,139 @@
+"""
+Crash-safe journal for document ingestion runs.
+
+A run is identified by the content-hash ids of its chunks plus the target
+indexes and embedding model, so rerunning the same input after a failure finds
+the same journal. The journal directory holds:
+
+    journal.jsonl        append-only, fsynced events (embedded batches, uploaded keys, finished files)
+    batches/<n>.bin      embedded vectors of batch n: a json header line with the chunk ids,
+                         then little-endian float32 values
+
+On resume, chunks whose upload was acknowledged are skipped entirely and chunks
+with saved vectors are not embedded again. The directory is removed once the
+run completes. Location: INGEST_JOURNAL_DIR (default .cache/ingest_journal).
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from records import VectorBatch
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_key(source: str, file_hash: str, page: Optional[int], chunk_index: int, content: str) -> str:
+    """
+    deterministic chunk id: the same file at the same path always yields the
+    same ids, and identical copies at different paths never share one
+    """
+    raw = f"{source}\0{file_hash}\0{page}\0{chunk_index}\0{content}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:40]
+
+
+def run_key(chunk_ids: Iterable[str], *settings: str) -> str:
+    digest = hashlib.sha256()
+    for setting in settings:
+        digest.update(f"{setting}\0".encode("utf-8"))
+    for chunk_id in sorted(chunk_ids):
+        digest.update(chunk_id.encode("ascii"))
+    return digest.hexdigest()[:24]
+
+
+class IngestJournal:
+    def __init__(self, run_dir):
+        self.run_dir = Path(run_dir)
+        self.batches_dir = self.run_dir / "batches"
+        self.batches_dir.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.run_dir / "journal.jsonl"
+        self._lock = threading.Lock()
+
+        self.uploaded_keys = set()
+        self.finished_files = set()
+        self._batch_files: List[str] = []
+        self._replay()
+        self.resumed = bool(self.uploaded_keys or self._batch_files)
+
+    @classmethod
+    def for_run(cls, chunk_ids: Iterable[str], *settings: str, root: Optional[str] = None) -> "IngestJournal":
+        root = Path(root or os.getenv("INGEST_JOURNAL_DIR", ".cache/ingest_journal"))
+        return cls(root / run_key(chunk_ids, *settings))
+
+    def _replay(self):
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # a torn last line from a crash mid-write; everything before it is intact
+                    logger.warning(f"Ignoring truncated journal line in {self.journal_path}")
+                    continue
+                kind = event.get("event")
+                if kind == "embedded":
+                    self._batch_files.append(event["file"])
+                elif kind == "uploaded":
+                    self.uploaded_keys.update(event["keys"])
+                elif kind == "file_done":
+                    self.finished_files.add(event["source"])
+
+    def _append(self, event: Dict):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def embeddings(self) -> Dict[str, Tuple[VectorBatch, int]]:
+        """vectors saved by earlier attempts of this run: chunk id -> (batch, row)"""
+        vectors = {}
+        for name in self._batch_files:
+            path = self.batches_dir / name
+            try:
+                with open(path, "rb") as f:
+                    header = json.loads(f.readline())
+                    batch = VectorBatch.from_bytes(header["dimensions"], f.read())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable embedding batch {path.name}: {e}")
+                continue
+            for i, chunk_id in enumerate(header["ids"]):
+                vectors[chunk_id] = (batch, i)
+        return vectors
+
+    def record_embeddings(self, chunk_ids: List[str], vectors: VectorBatch):
+        if not chunk_ids:
+            return
+
+        name = f"{len(self._batch_files):06d}.bin"
+        path = self.batches_dir / name
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps({"ids": chunk_ids, "dimensions": vectors.dimensions}).encode("utf-8") + b"\n")
+            f.write(vectors.to_bytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        self._batch_files.append(name)
+        self._append({"event": "embedded", "file": name, "count": len(chunk_ids)})
+
+    def record_uploaded(self, keys: List[str]):
+        if not keys:
+            return
+        self.uploaded_keys.update(keys)
+        self._append({"event": "uploaded", "keys": keys})
+
+    def record_file_done(self, source: str):
+        self.finished_files.add(source)
+        self._append({"event": "file_done", "source": source})
+
+    def complete(self):
+        """the run finished: nothing left to resume"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
@@ -0,0 +1,197 @@
+"""
+Non-blocking logging for the RAG service.
+
+Request threads only put records on a bounded in-memory queue; a background
+QueueListener formats them and ships them to the real handlers (rotating JSON
+file, console, Application Insights). When the queue is full the record is
+dropped and counted instead of blocking the caller, and large payloads (full
+answers, retrieved context) are truncated except for a sampled fraction.
+
+Settings (environment):
+    LOG_FILE                  json log file of main.py (default logs/travel_assistant_rag.log)
+    LOG_QUEUE_SIZE            records buffered before dropping (default 10000)
+    LOG_MAX_BYTES             log file size before rotation (default 10 MB)
+    LOG_BACKUP_COUNT          rotated files kept (default 5)
+    LOG_MAX_PAYLOAD_CHARS     longer messages/dimensions are truncated (default 2000)
+    LOG_PAYLOAD_SAMPLE_RATE   fraction of long payloads kept whole (default 0.1)
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line, with `extra` fields and custom_dimensions kept as fields"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: full queue -> record dropped and counted"""
+
+    def __init__(self, log_queue, max_payload_chars=2000, sample_rate=0.1):
+        super().__init__(log_queue)
+        self.max_payload_chars = max_payload_chars
+        self.sample_rate = sample_rate
+        self.enqueued = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+        self._lock = threading.Lock()
+
+    def _shrink(self, text):
+        if len(text) <= self.max_payload_chars or random.random() < self.sample_rate:
+            return text
+        return f"{text[:self.max_payload_chars]}... [truncated {len(text) - self.max_payload_chars} chars]"
+
+    def prepare(self, record):
+        # cheap on purpose: formatting (and traceback rendering) happens on the listener thread
+        record = copy.copy(record)
+        record.msg = self._shrink(record.getMessage())
+        record.args = None
+        dimensions = getattr(record, "custom_dimensions", None)
+        if isinstance(dimensions, dict):
+            record.custom_dimensions = {
+                key: self._shrink(value) if isinstance(value, str) else value
+                for key, value in dimensions.items()
+            }
+        return record
+
+    def enqueue(self, record):
+        with self._lock:
+            if self._unreported_drops:
+                notice = logging.LogRecord(
+                    "logging_pipeline", logging.WARNING, __file__, 0,
+                    "Log queue was full, dropped %d records", (self._unreported_drops,), None
+                )
+                try:
+                    self.queue.put_nowait(notice)
+                    self._unreported_drops = 0
+                except queue.Full:
+                    pass
+            try:
+                self.queue.put_nowait(record)
+                self.enqueued += 1
+            except queue.Full:
+                self.dropped += 1
+                self._unreported_drops += 1
+
+    def handleError(self, record):
+        # a logging failure must never surface on the request path
+        pass
+
+
+_listeners = []
+_listeners_lock = threading.Lock()
+_root_configured = False
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def queue_handler(*handlers, maxsize=None):
+    """
+    Start a background listener feeding `handlers` and return the handler
+    callers attach to their loggers.
+    """
+    maxsize = maxsize or _env_int("LOG_QUEUE_SIZE", 10000)
+    log_queue = queue.Queue(maxsize=maxsize)
+    handler = DroppingQueueHandler(
+        log_queue,
+        max_payload_chars=_env_int("LOG_MAX_PAYLOAD_CHARS", 2000),
+        sample_rate=float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1")),
+    )
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    with _listeners_lock:
+        _listeners.append((listener, handler))
+        if len(_listeners) == 1:
+            atexit.register(shutdown)
+    return handler
+
+
+def configure_logging(log_file=None, level=logging.INFO, console=True):
+    """
+    Route the root logger through the queue: json lines to a rotating
+    `log_file` and plain text to stdout. Safe to call more than once.
+
+    Like logging.basicConfig, this does nothing when the root logger already
+    has handlers: the Functions host (and pytest) install their own, and a
+    second set would emit every record twice.
+    """
+    global _root_configured
+    with _listeners_lock:
+        if _root_configured:
+            return
+        _root_configured = True
+        if logging.getLogger().handlers:
+            return
+
+    handlers = []
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=_env_int("LOG_MAX_BYTES", 10 * 1024 * 1024),
+            backupCount=_env_int("LOG_BACKUP_COUNT", 5),
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(stream=sys.stdout)
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler(*handlers))
+
+
+def pipeline_stats():
+    with _listeners_lock:
+        handlers = [handler for _, handler in _listeners]
+    return {
+        "enqueued": sum(handler.enqueued for handler in handlers),
+        "dropped": sum(handler.dropped for handler in handlers),
+        "queued": sum(handler.queue.qsize() for handler in handlers),
+    }
+
+
+def shutdown():
+    """flush what is queued and stop the listener threads"""
+    with _listeners_lock:
+        listeners, _listeners[:] = list(_listeners), []
+    for listener, _ in listeners:
+        try:
+            listener.stop()
+        except queue.Full:
+            pass
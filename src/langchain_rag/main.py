@@ -1,49 +1,64 @@
 import os
 import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 from langchain_openai import AzureChatOpenAI
-from langchain_community.retrievers import AzureAISearchRetriever
 from langchain_core.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+from metering import MeteringCallbackHandler, entry_point, get_meter
+from retrievers import build_retriever, build_odata_filter, with_filter
+from logging_pipeline import configure_logging
+from conversation import get_conversation_store
+from precompute import get_precomputed_answers
+from profiling import profile_request, span
+from context_packer import ContextPacker
+from cascade import cascade_from_env
+from deadline import Hedger, invoke_llm, stage
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/travel_assistant_rag.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging(log_file=os.getenv('LOG_FILE', 'logs/travel_assistant_rag.log'))
 logger = logging.getLogger(__name__)
 
+# answers.json is rewritten on every question; keep that off the request path. One writer
+# per process: RAG systems rebuilt after an upload or index switch share it, so their
+# read-modify-write cycles never interleave.
+_log_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="answers-log")
+
 class SimpleTravelRAG:
     def __init__(self):
         load_dotenv()
         self._setup_components()
         
-    def _setup_components(self):
-        # Setup LLM
-        self.llm = AzureChatOpenAI(
-            azure_deployment=os.getenv("CHAT_MODEL"),
+    @staticmethod
+    def _chat_model(deployment):
+        return AzureChatOpenAI(
+            azure_deployment=deployment,
             api_version="2024-02-01",
             azure_endpoint=os.getenv("OPENAI_ENDPOINT"),
             api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=0.2
+            temperature=0.2,
+            # deadline.invoke_llm retries within the request deadline instead
+            max_retries=0,
+            callbacks=[MeteringCallbackHandler()]
         )
+    
+    def _setup_components(self):
+        # Setup LLM; with FAST_CHAT_MODEL set, answers try the fast deployment first (cascade.py)
+        self.llm = self._chat_model(os.getenv("CHAT_MODEL"))
+        self.cascade = cascade_from_env(self.llm, self._chat_model)
+        # rewriting a follow-up into a search query is simple enough for the fast tier
+        self.rewrite_llm = self.cascade.fast_llm or self.llm
         
-        # Setup search retriever
-        self.retriever = AzureAISearchRetriever(
-            service_name=os.getenv("SEARCH_ENDPOINT"),
-            index_name=os.getenv("NEW_INDEX_NAME"),
-            api_key=os.getenv("SEARCH_KEY"),
-            content_key=os.getenv("CONTENT_KEY", "content"),
-            top_k=3
-        )
+        # Setup search retriever (fans out when SEARCH_INDEXES lists several indexes);
+        # it over-fetches and the packer keeps what fits the prompt budget
+        self.retriever = build_retriever(top_k=int(os.getenv("CONTEXT_CANDIDATES", "8")))
+        self.packer = ContextPacker.from_env()
+        # a search slower than the recent p95 gets a duplicate, see deadline.py
+        self.hedger = Hedger.from_env("retrieval")
         
         self.prompt = PromptTemplate(
-            input_variables=["context", "question"],
+            input_variables=["context", "history", "question"],
             template="""
 You are a travel assistant. Based on the provided information from Margie's Travel brochures, 
 provide helpful information about travel destinations, accommodations, and services.
@@ -51,51 +66,199 @@ provide helpful information about travel destinations, accommodations, and servi
 Context from search results:
 {context}
 
+Conversation so far:
+{history}
+
 User question: {question}
 
 Answer (use only information from the context):
 """
         )
         
-        # Create QA chain
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.retriever,
-            chain_type_kwargs={"prompt": self.prompt}
+        self.condense_prompt = PromptTemplate(
+            input_variables=["history", "question"],
+            template="""
+Rewrite the follow-up question as a standalone search query for travel brochures.
+Resolve pronouns and references using the conversation. Reply with the query only.
+
+Conversation:
+{history}
+
+Follow-up question: {question}
+
+Standalone query:
+"""
+        )
+        
+        self.summary_prompt = PromptTemplate(
+            input_variables=["summary", "turns"],
+            template="""
+Update the summary of a conversation between a traveller and a travel assistant.
+Keep destinations, dates, preferences and facts already given; drop small talk.
+Use at most 120 words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:
+"""
         )
+        
+        self.conversations = get_conversation_store()
+        self.precomputed = get_precomputed_answers()
+    
+    def _condense_question(self, history, question):
+        """a standalone search query for a follow-up question"""
+        with entry_point("rag.condense"):
+            message = invoke_llm(self.rewrite_llm, self.condense_prompt.format(history=history, question=question))
+        return message.content.strip() or question
+    
+    def _summarize(self, summary, turns):
+        turns_text = "\n".join(turn.text() for turn in turns)
+        message = invoke_llm(self.llm, self.summary_prompt.format(summary=summary or "(none)", turns=turns_text))
+        return message.content
     
-    def ask(self, question):
-        result = self.qa_chain.invoke({"query": question})
+    def ask(self, question, filters=None, session_id=None):
+        """
+        Answer a question from the indexed brochures.
+        
+        filters (dict, optional) restrict the search before ranking, e.g.
+        {"title": "London Brochure", "page": {"lte": 2}, "tags": ["europe"]};
+        see retrievers.build_odata_filter for the supported keys.
+        
+        session_id (str, optional) keeps a server-side conversation: follow-ups
+        are condensed into a standalone search query and answered with a
+        token-budgeted history of the earlier turns.
+        
+        Sampled requests are profiled, see profiling.py. Inside a
+        deadline.deadline() block every stage is bounded by the time left and
+        deadline.DeadlineExceeded is raised when it runs out.
+        """
+        with profile_request("ask"):
+            return self._ask(question, filters, session_id)
+    
+    def _ask(self, question, filters, session_id):
+        start = time.perf_counter()
+        odata_filter = build_odata_filter(filters)
+        session = self.conversations.get(session_id) if session_id else None
+        history = self.conversations.history(session) if session else ""
+        
+        # popular questions without filters or prior context have a precomputed answer
+        with span("precomputed_lookup"):
+            precomputed = None if odata_filter or history else self.precomputed.lookup(question)
+        if precomputed:
+            answer, search_query, details = precomputed["answer"], question, None
+        else:
+            with entry_point("rag.ask"):
+                answer, search_query, details = self.answer(question, filters, history)
+        
+        if session:
+            self.conversations.add_turn(session, question, answer, summarize=self._summarize)
+        
         response_data = {
             "timestamp": datetime.now().isoformat(),
             "question": question,
-            "answer": result["result"]
+            "answer": answer
         }
+        if odata_filter:
+            response_data["filters"] = filters
+        if session:
+            response_data["session_id"] = session_id
+            response_data["search_query"] = search_query
+        if precomputed:
+            response_data["precomputed"] = True
+        if details:
+            response_data["tokens_saved"] = details["context"]["tokens_saved"]
+            response_data["model_tier"] = details["route"]["tier"]
+            response_data["retrieval_hedged"] = details["retrieval"]["hedged"]
         
-        logger.info(f"Question: {question}")
-        logger.info(f"Answer: {result['result']}")
-        
-        self._save_to_json(response_data)
+        with span("logging"):
+            logger.info(
+                f"Question: {question}",
+                extra={"custom_dimensions": {
+                    "question": question,
+                    "answer": answer,
+                    "filter": odata_filter or "",
+                    "search_query": search_query,
+                    "session_id": session_id or "",
+                    "precomputed": bool(precomputed),
+                    "context_chunks": details["context"]["chunks"] if details else 0,
+                    "context_tokens": details["context"]["context_tokens"] if details else 0,
+                    "tokens_saved": details["context"]["tokens_saved"] if details else 0,
+                    "model_tier": details["route"]["tier"] if details else "",
+                    "escalation_reason": (details["route"]["reason"] or "") if details else "",
+                    "retrieval_hedged": details["retrieval"]["hedged"] if details else False,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2)
+                }}
+            )
+            _log_writer.submit(self._save_to_json, response_data)
         
         return response_data
     
-    def _save_to_json(self, data):
-        filename = "results/answers.json"
+    def answer(self, question, filters=None, history="", force_strong=False):
+        """
+        Retrieve and generate an answer, bypassing precomputed answers.
+        force_strong skips the fast tier of the model cascade.
         
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                responses = json.load(f)
+        Returns:
+            tuple: (answer text, query used for retrieval,
+                    {"context": packing stats, "route": cascade tier and escalation,
+                     "retrieval": whether the search was hedged and its latency})
+        """
+        retriever = with_filter(self.retriever, filters)
+        get_meter().check_budget()
+        if history:
+            with span("condense"), stage("condense"):
+                search_query = self._condense_question(history, question)
         else:
-            responses = []
+            search_query = question
+        
+        with span("retrieval"):
+            documents, retrieval = self.hedger.call(retriever.invoke, search_query)
         
-        responses.append(data)
+        with span("context_packing"):
+            packed = self.packer.pack(documents)
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(responses, f, ensure_ascii=False, indent=2)
+        with span("prompt_build"):
+            prompt_text = self.prompt.format(
+                context=packed.text,
+                question=question,
+                history=history or "(none)"
+            )
+        
+        with span("llm"), stage("generation"):
+            sources = len({doc.metadata.get("source") for doc in packed.documents})
+            content, route = self.cascade.generate(
+                prompt_text, question, packed.text, sources=sources, force_strong=force_strong
+            )
+        return content, search_query, {"context": packed.stats, "route": route, "retrieval": retrieval}
+    
+    def _save_to_json(self, data, filename="results/answers.json"):
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            if os.path.exists(filename):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    responses = json.load(f)
+            else:
+                responses = []
+            
+            responses.append(data)
+            
+            # readers such as the precompute job never see a half-written file
+            tmp_filename = f"{filename}.{os.getpid()}.tmp"
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(responses, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, filename)
+        except Exception as e:
+            # runs on the log writer thread, so nobody else would see the error
+            logger.error(f"Failed to save answer to {filename}: {e}")
 
 def main(): 
     assistant = SimpleTravelRAG()
+    session_id = f"cli-{os.getpid()}"
     
     while True:
         question = input("\nYour question: ").strip()
@@ -106,7 +269,7 @@ def main():
         if not question:
             continue
         
-        result = assistant.ask(question)
+        result = assistant.ask(question, session_id=session_id)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
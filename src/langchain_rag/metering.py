@@ -0,0 +1,358 @@
+"""
+Token and latency metering for every chat and embedding call.
+
+Records are aggregated per entry point and per fixed time window, emitted on the
+``llm.usage`` logger (with ``custom_dimensions`` so AzureLogHandler ships them as
+metrics) and checked against configurable budgets that either warn or block.
+Set ``LLM_USAGE_EXPORT`` to a path to dump the aggregates there at exit.
+Budgets come from ``LLM_BUDGETS``: a JSON list, or a path to a JSON file, e.g.
+``[{"entry_point": "rag.ask", "window_seconds": 3600, "max_prompt_tokens": 200000,
+"action": "block"}]``.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:  # the standalone scripts meter through the gateway, without langchain
+    BaseCallbackHandler = object
+
+logger = logging.getLogger("llm.usage")
+
+_entry_point = contextvars.ContextVar("llm_entry_point", default=None)
+
+
+def _default_entry_point() -> str:
+    main = sys.modules.get("__main__")
+    spec = getattr(main, "__spec__", None)
+    if spec is not None and spec.name:
+        return spec.name
+    return os.path.splitext(os.path.basename(sys.argv[0] or "interactive"))[0] or "interactive"
+
+
+def current_entry_point() -> str:
+    return _entry_point.get() or _default_entry_point()
+
+
+@contextmanager
+def entry_point(name: str):
+    """Attribute every call made inside the block to ``name``."""
+    token = _entry_point.set(name)
+    try:
+        yield
+    finally:
+        _entry_point.reset(token)
+
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """cl100k token count, or a chars/4 estimate when tiktoken or its data is unavailable"""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def estimate_tokens_batch(texts: List[str]) -> List[int]:
+    """estimate_tokens for many texts; tiktoken encodes the batch on several threads"""
+    encoding = _get_encoding()
+    if encoding:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+    return [max(1, len(text) // 4) for text in texts]
+
+
+class BudgetExceededError(RuntimeError):
+    pass
+
+
+@dataclass
+class UsageRecord:
+    entry_point: str
+    kind: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_s: float
+    cached: bool = False
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass
+class Budget:
+    entry_point: str = "*"
+    window_seconds: int = 3600
+    max_prompt_tokens: Optional[int] = None
+    max_completion_tokens: Optional[int] = None
+    max_calls: Optional[int] = None
+    action: str = "warn"
+
+    def matches(self, name: str) -> bool:
+        return self.entry_point in ("*", name)
+
+    def violations(self, totals: "UsageTotals") -> List[str]:
+        checks = (
+            ("prompt_tokens", self.max_prompt_tokens, totals.prompt_tokens),
+            ("completion_tokens", self.max_completion_tokens, totals.completion_tokens),
+            ("calls", self.max_calls, totals.calls),
+        )
+        return [f"{name} {used}/{limit}" for name, limit, used in checks if limit is not None and used >= limit]
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    cached_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_s: float = 0.0
+    max_latency_s: float = 0.0
+
+    def add(self, record: UsageRecord):
+        self.calls += 1
+        self.cached_calls += int(record.cached)
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.latency_s += record.latency_s
+        self.max_latency_s = max(self.max_latency_s, record.latency_s)
+
+    def remove(self, record: UsageRecord):
+        """take an expired record back out; max_latency_s keeps its high-water mark"""
+        self.calls -= 1
+        self.cached_calls -= int(record.cached)
+        self.prompt_tokens -= record.prompt_tokens
+        self.completion_tokens -= record.completion_tokens
+        self.latency_s -= record.latency_s
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["mean_latency_s"] = self.latency_s / self.calls if self.calls else 0.0
+        return data
+
+
+def load_budgets(raw: Optional[str] = None) -> List[Budget]:
+    raw = raw if raw is not None else os.getenv("LLM_BUDGETS", "")
+    if not raw.strip():
+        return []
+    if not raw.lstrip().startswith("["):
+        with open(raw, "r", encoding="utf-8") as f:
+            raw = f.read()
+    budgets = [Budget(**item) for item in json.loads(raw)]
+    for budget in budgets:
+        if budget.action not in ("warn", "block"):
+            raise ValueError(f"Budget action must be 'warn' or 'block', got {budget.action!r}")
+    return budgets
+
+
+class _BudgetWindow:
+    """running totals of the records a budget covers within its sliding window"""
+
+    def __init__(self, window_seconds: int):
+        self.window_seconds = window_seconds
+        self.records: deque = deque()
+        self.totals = UsageTotals()
+
+    def add(self, record: UsageRecord):
+        self.records.append(record)
+        self.totals.add(record)
+
+    def expire(self, now: float):
+        since = now - self.window_seconds
+        while self.records and self.records[0].timestamp < since:
+            self.totals.remove(self.records.popleft())
+
+
+class Meter:
+    def __init__(self, window_seconds: int = 60, retention_windows: int = 60,
+                 budgets: Optional[List[Budget]] = None):
+        self.window_seconds = window_seconds
+        self.retention_windows = retention_windows
+        self.budgets = budgets or []
+        self._lock = threading.Lock()
+        self._totals: Dict[str, UsageTotals] = {}
+        self._windows: Dict[float, Dict[str, UsageTotals]] = {}
+        self._current_window: Optional[float] = None
+        self._budget_windows = [_BudgetWindow(budget.window_seconds) for budget in self.budgets]
+        self._warned: set = set()
+
+    def _window_start(self, ts: float) -> float:
+        return ts - ts % self.window_seconds
+
+    def record(self, record: UsageRecord):
+        window = self._window_start(record.timestamp)
+        closed = None
+
+        with self._lock:
+            self._totals.setdefault(record.entry_point, UsageTotals()).add(record)
+            self._windows.setdefault(window, {}).setdefault(record.entry_point, UsageTotals()).add(record)
+            if self._current_window is not None and window > self._current_window:
+                closed = (self._current_window, self._windows.get(self._current_window, {}))
+            self._current_window = max(window, self._current_window or window)
+            while len(self._windows) > self.retention_windows:
+                self._windows.pop(min(self._windows))
+
+            for budget, budget_window in zip(self.budgets, self._budget_windows):
+                if budget.matches(record.entry_point):
+                    budget_window.add(record)
+
+        logger.info(
+            f"llm_call entry_point={record.entry_point} kind={record.kind} model={record.model} "
+            f"prompt_tokens={record.prompt_tokens} completion_tokens={record.completion_tokens} "
+            f"latency_ms={record.latency_s * 1000:.0f} cached={record.cached}",
+            extra={"custom_dimensions": asdict(record)},
+        )
+        if closed:
+            self._log_window(*closed)
+        self._check(record.entry_point, raise_on_block=False)
+
+    def _log_window(self, window: float, by_entry_point: Dict[str, UsageTotals]):
+        for name, totals in by_entry_point.items():
+            logger.info(
+                f"llm_window entry_point={name} window_start={window:.0f} calls={totals.calls} "
+                f"prompt_tokens={totals.prompt_tokens} completion_tokens={totals.completion_tokens}",
+                extra={"custom_dimensions": {"entry_point": name, "window_start": window, **totals.to_dict()}},
+            )
+
+    def _check(self, name: str, raise_on_block: bool):
+        now = time.time()
+        blocked, warnings = None, []
+        with self._lock:
+            for budget, budget_window in zip(self.budgets, self._budget_windows):
+                if not budget.matches(name):
+                    continue
+                budget_window.expire(now)
+                violations = budget.violations(budget_window.totals)
+                if not violations:
+                    continue
+                scope = budget.entry_point
+                message = f"LLM budget for {scope} over the last {budget.window_seconds}s exceeded: {', '.join(violations)}"
+                if budget.action == "block" and raise_on_block:
+                    blocked = message
+                    break
+                warn_key = (scope, budget.window_seconds, int(now // budget.window_seconds))
+                if warn_key not in self._warned:
+                    if len(self._warned) > 1024:
+                        self._warned.clear()
+                    self._warned.add(warn_key)
+                    warnings.append(message)
+        for message in warnings:
+            logger.warning(message)
+        if blocked:
+            raise BudgetExceededError(blocked)
+
+    def check_budget(self, name: Optional[str] = None):
+        """Raise BudgetExceededError if a blocking budget for ``name`` is already spent."""
+        self._check(name or current_entry_point(), raise_on_block=True)
+
+    @contextmanager
+    def measure(self, kind: str, model: str, name: Optional[str] = None, enforce: bool = True):
+        """
+        Time a call; the caller fills ``usage`` with token counts and cache status.
+        With ``enforce=False`` blocking budgets are not checked first (cache hits).
+        """
+        name = name or current_entry_point()
+        if enforce:
+            self.check_budget(name)
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached": False}
+        start = time.perf_counter()
+        try:
+            yield usage
+        finally:
+            self.record(UsageRecord(
+                entry_point=name,
+                kind=kind,
+                model=model or "unknown",
+                prompt_tokens=usage["prompt_tokens"] or 0,
+                completion_tokens=usage["completion_tokens"] or 0,
+                latency_s=time.perf_counter() - start,
+                cached=usage["cached"],
+            ))
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "window_seconds": self.window_seconds,
+                "entry_points": {name: totals.to_dict() for name, totals in self._totals.items()},
+                "windows": [
+                    {"window_start": window,
+                     "entry_points": {name: totals.to_dict() for name, totals in by_name.items()}}
+                    for window, by_name in sorted(self._windows.items())
+                ],
+            }
+
+    def export(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+
+class MeteringCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that meters every chat model call made through a chain."""
+
+    def __init__(self, meter: Optional["Meter"] = None):
+        self.meter = meter or get_meter()
+        self._starts: Dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = (time.perf_counter(), current_entry_point())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = (time.perf_counter(), current_entry_point())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start, name = self._starts.pop(run_id, (time.perf_counter(), current_entry_point()))
+        llm_output = response.llm_output or {}
+        token_usage = llm_output.get("token_usage") or {}
+        self.meter.record(UsageRecord(
+            entry_point=name,
+            kind="chat",
+            model=llm_output.get("model_name") or "unknown",
+            prompt_tokens=token_usage.get("prompt_tokens", 0),
+            completion_tokens=token_usage.get("completion_tokens", 0),
+            latency_s=time.perf_counter() - start,
+        ))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_meter() -> Meter:
+    global _meter
+    if _meter is None:
+        with _meter_lock:
+            if _meter is None:
+                _meter = Meter(
+                    window_seconds=int(os.getenv("LLM_METER_WINDOW_SECONDS", "60")),
+                    budgets=load_budgets(),
+                )
+                export_path = os.getenv("LLM_USAGE_EXPORT")
+                if export_path:
+                    atexit.register(_meter.export, export_path)
+    return _meter
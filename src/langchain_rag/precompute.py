@@ -0,0 +1,223 @@
+"""
+Precomputed answers for the most frequently asked questions.
+
+The job mines results/answers.json (written by SimpleTravelRAG.ask), groups
+questions by a normalised form, answers the top N against the current index
+and writes them to results/precomputed_answers.json. `ask` looks questions up
+there first; a hit is a dict lookup instead of a search plus an LLM call.
+
+The job reruns in the background after an upload changes the index. Until the
+new set is written, the previous answers keep being served.
+
+usage:
+    python precompute.py --top 300 --min-count 2
+"""
+import os
+import re
+import json
+import time
+import argparse
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from metering import entry_point
+
+logger = logging.getLogger(__name__)
+
+ANSWERS_LOG = "results/answers.json"
+PRECOMPUTED_FILE = "results/precomputed_answers.json"
+
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def mine_questions(log_path: str = ANSWERS_LOG, top_n: int = 300, min_count: int = 2) -> List[Dict[str, Any]]:
+    """the most frequent normalised questions, with the most common original wording"""
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError as e:
+        # a log written by an older version in place, or damaged by hand
+        logger.warning(f"Cannot read {log_path}, nothing to precompute: {e}")
+        return []
+
+    counts = Counter()
+    wordings: Dict[str, Counter] = {}
+    for entry in entries:
+        # filtered answers depend on the filter, so they do not count towards a shared answer
+        question = entry.get("question")
+        if not question or entry.get("filters"):
+            continue
+        key = normalize_question(question)
+        if not key:
+            continue
+        counts[key] += 1
+        wordings.setdefault(key, Counter())[question.strip()] += 1
+
+    return [
+        {"key": key, "question": wordings[key].most_common(1)[0][0], "count": count}
+        for key, count in counts.most_common(top_n)
+        if count >= min_count
+    ]
+
+
+class PrecomputedAnswers:
+    """in-memory lookup over the precomputed file, reloaded when the file changes"""
+
+    def __init__(self, path: str = PRECOMPUTED_FILE, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._answers: Dict[str, Dict[str, Any]] = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._answers)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._answers = data.get("answers", {})
+            self._mtime = mtime
+            logger.info(f"Loaded {len(self._answers)} precomputed answers")
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        self._maybe_reload()
+        return self._answers.get(normalize_question(question))
+
+    def replace(self, answers: Dict[str, Dict[str, Any]]):
+        """write a new answer set atomically and start serving it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"generated_at": datetime.now().isoformat(), "answers": answers},
+                f, ensure_ascii=False, indent=2
+            )
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._answers = answers
+            self._mtime = self.path.stat().st_mtime_ns
+
+
+def precompute_answers(rag, store: PrecomputedAnswers, top_n: int = 300, min_count: int = 2,
+                       log_path: str = ANSWERS_LOG, concurrency: int = 4) -> Dict[str, Any]:
+    start = time.perf_counter()
+    popular = mine_questions(log_path, top_n, min_count)
+    if not popular:
+        logger.info("No popular questions to precompute")
+        return {"questions": 0, "answered": 0, "seconds": 0.0}
+
+    def answer(item):
+        try:
+            with entry_point("rag.precompute"):
+                text, _, _ = rag.answer(item["question"])
+        except Exception as e:
+            logger.warning(f"Could not precompute '{item['question']}': {e}")
+            return None
+        return item["key"], {
+            "question": item["question"],
+            "answer": text,
+            "count": item["count"],
+            "generated_at": datetime.now().isoformat()
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        answers = dict(result for result in executor.map(answer, popular) if result)
+
+    store.replace(answers)
+    seconds = time.perf_counter() - start
+    logger.info(f"Precomputed {len(answers)}/{len(popular)} popular answers in {seconds:.1f}s")
+    return {"questions": len(popular), "answered": len(answers), "seconds": seconds}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_precomputed_answers() -> PrecomputedAnswers:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PrecomputedAnswers(os.getenv("PRECOMPUTED_ANSWERS_PATH", PRECOMPUTED_FILE))
+    return _store
+
+
+class PrecomputeScheduler:
+    """runs the job on a background thread; requests made while it runs coalesce into one rerun"""
+
+    def __init__(self, get_rag, **job_kwargs):
+        self.get_rag = get_rag
+        self.job_kwargs = job_kwargs
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+
+    def schedule(self):
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, name="precompute", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                precompute_answers(self.get_rag(), get_precomputed_answers(), **self.job_kwargs)
+            except Exception:
+                logger.exception("Precompute job failed")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for the most popular questions")
+    parser.add_argument("--top", type=int, default=300, help="how many questions to precompute")
+    parser.add_argument("--min-count", type=int, default=2, help="ignore questions asked fewer times")
+    parser.add_argument("--log", default=ANSWERS_LOG)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    from main import SimpleTravelRAG
+
+    summary = precompute_answers(
+        SimpleTravelRAG(), get_precomputed_answers(), args.top, args.min_count, args.log, args.concurrency
+    )
+    print(f"Precompute completed: {summary}")
+
+
+if __name__ == "__main__":
+    main()
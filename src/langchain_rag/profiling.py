@@ -0,0 +1,217 @@
+"""
+Opt-in, per-request profiling for the RAG hot paths.
+
+A request is profiled when RAG_PROFILE_SAMPLE_RATE (0..1) samples it or when
+the caller forces it (the X-Profile: 1 header on /ask and /upload). A profiled
+request writes to RAG_PROFILE_DIR (default profiles/):
+
+    <name>-<time>-<id>.prof            cProfile stats (snakeviz, pstats)
+    <name>-<time>-<id>.stacks.folded   sampled call stacks, in microseconds (flamegraph.pl, speedscope)
+    <name>-<time>-<id>.spans.folded    wall-clock spans such as ask;retrieval, in microseconds
+    <name>-<time>-<id>.alloc.txt       top allocation sites from tracemalloc
+
+Outside a profiled request `span()` returns a shared no-op context manager, so
+with a sample rate of 0 the instrumentation costs one context variable read.
+Only one request is profiled at a time; others that get sampled meanwhile run
+unprofiled.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_active = contextvars.ContextVar("rag_profile", default=None)
+_profile_lock = threading.Lock()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.profile.spans[";".join(self.profile.stack)] += elapsed
+        self.profile.stack.pop()
+        return False
+
+
+def span(name):
+    """time a block as part of the current profile; a no-op when nothing is being profiled"""
+    profile = _active.get()
+    if profile is None:
+        return _NOOP_SPAN
+    return _Span(profile, name)
+
+
+class StackSampler(threading.Thread):
+    """samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                # the function's first line, so samples anywhere in a function merge into one frame
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    def __init__(self, name, output_dir, memory=True, sample_interval=0.005):
+        self.name = name
+        self.output_dir = Path(output_dir)
+        self.memory = memory
+        self.sample_interval = sample_interval
+        self.spans = Counter()
+        self.stack = [name]
+        self.profile_id = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def __enter__(self):
+        self._started_tracemalloc = self.memory and not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(25)
+        self._sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        self._sampler.start()
+        self._profiler = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profiler.enable()
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.disable()
+        elapsed = time.perf_counter() - self._start
+        _active.reset(self._token)
+        self._sampler.stop()
+        self.spans[self.name] += elapsed
+
+        snapshot = tracemalloc.take_snapshot() if self.memory and tracemalloc.is_tracing() else None
+        peak = tracemalloc.get_traced_memory()[1] if snapshot else 0
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        try:
+            self._write(snapshot, peak)
+        except OSError as e:
+            logger.warning(f"Could not write profile {self.profile_id}: {e}")
+        return False
+
+    def _write(self, snapshot, peak):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / self.profile_id
+
+        self._profiler.dump_stats(f"{base}.prof")
+
+        interval_us = int(self.sample_interval * 1e6)
+        with open(f"{base}.stacks.folded", "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.samples.most_common():
+                f.write(f"{stack} {count * interval_us}\n")
+
+        # folded stacks expect self time, so subtract time spent in child spans
+        self_time = Counter(self.spans)
+        for path, seconds in self.spans.items():
+            parent = path.rpartition(";")[0]
+            if parent:
+                self_time[parent] -= seconds
+        with open(f"{base}.spans.folded", "w", encoding="utf-8") as f:
+            for path, seconds in sorted(self_time.items()):
+                f.write(f"{path} {max(int(seconds * 1e6), 0)}\n")
+
+        if snapshot is not None:
+            with open(f"{base}.alloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"peak traced memory: {peak / 1024:.1f} KiB\n\n")
+                for stat in snapshot.statistics("lineno")[:30]:
+                    f.write(f"{stat}\n")
+
+        top = pstats.Stats(self._profiler).sort_stats("cumulative")
+        logger.info(
+            f"Profile {self.profile_id} written to {self.output_dir}",
+            extra={"custom_dimensions": {
+                "profile_id": self.profile_id,
+                "spans_ms": {path: round(seconds * 1000, 2) for path, seconds in self.spans.items()},
+                "total_calls": top.total_calls
+            }}
+        )
+
+
+def should_profile(force=False):
+    if force:
+        return True
+    rate = float(os.getenv("RAG_PROFILE_SAMPLE_RATE", "0") or 0)
+    return rate > 0 and random.random() < rate
+
+
+@contextmanager
+def profile_request(name, force=False):
+    """
+    Profile the block if this request is sampled (or forced) and no other
+    request is being profiled; yields the RequestProfile or None.
+    """
+    if _active.get() is not None or not should_profile(force):
+        yield None
+        return
+    if not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        profile = RequestProfile(
+            name,
+            os.getenv("RAG_PROFILE_DIR", "profiles"),
+            memory=os.getenv("RAG_PROFILE_MEMORY", "1").lower() not in ("0", "off", "false")
+        )
+        with profile:
+            yield profile
+    finally:
+        _profile_lock.release()
+
+
+def header_requests_profile(headers):
+    value = (headers.get("X-Profile") or headers.get("x-profile") or "").strip().lower()
+    return value in ("1", "true", "yes", "on")
@@ -9,18 +9,22 @@ import sys
 import uuid 
 
 from opencensus.ext.azure.log_exporter import AzureLogHandler
+from logging_pipeline import queue_handler
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-handler = logging.StreamHandler(stream=sys.stdout)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+# streamlit re-runs this script on every interaction; start the log listener once
+if not logger.handlers:
+    handler = logging.StreamHandler(stream=sys.stdout)
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    handlers = [handler]
 
-if os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING'):
-    azure_handler = AzureLogHandler()
-    logger.addHandler(azure_handler)
+    if os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING'):
+        handlers.append(AzureLogHandler())
+
+    logger.addHandler(queue_handler(*handlers))
 
 AZURE_FUNCTION_ENDPOINT = "http://localhost:7071/api/ask"
 UPLOAD_ENDPOINT = "http://localhost:7071/api/upload" 
@@ -47,11 +51,13 @@ def trigger_test_error():
          logger.error(f"trace_id={trace_id} Received non-JSON response from error endpoint")
          st.error(f"Received non-JSON response from error endpoint: {response.text}")
 
-def ask_rag_endpoint(question: str):
+def ask_rag_endpoint(question: str, session_id: str = None):
     trace_id = str(uuid.uuid4())
     try:
         logger.info(f"trace_id={trace_id} Sending question to backend: {question}")
         params = {"question": question}
+        if session_id:
+            params["session_id"] = session_id
         response = requests.get(AZURE_FUNCTION_ENDPOINT, params=params)
         response.raise_for_status()
         response_data = response.json()
@@ -136,6 +142,10 @@ with st.sidebar:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# The backend keeps the conversation context for this id
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
 # Initialize upload status
 if "upload_status" not in st.session_state:
     st.session_state.upload_status = None
@@ -153,7 +163,7 @@ if prompt := st.chat_input("Ask a question..."):
     
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            answer = ask_rag_endpoint(prompt)
+            answer = ask_rag_endpoint(prompt, st.session_state.session_id)
         
         st.markdown(answer)
         st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -0,0 +1,139 @@
+"""
+Compact records for the ingestion pipeline.
+
+Pages and chunks are slotted records instead of dicts, and the vectors of one
+embedding batch share a single float32 array (6 KB per 1536-dimensional
+vector, against about 50 KB as a list of Python floats); a chunk only points
+at its row. Vectors become lists of floats, the form the Azure AI Search SDK
+sends, only while their batch is being uploaded (`ChunkRecord.to_wire`).
+
+Compare peak memory of both representations with bench_memory.py.
+"""
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+CHUNK_FIELDS = ("id", "content", "title", "source", "chunk_id", "page", "file_type", "ingested_at", "tags")
+
+
+class VectorBatch:
+    """the vectors of one embedding batch, row after row in one float32 array"""
+
+    __slots__ = ("dimensions", "values")
+
+    def __init__(self, dimensions: int, values: Optional[array] = None):
+        self.dimensions = dimensions
+        self.values = values if values is not None else array("f")
+
+    @classmethod
+    def from_lists(cls, vectors: Sequence[Sequence[float]]) -> "VectorBatch":
+        batch = cls(len(vectors[0]) if vectors else 0)
+        for vector in vectors:
+            batch.append(vector)
+        return batch
+
+    @classmethod
+    def from_bytes(cls, dimensions: int, data: bytes) -> "VectorBatch":
+        """vectors stored as little-endian float32"""
+        values = array("f")
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        if dimensions and len(values) % dimensions:
+            raise ValueError(f"{len(values)} values do not make {dimensions}-dimensional vectors")
+        return cls(dimensions, values)
+
+    def to_bytes(self) -> bytes:
+        if sys.byteorder == "little":
+            return self.values.tobytes()
+        values = array("f", self.values)
+        values.byteswap()
+        return values.tobytes()
+
+    def append(self, vector: Iterable[float]) -> int:
+        """add a vector; returns its row"""
+        row = len(self)
+        self.values.extend(vector)
+        if len(self.values) != (row + 1) * self.dimensions:
+            del self.values[row * self.dimensions:]
+            raise ValueError(f"Expected a {self.dimensions}-dimensional vector")
+        return row
+
+    def row(self, row: int) -> array:
+        return self.values[row * self.dimensions:(row + 1) * self.dimensions]
+
+    def __len__(self):
+        return len(self.values) // self.dimensions if self.dimensions else 0
+
+
+class DocumentRecord:
+    """one loaded page (or whole file, for loaders without pages)"""
+
+    __slots__ = ("content", "page", "source", "file_hash", "title", "file_type", "ingested_at", "tags")
+
+    def __init__(self, content: str, page: Optional[int], source: str, file_hash: str, title: str,
+                 file_type: str, ingested_at: str, tags: Tuple[str, ...] = ()):
+        self.content = content
+        # as numbered by the loader, from 0
+        self.page = page
+        self.source = source
+        self.file_hash = file_hash
+        self.title = title
+        self.file_type = file_type
+        self.ingested_at = ingested_at
+        self.tags = tags
+
+
+class ChunkRecord:
+    """one chunk with the fields of the search index; its vector lives in a VectorBatch"""
+
+    __slots__ = CHUNK_FIELDS + ("_vectors", "_row")
+
+    def __init__(self, id: str, content: str, title: Optional[str], source: Optional[str], chunk_id: Optional[int],
+                 page: Optional[int] = None, file_type: Optional[str] = None, ingested_at: Optional[str] = None,
+                 tags: Tuple[str, ...] = ()):
+        self.id = id
+        self.content = content
+        self.title = title
+        self.source = source
+        self.chunk_id = chunk_id
+        self.page = page
+        self.file_type = file_type
+        self.ingested_at = ingested_at
+        # shared by every chunk of a document
+        self.tags = tags
+        self._vectors = None
+        self._row = 0
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any]) -> "ChunkRecord":
+        return cls(**{name: fields.get(name) for name in CHUNK_FIELDS[:-1]}, tags=tuple(fields.get("tags") or ()))
+
+    def set_vector(self, vectors: VectorBatch, row: int):
+        self._vectors = vectors
+        self._row = row
+
+    @property
+    def has_vector(self) -> bool:
+        return self._vectors is not None
+
+    @property
+    def vector(self) -> Optional[array]:
+        return self._vectors.row(self._row) if self._vectors is not None else None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """a field by name; ShardRouter routes on a configurable field"""
+        return getattr(self, name, default) if name in CHUNK_FIELDS else default
+
+    def fields(self) -> Dict[str, Any]:
+        """the index fields without the vector, e.g. for the local BM25 index"""
+        fields = {name: getattr(self, name) for name in CHUNK_FIELDS}
+        fields["tags"] = list(self.tags)
+        return fields
+
+    def to_wire(self) -> Dict[str, Any]:
+        """the document uploaded to Azure AI Search"""
+        document = self.fields()
+        if self._vectors is not None:
+            document["content_vector"] = self.vector.tolist()
+        return document
@@ -0,0 +1,190 @@
+"""
+Blue/green rebuild of the Azure AI Search indexes.
+
+A rebuild ingests the whole documents folder into a new generation of every
+logical index (<name>-g<utc timestamp>) while queries keep hitting the live
+one. The new generation is validated (document counts settle at what was
+uploaded, no big drop against the live generation, probe queries return hits)
+and only then does IndexPointer switch every logical name to it in one atomic
+write. Query processes pick the switch up within a second and swap their RAG
+system; the generation that was replaced is kept for `--rollback`, older ones
+are deleted.
+
+An interrupted rebuild resumes into the same generation: the ingest journal
+skips what was already embedded and uploaded. `--discard` drops it instead.
+
+The pointer is a file (INDEX_POINTER_PATH), so the query processes have to see
+the same file, e.g. on a mounted share.
+
+usage:
+    python reindex.py docs --probe "hotels in Paris" --probe "ski resorts"
+    python reindex.py --status
+    python reindex.py --rollback
+"""
+import os
+import time
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from dotenv import load_dotenv
+
+from docs_to_storage import EnhancedDocumentUploader
+from metering import entry_point
+from sharding import ShardRouter, get_index_pointer
+
+logger = logging.getLogger(__name__)
+
+
+class ReindexError(RuntimeError):
+    """the new generation failed validation; the live one keeps serving"""
+
+
+def generation_name(name: str) -> str:
+    return f"{name}-g{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+
+
+def _credential() -> AzureKeyCredential:
+    return AzureKeyCredential(os.getenv("SEARCH_KEY"))
+
+
+def _index_client() -> SearchIndexClient:
+    return SearchIndexClient(endpoint=os.getenv("SEARCH_ENDPOINT"), credential=_credential())
+
+
+def _document_count(index_name: str) -> Optional[int]:
+    client = SearchClient(endpoint=os.getenv("SEARCH_ENDPOINT"), index_name=index_name, credential=_credential())
+    try:
+        return client.get_document_count()
+    except ResourceNotFoundError:
+        return None
+
+
+def validate_generation(uploader: EnhancedDocumentUploader, summary: Dict[str, Any], probes: List[str],
+                        min_ratio: float = 0.9, settle_timeout: float = 120) -> Dict[str, Any]:
+    expected = summary["chunks_count"]
+    failed = summary.get("resume", {}).get("failed", 0)
+    if failed:
+        raise ReindexError(f"{failed} chunks were not uploaded")
+
+    # document counts are eventually consistent; give indexing time to catch up
+    deadline = time.monotonic() + settle_timeout
+    while True:
+        counts = {name: client.get_document_count() for name, client in uploader.search_clients.items()}
+        if sum(counts.values()) >= expected or time.monotonic() > deadline:
+            break
+        time.sleep(2)
+    if sum(counts.values()) < expected:
+        raise ReindexError(f"New generation holds {sum(counts.values())} of {expected} chunks")
+
+    pointer = get_index_pointer()
+    live_counts = {name: _document_count(pointer.resolve(name)) or 0 for name in uploader.search_clients}
+    if sum(counts.values()) < min_ratio * sum(live_counts.values()):
+        raise ReindexError(
+            f"New generation holds {sum(counts.values())} chunks, live holds {sum(live_counts.values())}; "
+            f"refusing to shrink below {min_ratio:.0%}"
+        )
+
+    for probe in probes:
+        if not any(list(client.search(search_text=probe, top=1)) for client in uploader.search_clients.values()):
+            raise ReindexError(f"Probe query returned nothing: {probe!r}")
+
+    return {"counts": counts, "live_counts": live_counts, "probes": len(probes)}
+
+
+def rebuild(documents_path: str, probes: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+            min_ratio: float = 0.9, keep: int = 1, settle_timeout: float = 120) -> Dict[str, Any]:
+    if os.getenv("RETRIEVER_BACKEND", "azure").lower() == "bm25":
+        raise ValueError("Reindexing applies to Azure AI Search; the local BM25 index is saved atomically")
+
+    pointer = get_index_pointer()
+    names = ShardRouter.from_env().indexes
+    generations = {name: pointer.state(name)["building"] or generation_name(name) for name in names}
+    pointer.mark_building(generations)
+    logger.info(f"Building index generations: {generations}")
+
+    start = time.perf_counter()
+    uploader = EnhancedDocumentUploader(index_names=generations)
+    with entry_point("rag.reindex"):
+        summary = uploader.process_documents(documents_path, tags)
+    if not summary["chunks_count"]:
+        raise ReindexError(f"No chunks were built from {documents_path}")
+
+    report = validate_generation(uploader, summary, probes or [], min_ratio, settle_timeout)
+    dropped = pointer.switch(generations, keep=keep)
+
+    index_client = uploader.index_client
+    for old in dropped:
+        try:
+            index_client.delete_index(old)
+            logger.info(f"Deleted old index generation {old}")
+        except ResourceNotFoundError:
+            pass
+
+    return {
+        "generations": generations,
+        "chunks_count": summary["chunks_count"],
+        "deleted": dropped,
+        "seconds": round(time.perf_counter() - start, 1),
+        **report
+    }
+
+
+def rollback() -> Dict[str, str]:
+    return get_index_pointer().rollback(ShardRouter.from_env().indexes)
+
+
+def discard() -> List[str]:
+    """drop an unfinished or rejected generation so the next rebuild starts fresh"""
+    pointer = get_index_pointer()
+    names = ShardRouter.from_env().indexes
+    building = [pointer.state(name)["building"] for name in names]
+    index_client = _index_client()
+    for generation in filter(None, building):
+        try:
+            index_client.delete_index(generation)
+        except ResourceNotFoundError:
+            pass
+    pointer.mark_building({name: None for name in names})
+    return [generation for generation in building if generation]
+
+
+def status() -> Dict[str, Any]:
+    pointer = get_index_pointer()
+    return {name: pointer.state(name) for name in ShardRouter.from_env().indexes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the search indexes into a new generation and switch to it")
+    parser.add_argument("path", nargs="?", help="folder with the full document corpus")
+    parser.add_argument("--probe", action="append", default=[], help="query the new generation must answer (repeatable)")
+    parser.add_argument("--tags", default="", help="comma separated tags stored on every chunk")
+    parser.add_argument("--min-ratio", type=float, default=0.9,
+                        help="refuse to switch if the new generation has fewer chunks than this share of the live one")
+    parser.add_argument("--keep", type=int, default=1, help="previous generations kept for rollback")
+    parser.add_argument("--rollback", action="store_true", help="switch back to the previous generation")
+    parser.add_argument("--discard", action="store_true", help="delete an unfinished generation")
+    parser.add_argument("--status", action="store_true")
+    args = parser.parse_args()
+    load_dotenv()
+
+    if args.status:
+        print(status())
+    elif args.rollback:
+        print(f"Rolled back to: {rollback()}")
+    elif args.discard:
+        print(f"Discarded: {discard()}")
+    elif args.path:
+        tags = [tag.strip() for tag in args.tags.split(",") if tag.strip()]
+        print(f"Reindex completed: {rebuild(args.path, args.probe, tags, args.min_ratio, args.keep)}")
+    else:
+        parser.error("a documents folder, --status, --rollback or --discard is required")
+
+
+if __name__ == "__main__":
+    main()
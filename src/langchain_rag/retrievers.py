@@ -0,0 +1,292 @@
+"""
+Retrievers for the RAG query path.
+
+FanOutRetriever queries several Azure AI Search indexes concurrently and merges
+their results into one top-k. The shards share one schema and scoring profile,
+so their raw scores are on one scale; they are divided by the best score across
+all shards, which keeps the ratios ContextPacker cuts on the same as for a
+single index. A shard that errors or misses SHARD_TIMEOUT_SECONDS is left out
+of the merge instead of holding up the answer; inside a request deadline
+(deadline.py) the wait is also cut to the time left.
+
+Search HTTP calls time out after SEARCH_HTTP_TIMEOUT_SECONDS (default 90% of
+SHARD_TIMEOUT_SECONDS) or the time left, so a hung replica frees its worker
+thread instead of leaving every later search queued behind it.
+
+BM25Retriever serves the same interface from the local keyword index in
+bm25.py (RETRIEVER_BACKEND=bm25), so development and tests need no service.
+"""
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import requests
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.retrievers import AzureAISearchRetriever
+from pydantic import PrivateAttr
+
+from bm25 import BM25Index, default_index_path
+from deadline import remaining
+from sharding import get_index_pointer, search_indexes, shard_timeout
+
+logger = logging.getLogger(__name__)
+
+SCORE_KEY = "@search.score"
+
+STRING_FILTERS = ("source", "title", "file_type")
+URL_ESCAPES = {"%": "%25", "&": "%26", "#": "%23", "+": "%2B"}
+
+
+def _quote(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _search_in(field: str, values: List[Any]) -> str:
+    values = [str(value) for value in values]
+    if any("|" in value for value in values):
+        return "(" + " or ".join(f"{field} eq {_quote(value)}" for value in values) + ")"
+    return f"search.in({field}, {_quote('|'.join(values))}, '|')"
+
+
+def build_odata_filter(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Translate request filters into an Azure AI Search OData $filter.
+
+    Supported keys:
+        source, title, file_type: a value or a list of values
+        page: a page number, a list of pages or {"gte": 1, "lte": 5}
+        tags: a tag or list of tags; matches chunks carrying any of them
+        ingested_after, ingested_before: ISO 8601 timestamps
+
+    Raises:
+        ValueError: on unknown keys or malformed values
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must be an object")
+
+    clauses = []
+    for key, value in filters.items():
+        if value is None or value == [] or value == "":
+            continue
+        if key in STRING_FILTERS:
+            values = value if isinstance(value, list) else [value]
+            clauses.append(_search_in(key, values) if len(values) > 1 else f"{key} eq {_quote(values[0])}")
+        elif key == "page":
+            if isinstance(value, dict):
+                bounds = {"gte": "ge", "lte": "le", "gt": "gt", "lt": "lt"}
+                unknown = set(value) - set(bounds)
+                if unknown:
+                    raise ValueError(f"Unknown page bounds: {', '.join(sorted(unknown))}")
+                clauses.extend(f"page {bounds[op]} {int(bound)}" for op, bound in value.items())
+            else:
+                pages = [int(page) for page in (value if isinstance(value, list) else [value])]
+                clauses.append("(" + " or ".join(f"page eq {page}" for page in pages) + ")")
+        elif key == "tags":
+            tags = value if isinstance(value, list) else [value]
+            clauses.append(f"tags/any(t: {_search_in('t', tags)})")
+        elif key in ("ingested_after", "ingested_before"):
+            try:
+                timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError(f"{key} must be an ISO 8601 timestamp")
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            op = "ge" if key == "ingested_after" else "le"
+            clauses.append(f"ingested_at {op} {timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}")
+        else:
+            raise ValueError(f"Unknown filter: {key}")
+
+    return " and ".join(clauses) or None
+
+
+def normalize_scores(results: Dict[str, List[Document]]) -> Dict[str, List[Document]]:
+    """scale every shard's raw scores by the best score across all of them"""
+    best = max(
+        (doc.metadata.get(SCORE_KEY) or 0.0 for documents in results.values() for doc in documents),
+        default=0.0
+    )
+    for shard, documents in results.items():
+        for doc in documents:
+            raw = doc.metadata.get(SCORE_KEY) or 0.0
+            doc.metadata["shard"] = shard
+            doc.metadata["normalized_score"] = raw / best if best > 0 else 0.0
+    return results
+
+
+def merge_results(results: Dict[str, List[Document]], top_k: int) -> List[Document]:
+    merged = {}
+    for shard, documents in normalize_scores(results).items():
+        for doc in documents:
+            key = doc.metadata.get("id") or (shard, doc.page_content)
+            current = merged.get(key)
+            if current is None or doc.metadata["normalized_score"] > current.metadata["normalized_score"]:
+                merged[key] = doc
+    ranked = sorted(merged.values(), key=lambda doc: doc.metadata["normalized_score"], reverse=True)
+    return ranked[:top_k]
+
+
+class TimedAzureAISearchRetriever(AzureAISearchRetriever):
+    """AzureAISearchRetriever whose HTTP call gives up after `timeout` seconds"""
+
+    timeout: float = 2.7
+
+    def _search(self, query: str) -> List[dict]:
+        left = remaining()
+        timeout = self.timeout if left is None else max(min(self.timeout, left), 0.001)
+        response = requests.get(self._build_search_url(query), headers=self._headers, timeout=timeout)
+        if response.status_code != 200:
+            raise Exception(f"Error in search request: {response}")
+        return response.json()["value"]
+
+
+class FanOutRetriever(BaseRetriever):
+    shards: Dict[str, AzureAISearchRetriever]
+    top_k: int = 3
+    timeout: float = 3.0
+    max_workers: int = 8
+
+    _executor: ThreadPoolExecutor = PrivateAttr()
+
+    def model_post_init(self, __context):
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, max(len(self.shards), 1)),
+            thread_name_prefix="search-shard"
+        )
+
+    def _search_shard(self, shard: str, query: str):
+        start = time.perf_counter()
+        documents = self.shards[shard].invoke(query)
+        return documents, time.perf_counter() - start
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        futures = {
+            # each shard call sees the request deadline, which bounds its HTTP timeout
+            self._executor.submit(contextvars.copy_context().run, self._search_shard, shard, query): shard
+            for shard in self.shards
+        }
+        left = remaining()
+        timeout = self.timeout if left is None else min(self.timeout, left)
+        done, not_done = wait(futures, timeout=timeout)
+
+        results = {}
+        for future in done:
+            shard = futures[future]
+            try:
+                documents, elapsed = future.result()
+            except Exception as e:
+                logger.warning(f"Shard {shard} failed, answering without it: {e}")
+                continue
+            logger.info(f"Shard {shard}: {len(documents)} results in {elapsed * 1000:.0f} ms")
+            results[shard] = documents
+
+        for future in not_done:
+            # the request keeps running in its worker; its result is simply ignored
+            logger.warning(f"Shard {futures[future]} exceeded {timeout:.2f}s, answering without it")
+
+        return merge_results(results, self.top_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        shards = list(self.shards)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(self.shards[shard].ainvoke(query), self.timeout) for shard in shards),
+            return_exceptions=True
+        )
+
+        results = {}
+        for shard, outcome in zip(shards, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.warning(f"Shard {shard} exceeded {self.timeout}s, answering without it")
+            elif isinstance(outcome, Exception):
+                logger.warning(f"Shard {shard} failed, answering without it: {outcome}")
+            else:
+                results[shard] = outcome
+        return merge_results(results, self.top_k)
+
+
+class BM25Retriever(BaseRetriever):
+    """keyword retrieval from the local BM25 index, no search service involved"""
+
+    index: Any
+    top_k: int = 3
+    filters: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = []
+        for score, fields in self.index.search(query, self.top_k, self.filters):
+            content = fields.pop("content") or ""
+            documents.append(Document(page_content=content, metadata={**fields, SCORE_KEY: score}))
+        return documents
+
+
+def with_filter(retriever: BaseRetriever, filters: Optional[Dict[str, Any]]) -> BaseRetriever:
+    """a per-call copy of the retriever that applies the filters before ranking"""
+    if isinstance(retriever, BM25Retriever):
+        return retriever.model_copy(update={"filters": filters}) if filters else retriever
+    odata_filter = build_odata_filter(filters)
+    if not odata_filter:
+        return retriever
+    # AzureAISearchRetriever pastes the filter into the query string unencoded
+    odata_filter = "".join(URL_ESCAPES.get(char, char) for char in odata_filter)
+    if isinstance(retriever, FanOutRetriever):
+        shards = {
+            name: shard.model_copy(update={"filter": odata_filter})
+            for name, shard in retriever.shards.items()
+        }
+        return retriever.model_copy(update={"shards": shards})
+    if isinstance(retriever, AzureAISearchRetriever):
+        return retriever.model_copy(update={"filter": odata_filter})
+    raise ValueError(f"{type(retriever).__name__} does not support filters")
+
+
+def azure_search_retriever(index_name: str, top_k: int) -> AzureAISearchRetriever:
+    # shorter than the fan-out wait, so a timed-out shard's worker is free again soon after
+    http_timeout = float(os.getenv("SEARCH_HTTP_TIMEOUT_SECONDS", shard_timeout() * 0.9))
+    return TimedAzureAISearchRetriever(
+        service_name=os.getenv("SEARCH_ENDPOINT"),
+        index_name=index_name,
+        api_key=os.getenv("SEARCH_KEY"),
+        content_key=os.getenv("CONTENT_KEY", "content"),
+        top_k=top_k,
+        timeout=http_timeout
+    )
+
+
+def build_retriever(top_k: int = 3, indexes: Optional[List[str]] = None) -> BaseRetriever:
+    """
+    The retriever selected by RETRIEVER_BACKEND: "bm25" for the local keyword
+    index, otherwise Azure AI Search (a plain retriever for a single index, a
+    fan-out retriever for several).
+    """
+    if os.getenv("RETRIEVER_BACKEND", "azure").lower() == "bm25":
+        index_path = default_index_path()
+        logger.info(f"Using local BM25 index at {index_path}")
+        return BM25Retriever(index=BM25Index.open(index_path), top_k=top_k)
+
+    indexes = indexes if indexes is not None else search_indexes()
+    # logical names are served by whichever generation reindex.py last switched to
+    pointer = get_index_pointer()
+    indexes = [pointer.resolve(name) for name in indexes]
+    if len(indexes) == 1:
+        return azure_search_retriever(indexes[0], top_k)
+
+    logger.info(f"Fanning out retrieval across indexes: {', '.join(indexes)}")
+    return FanOutRetriever(
+        shards={name: azure_search_retriever(name, top_k) for name in indexes},
+        top_k=top_k,
+        timeout=shard_timeout()
+    )
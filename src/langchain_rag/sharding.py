@@ -0,0 +1,187 @@
+"""
+Shard configuration shared by the query path and the uploader.
+
+SEARCH_INDEXES lists the indexes queried together (comma separated, defaults
+to NEW_INDEX_NAME). SHARD_ROUTING decides which index a chunk is uploaded to:
+
+    {"field": "source", "routes": {"*Europe*": "travel-eu", "*.md": "travel-notes"}, "default": "travel-main"}
+
+Patterns are fnmatch globs matched in order against the chunk field; chunks
+that match nothing go to "default" (or the first index in SEARCH_INDEXES).
+
+These are logical names. After a blue/green rebuild (reindex.py) a logical name
+is served by a physical index generation; IndexPointer keeps that mapping in
+INDEX_POINTER_PATH (default .cache/index_pointer.json).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def search_indexes() -> List[str]:
+    raw = os.getenv("SEARCH_INDEXES") or os.getenv("NEW_INDEX_NAME") or ""
+    return [name.strip() for name in raw.split(",") if name.strip()]
+
+
+def shard_timeout() -> float:
+    return float(os.getenv("SHARD_TIMEOUT_SECONDS", "3"))
+
+
+class ShardRouter:
+    def __init__(self, indexes: List[str], field: str = "source",
+                 routes: Optional[Dict[str, str]] = None, default: Optional[str] = None):
+        if not indexes:
+            raise ValueError("At least one search index is required")
+        self.field = field
+        self.routes = dict(routes or {})
+        self.default = default or indexes[0]
+        self.indexes = list(dict.fromkeys([*indexes, *self.routes.values(), self.default]))
+
+    @classmethod
+    def from_env(cls, indexes: Optional[List[str]] = None) -> "ShardRouter":
+        indexes = indexes if indexes is not None else search_indexes()
+        raw = os.getenv("SHARD_ROUTING", "").strip()
+        if not raw:
+            return cls(indexes)
+
+        if not raw.startswith("{"):
+            with open(raw, "r", encoding="utf-8") as f:
+                raw = f.read()
+        try:
+            rule = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid SHARD_ROUTING: {e}")
+        return cls(indexes, rule.get("field", "source"), rule.get("routes"), rule.get("default"))
+
+    def route(self, chunk: Dict[str, Any]) -> str:
+        value = str(chunk.get(self.field, ""))
+        for pattern, index_name in self.routes.items():
+            if fnmatch(value, pattern):
+                return index_name
+        return self.default
+
+    def partition(self, chunks: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        shards: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk in chunks:
+            shards.setdefault(self.route(chunk), []).append(chunk)
+        return shards
+
+
+class IndexPointer:
+    """which physical index generation serves each logical index name"""
+
+    def __init__(self, path, check_interval: float = 1.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._data: Dict[str, Any] = {"version": 0, "indexes": {}}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+
+    def version(self) -> int:
+        """changes whenever a switch or rollback happens"""
+        self._maybe_reload()
+        return self._data.get("version", 0)
+
+    def resolve(self, name: str) -> str:
+        self._maybe_reload()
+        return self._data["indexes"].get(name, {}).get("active") or name
+
+    def state(self, name: str) -> Dict[str, Any]:
+        self._maybe_reload(force=True)
+        state = self._data["indexes"].get(name, {})
+        return {"active": state.get("active") or name, "history": list(state.get("history", [])),
+                "building": state.get("building"), "switched_at": state.get("switched_at")}
+
+    def _update(self, changes: Dict[str, Dict[str, Any]]):
+        """apply per-index changes and write the file atomically; one version bump for all of them"""
+        self._maybe_reload(force=True)
+        with self._lock:
+            data = json.loads(json.dumps(self._data))
+            switched = False
+            for name, change in changes.items():
+                state = data["indexes"].setdefault(name, {})
+                if "active" in change and change["active"] != state.get("active"):
+                    switched = True
+                    state["switched_at"] = datetime.now(timezone.utc).isoformat()
+                state.update(change)
+            if switched:
+                data["version"] = data.get("version", 0) + 1
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._data = data
+            self._mtime = self.path.stat().st_mtime_ns
+
+    def mark_building(self, generations: Dict[str, Optional[str]]):
+        self._update({name: {"building": generation} for name, generation in generations.items()})
+
+    def switch(self, generations: Dict[str, str], keep: int = 1) -> List[str]:
+        """
+        Serve each logical name from its new generation, all in one write.
+        The replaced generations go to the front of the history, of which `keep`
+        are retained for rollback; the generations that fall off are returned.
+        """
+        changes, dropped = {}, []
+        for name, generation in generations.items():
+            state = self.state(name)
+            history = [state["active"], *state["history"]]
+            history = [old for old in dict.fromkeys(history) if old != generation]
+            dropped.extend(history[keep:])
+            changes[name] = {"active": generation, "history": history[:keep], "building": None}
+        self._update(changes)
+        logger.info(f"Switched indexes: {generations}")
+        return dropped
+
+    def rollback(self, names: List[str]) -> Dict[str, str]:
+        """go back to the previous generation of each name; the rolled-back one is dropped from the pointer"""
+        changes, restored = {}, {}
+        for name in names:
+            state = self.state(name)
+            if not state["history"]:
+                raise ValueError(f"No previous generation of {name} to roll back to")
+            restored[name] = state["history"][0]
+            changes[name] = {"active": state["history"][0], "history": state["history"][1:]}
+        self._update(changes)
+        logger.info(f"Rolled back indexes: {restored}")
+        return restored
+
+
+_pointer = None
+_pointer_lock = threading.Lock()
+
+
+def get_index_pointer() -> IndexPointer:
+    global _pointer
+    if _pointer is None:
+        with _pointer_lock:
+            if _pointer is None:
+                _pointer = IndexPointer(os.getenv("INDEX_POINTER_PATH", ".cache/index_pointer.json"))
+    return _pointer
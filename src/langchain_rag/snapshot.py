@@ -0,0 +1,348 @@
+"""
+Corpus snapshots: chunks, metadata and vectors in one compact binary file.
+
+A snapshot restores an index in another environment, or after a schema change,
+without parsing or embedding anything again. Layout (little-endian):
+
+    b"RAGSNAP1" | header length <Q | header json | padding | sections
+
+Every section starts on a 64-byte boundary; offsets in the header are relative
+to the first section. Columns are stored whole, one after another:
+
+    string / json columns   uint64 end offsets (one per row), a null byte per row, utf-8 data
+    int32 columns           one int32 per row, -2**31 for null
+    vectors                 rows x dimensions float16
+
+so a reader can mmap the file and pull any row or vector without loading the
+rest. float16 halves the size of the embeddings; cosine similarity is
+unaffected at the precision search needs.
+
+usage:
+    python snapshot.py export corpus.snap           # from the live Azure index (or the local BM25 index)
+    python snapshot.py import corpus.snap           # into the configured backend, no embedding calls
+    python snapshot.py info corpus.snap
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import shutil
+import argparse
+import logging
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from records import ChunkRecord, VectorBatch
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAGSNAP1"
+ALIGN = 64
+INT_NULL = -2 ** 31
+
+STRING_COLUMNS = ("id", "content", "title", "source", "file_type", "ingested_at")
+INT_COLUMNS = ("page", "chunk_id")
+JSON_COLUMNS = ("tags",)
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class SnapshotWriter:
+    """streams chunks to per-column spool files and assembles the snapshot on close"""
+
+    def __init__(self, path, dimensions: Optional[int] = None, metadata: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.dimensions = dimensions
+        self.metadata = dict(metadata or {})
+        self.count = 0
+        self._spool = tempfile.TemporaryDirectory(prefix="snapshot-")
+        self._text = {}
+        for name in STRING_COLUMNS + JSON_COLUMNS:
+            self._text[name] = (open(Path(self._spool.name) / name, "w+b"), array("Q"), bytearray())
+        self._ints = {name: array("i") for name in INT_COLUMNS}
+        self._vectors = open(Path(self._spool.name) / "vectors", "w+b")
+        self._vector_format = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._cleanup()
+        return False
+
+    def add(self, chunk: Dict[str, Any]):
+        for name in STRING_COLUMNS + JSON_COLUMNS:
+            data_file, ends, nulls = self._text[name]
+            value = chunk.get(name)
+            if value is not None and name in JSON_COLUMNS:
+                value = json.dumps(value, ensure_ascii=False)
+            data = b"" if value is None else str(value).encode("utf-8")
+            data_file.write(data)
+            ends.append((ends[-1] if ends else 0) + len(data))
+            nulls.append(value is None)
+        for name in INT_COLUMNS:
+            value = chunk.get(name)
+            self._ints[name].append(INT_NULL if value is None else int(value))
+
+        vector = chunk.get("content_vector")
+        if self.dimensions is None:
+            self.dimensions = len(vector) if vector else 0
+        if self.dimensions:
+            if not vector or len(vector) != self.dimensions:
+                raise ValueError(f"Chunk {chunk.get('id')} has no {self.dimensions}-dimensional vector")
+            if self._vector_format is None:
+                self._vector_format = struct.Struct(f"<{self.dimensions}e")
+            self._vectors.write(self._vector_format.pack(*vector))
+        self.count += 1
+
+    def close(self):
+        sections = []   # (name, part, spooled file or bytes)
+        for name in STRING_COLUMNS + JSON_COLUMNS:
+            data_file, ends, nulls = self._text[name]
+            sections += [(name, "ends", _little_endian(ends)), (name, "nulls", bytes(nulls)), (name, "data", data_file)]
+        for name in INT_COLUMNS:
+            sections.append((name, "values", _little_endian(self._ints[name])))
+        sections.append(("content_vector", "values", self._vectors))
+
+        columns: Dict[str, Dict[str, List[int]]] = {}
+        offset = 0
+        for name, part, content in sections:
+            size = content.tell() if hasattr(content, "tell") else len(content)
+            columns.setdefault(name, {})[part] = [offset, size]
+            offset = _aligned(offset + size)
+
+        header = json.dumps({
+            "version": 1,
+            "count": self.count,
+            "dimensions": self.dimensions or 0,
+            "vector_dtype": "float16",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "metadata": self.metadata,
+            "columns": columns,
+        }, ensure_ascii=False).encode("utf-8")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            out.write(struct.pack("<Q", len(header)))
+            out.write(header)
+            base = _aligned(out.tell())
+            for name, part, content in sections:
+                out.write(b"\0" * (base + columns[name][part][0] - out.tell()))
+                if isinstance(content, bytes):
+                    out.write(content)
+                else:
+                    content.seek(0)
+                    shutil.copyfileobj(content, out, 1024 * 1024)
+        os.replace(tmp_path, self.path)
+        self._cleanup()
+        logger.info(f"Wrote snapshot of {self.count} chunks to {self.path}")
+
+    def _cleanup(self):
+        for data_file, _, _ in self._text.values():
+            data_file.close()
+        self._vectors.close()
+        self._spool.cleanup()
+
+
+class Snapshot:
+    """memory-mapped reader; rows and vectors are decoded only when asked for"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a corpus snapshot")
+        (header_length,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mm[header_start:header_start + header_length])
+        self._base = _aligned(header_start + header_length)
+        self.count = self.header["count"]
+        self.dimensions = self.header["dimensions"]
+        self._columns = self.header["columns"]
+        self._vector_format = struct.Struct(f"<{self.dimensions}e") if self.dimensions else None
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _offset(self, name: str, part: str) -> int:
+        return self._base + self._columns[name][part][0]
+
+    def _text(self, name: str, row: int) -> Optional[str]:
+        if self._mm[self._offset(name, "nulls") + row]:
+            return None
+        ends = self._offset(name, "ends")
+        end = struct.unpack_from("<Q", self._mm, ends + 8 * row)[0]
+        start = struct.unpack_from("<Q", self._mm, ends + 8 * (row - 1))[0] if row else 0
+        data = self._offset(name, "data")
+        return self._mm[data + start:data + end].decode("utf-8")
+
+    def vector(self, row: int) -> List[float]:
+        if not self._vector_format:
+            return []
+        offset = self._offset("content_vector", "values") + row * self._vector_format.size
+        return list(self._vector_format.unpack_from(self._mm, offset))
+
+    def row(self, row: int, vectors: bool = True) -> Dict[str, Any]:
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        chunk: Dict[str, Any] = {name: self._text(name, row) for name in STRING_COLUMNS}
+        for name in JSON_COLUMNS:
+            value = self._text(name, row)
+            chunk[name] = None if value is None else json.loads(value)
+        for name in INT_COLUMNS:
+            (value,) = struct.unpack_from("<i", self._mm, self._offset(name, "values") + 4 * row)
+            chunk[name] = None if value == INT_NULL else value
+        if vectors and self.dimensions:
+            chunk["content_vector"] = self.vector(row)
+        return chunk
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.row(i) for i in range(self.count))
+
+    def batches(self, size: int = 500, vectors: bool = True) -> Iterator[List[Dict[str, Any]]]:
+        for start in range(0, self.count, size):
+            yield [self.row(i, vectors) for i in range(start, min(start + size, self.count))]
+
+    def records(self, size: int = 500) -> Iterator[List[ChunkRecord]]:
+        """batches of chunk records whose vectors share one float32 array per batch"""
+        for start in range(0, self.count, size):
+            rows = range(start, min(start + size, self.count))
+            records = [ChunkRecord.from_fields(self.row(i, vectors=False)) for i in rows]
+            if self.dimensions:
+                vectors = VectorBatch(self.dimensions)
+                offset = self._offset("content_vector", "values")
+                for record, i in zip(records, rows):
+                    vectors.values.extend(self._vector_format.unpack_from(self._mm, offset + i * self._vector_format.size))
+                    record.set_vector(vectors, i - start)
+            yield records
+
+
+def write_snapshot(path, chunks: Iterable[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> int:
+    with SnapshotWriter(path, metadata=metadata) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+    return writer.count
+
+
+SNAPSHOT_FIELDS = ["id", *STRING_COLUMNS[1:], *INT_COLUMNS, *JSON_COLUMNS, "content_vector"]
+
+
+def export_azure_chunks(uploader) -> Iterator[Dict[str, Any]]:
+    """every chunk of every shard index the uploader writes to, vectors included"""
+    for index_name, search_client in uploader.search_clients.items():
+        logger.info(f"Exporting {index_name} ({uploader.physical_indexes[index_name]})")
+        for result in search_client.search(search_text="*", select=SNAPSHOT_FIELDS):
+            yield {name: result.get(name) for name in SNAPSHOT_FIELDS}
+
+
+def export_snapshot(path, uploader=None) -> Dict[str, Any]:
+    from docs_to_storage import EnhancedDocumentUploader
+
+    uploader = uploader or EnhancedDocumentUploader()
+    start = time.perf_counter()
+    if uploader.backend == "bm25":
+        chunks = uploader.local_index.documents()
+        metadata = {"source": "bm25"}
+    else:
+        chunks = export_azure_chunks(uploader)
+        metadata = {"source": "azure", "indexes": uploader.physical_indexes,
+                    "embedding_model": uploader.embedding_model}
+    count = write_snapshot(path, chunks, metadata)
+    return {"chunks": count, "bytes": Path(path).stat().st_size, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def import_snapshot(path, uploader=None, batch_size: int = 1000, workers: int = 4) -> Dict[str, Any]:
+    """
+    load a snapshot into the configured backend; no parsing, no embedding calls
+
+    Raises:
+        RuntimeError: when the search service rejected some chunks; uploads are keyed
+            by chunk id, so rerunning the import retries them without duplicates
+    """
+    from docs_to_storage import EnhancedDocumentUploader
+
+    uploader = uploader or EnhancedDocumentUploader()
+    start = time.perf_counter()
+    with Snapshot(path) as snapshot:
+        count = len(snapshot)
+        if uploader.backend == "bm25":
+            for batch in snapshot.batches(batch_size, vectors=False):
+                uploader.local_index.add(batch)
+            uploader.local_index.save(uploader.local_index_path)
+            uploaded = count
+        else:
+            if not snapshot.dimensions:
+                raise ValueError(f"{path} has no vectors; it can only be imported into the local BM25 index")
+            model = snapshot.header["metadata"].get("embedding_model")
+            if model and model != uploader.embedding_model:
+                logger.warning(f"Snapshot vectors come from {model}, queries are embedded with {uploader.embedding_model}")
+            uploader.create_search_index()
+            # uploads are network bound; a few batches in flight keep the service busy,
+            # and only those few are decoded in memory at a time
+            in_flight = deque()
+            uploaded = 0
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-import") as executor:
+                for batch in snapshot.records(batch_size):
+                    if len(in_flight) >= workers * 2:
+                        uploaded += in_flight.popleft().result()
+                    in_flight.append(executor.submit(uploader.upload_to_azure_search, batch))
+                for future in in_flight:
+                    uploaded += future.result()
+    if uploaded < count:
+        raise RuntimeError(f"Only {uploaded} of {count} chunks from {path} were imported; rerun the import to retry the rest")
+    return {"chunks": uploaded, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a corpus snapshot")
+    parser.add_argument("command", choices=["export", "import", "info"])
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent upload batches on import")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with Snapshot(args.path) as snapshot:
+            header = {key: value for key, value in snapshot.header.items() if key != "columns"}
+            print(json.dumps({**header, "bytes": Path(args.path).stat().st_size}, indent=2))
+    elif args.command == "export":
+        print(f"Export completed: {export_snapshot(args.path)}")
+    else:
+        print(f"Import completed: {import_snapshot(args.path, workers=args.workers)}")
+
+
+if __name__ == "__main__":
+    main()
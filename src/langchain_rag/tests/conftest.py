@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+
+def pytest_configure(config):
+    # main.py logs to LOG_FILE at import; keep test runs out of the tracked logs/ file
+    os.environ["LOG_FILE"] = os.path.join(tempfile.mkdtemp(prefix="rag-test-logs-"), "travel_assistant_rag.log")
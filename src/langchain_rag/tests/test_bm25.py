@@ -0,0 +1,86 @@
+import math
+import random
+import pytest
+from src.langchain_rag.bm25 import BM25Index, tokenize, matches_filters
+
+
+WORDS = "london paris hotel museum beach tower river park cafe bridge ski resort tour".split()
+
+
+def make_chunks(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"c{i}",
+            "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+            "title": f"Brochure {i % 5}",
+            "source": f"docs/brochure_{i % 5}.pdf",
+            "page": i % 3 + 1,
+        }
+        for i in range(count)
+    ]
+
+
+def brute_force(index, query, top_k):
+    """score every live document directly, without postings or pruning"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    avg_length = index.avg_length
+    scores = []
+    for docno, fields in index._docs.items():
+        tokens = tokenize(f"{fields['title'] or ''} {fields['content'] or ''}")
+        score = 0.0
+        for term in terms:
+            tf = tokens.count(term)
+            if not tf:
+                continue
+            df = sum(1 for other in index._docs.values()
+                     if term in tokenize(f"{other['title'] or ''} {other['content'] or ''}"))
+            idf = math.log(1 + (len(index) - df + 0.5) / (df + 0.5))
+            norm = index.k1 * (1 - index.b + index.b * len(tokens) / avg_length)
+            score += idf * tf * (index.k1 + 1) / (tf + norm)
+        if score > 0:
+            scores.append((score, fields["id"]))
+    return sorted(scores, reverse=True)[:top_k]
+
+
+@pytest.mark.parametrize("query", ["london hotel", "ski resort tour", "paris museum river bridge", "cafe"])
+def test_maxscore_matches_exhaustive_scoring(query):
+    index = BM25Index()
+    index.add(make_chunks(200))
+
+    results = index.search(query, top_k=5)
+    expected = brute_force(index, query, 5)
+
+    assert [round(score, 6) for score, _ in results] == [round(score, 6) for score, _ in expected]
+
+
+def test_delete_upsert_and_round_trip(tmp_path):
+    index = BM25Index()
+    index.add(make_chunks(50))
+    index.delete_source("docs/brochure_0.pdf")
+    index.add([{"id": "c1", "content": "zanzibar spice tour", "title": "Brochure 1", "source": "docs/brochure_1.pdf"}])
+
+    assert len(index) == 40
+    assert all(fields["source"] != "docs/brochure_0.pdf" for _, fields in index.search("london paris hotel", 50))
+    assert index.search("zanzibar", 3)[0][1]["id"] == "c1"
+
+    path = tmp_path / "index.bin"
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert len(loaded) == 40
+    for query in ("london hotel", "zanzibar", "ski resort"):
+        assert [(round(s, 9), f["id"]) for s, f in loaded.search(query, 5)] == \
+               [(round(s, 9), f["id"]) for s, f in index.search(query, 5)]
+
+
+def test_search_applies_filters():
+    index = BM25Index()
+    index.add(make_chunks(100))
+
+    results = index.search("london hotel", top_k=10, filters={"title": "Brochure 2", "page": {"lte": 2}})
+
+    assert results
+    assert all(fields["title"] == "Brochure 2" and fields["page"] <= 2 for _, fields in results)
+    with pytest.raises(ValueError):
+        matches_filters({}, {"colour": "blue"})
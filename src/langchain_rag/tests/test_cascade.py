@@ -0,0 +1,34 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from src.langchain_rag.cascade import ModelCascade, check_answer, classify_question
+
+CONTEXT = "The Grand Hotel in Paris has 120 rooms near the Opera and serves breakfast until 11."
+
+
+def test_classify_question():
+    assert classify_question("Which hotel is near the Opera?") is None
+    assert classify_question("Compare hotels in Paris and London") == "complex_wording"
+    assert classify_question("Where to stay? And what to eat?") == "multi_part"
+    assert classify_question("Hotels in Paris?", sources=4) == "many_sources"
+
+
+def test_check_answer():
+    question = "How many rooms does the Grand Hotel have?"
+    assert check_answer("The Grand Hotel in Paris has 120 rooms near the Opera.", question, CONTEXT) is None
+    assert check_answer("The Grand Hotel has 150 rooms.", question, CONTEXT) == "ungrounded_number"
+    assert check_answer("The context does not mention the number of rooms.", question, CONTEXT) == "refusal"
+    assert check_answer("Luxurious spacious suites overlooking gardens everywhere.", question, CONTEXT) == "low_grounding"
+
+
+def test_cascade_escalates_failed_fast_answers():
+    fast = FakeListChatModel(responses=["The Grand Hotel has 120 rooms.", "It has 150 rooms."])
+    strong = FakeListChatModel(responses=["The Grand Hotel has 120 rooms near the Opera."])
+    cascade = ModelCascade(strong, fast)
+    question = "How many rooms does the Grand Hotel have?"
+
+    answer, route = cascade.generate("prompt", question, CONTEXT)
+    assert route["tier"] == "fast" and not route["escalated"]
+
+    answer, route = cascade.generate("prompt", question, CONTEXT)
+    assert route == {**route, "tier": "strong", "escalated": True, "reason": "ungrounded_number"}
+    assert answer == "The Grand Hotel has 120 rooms near the Opera."
+    assert cascade.stats()["escalation_rate"] == 0.5
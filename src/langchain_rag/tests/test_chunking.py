@@ -0,0 +1,53 @@
+from src.langchain_rag.chunking import TokenChunker
+from src.langchain_rag.metering import estimate_tokens
+
+PARAGRAPH = "The hotel offers comfortable rooms close to the main sights of the city. " * 4
+
+
+def brochure(sections=4):
+    return "\n\n".join(
+        f"Section {i} Hotels\n\n" + "\n\n".join(PARAGRAPH for _ in range(3)) for i in range(sections)
+    )
+
+
+def test_chunks_fit_the_token_budget():
+    chunker = TokenChunker(chunk_tokens=120, overlap_tokens=30)
+    chunks = chunker.split_text(brochure())
+    assert chunks
+    assert all(estimate_tokens(chunk) <= 125 for chunk in chunks)
+
+
+def test_headings_start_chunks():
+    chunks = TokenChunker(chunk_tokens=200, overlap_tokens=30, min_fill=0).split_text(brochure())
+    for i in range(4):
+        heading = f"Section {i} Hotels"
+        assert next(chunk for chunk in chunks if heading in chunk).startswith(heading)
+
+    # with the default fill a heading may sit inside a chunk, but never at its end
+    chunks = TokenChunker(chunk_tokens=200, overlap_tokens=30).split_text(brochure())
+    assert sum(chunk.count("Hotels") for chunk in chunks) == 4
+    assert not any(chunk.endswith("Hotels") for chunk in chunks)
+
+
+def test_long_blocks_are_split_by_sentences_and_words():
+    chunker = TokenChunker(chunk_tokens=50, overlap_tokens=10)
+    sentences = "One sentence about Paris hotels near the river. " * 40
+    words = "word " * 600
+    chunks = chunker.split_text(sentences + "\n\n" + words)
+    assert all(estimate_tokens(chunk) <= 55 for chunk in chunks)
+    assert "".join(chunks).count("Paris") >= 40
+
+
+def test_overlap_repeats_the_previous_paragraph():
+    chunker = TokenChunker(chunk_tokens=150, overlap_tokens=80)
+    text = "\n\n".join(f"Paragraph {i}. " + "Rooms near the river. " * 8 for i in range(6))
+    chunks = chunker.split_text(text)
+    assert len(chunks) > 1
+    last_paragraph = chunks[0].split("\n\n")[-1]
+    assert chunks[1].startswith(last_paragraph)
+
+
+def test_split_many_matches_split_text():
+    chunker = TokenChunker(chunk_tokens=120, overlap_tokens=30, workers=2)
+    texts = [brochure(2), brochure(3)]
+    assert chunker.split_many(texts) == [chunker.split_text(text) for text in texts]
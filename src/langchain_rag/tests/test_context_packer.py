@@ -0,0 +1,46 @@
+from langchain_core.documents import Document
+from src.langchain_rag.context_packer import ContextPacker, overlap_length
+
+
+def doc(text, score, source="docs/paris.pdf"):
+    return Document(page_content=text, metadata={"@search.score": score, "source": source})
+
+
+PARIS = "Le Grand Hotel in Paris offers rooms near the Opera with breakfast included for every guest. "
+LONDON = "The Savoy in London sits on the Strand and has river views from the upper floors and a bar. "
+ROME = "Rome tours visit the Colosseum and the Forum with a licensed guide every morning at nine. "
+
+
+def test_adaptive_k_stops_at_score_gap():
+    packer = ContextPacker(token_budget=10000)
+    packed = packer.pack([doc(PARIS, 10.0), doc(LONDON, 9.0, "docs/london.pdf"), doc(ROME, 2.0, "docs/rome.pdf")])
+    assert packed.stats["adaptive_k"] == 2
+    assert [d.metadata["source"] for d in packed.documents] == ["docs/paris.pdf", "docs/london.pdf"]
+    assert packed.stats["tokens_saved"] > 0
+
+
+def test_redundant_chunks_are_dropped():
+    packer = ContextPacker(token_budget=10000)
+    packed = packer.pack([doc(PARIS * 3, 5.0), doc(PARIS * 2, 4.9, "docs/copy.pdf"), doc(LONDON, 4.8, "docs/london.pdf")])
+    assert packed.stats["dropped_redundant"] == 1
+    assert len(packed.documents) == 2
+
+
+def test_splitter_overlap_is_trimmed():
+    first = PARIS + LONDON
+    second = LONDON + ROME
+    assert overlap_length(first, second) == len(LONDON)
+
+    packed = ContextPacker(token_budget=10000, redundancy=1.1).pack([doc(first, 3.0), doc(second, 2.9)])
+    assert packed.text.count("Savoy") == 1
+    assert packed.stats["trimmed_overlap_chars"] == len(LONDON.strip())
+
+
+def test_token_budget_is_respected():
+    packer = ContextPacker(token_budget=60)
+    documents = [doc(text * 2, score, source) for text, score, source in [
+        (PARIS, 5.0, "a"), (LONDON, 4.9, "b"), (ROME, 4.8, "c")
+    ]]
+    packed = packer.pack(documents)
+    assert packed.stats["context_tokens"] <= 62
+    assert packed.stats["dropped_over_budget"] >= 1
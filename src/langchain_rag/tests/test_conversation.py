@@ -0,0 +1,100 @@
+import threading
+import time
+from src.langchain_rag import conversation
+from src.langchain_rag.conversation import ConversationStore, Turn
+from src.langchain_rag.metering import estimate_tokens
+
+
+def wait_until_compressed(session, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while session.compressing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not session.compressing
+
+
+def test_history_keeps_the_latest_turns_within_the_budget():
+    store = ConversationStore(history_tokens=120, recent_turns=100)
+    session = store.get("s1")
+    for i in range(20):
+        store.add_turn(session, f"Question {i} about hotels in Paris?", f"Answer {i}: the Grand Hotel. " * 3)
+
+    history = store.history(session)
+    assert estimate_tokens(history) <= 120
+    assert history.endswith(session.turns[-1].text())
+    assert "Question 0 " not in history
+    kept = [int(line.split()[2]) for line in history.splitlines() if line.startswith("User:")]
+    assert kept == sorted(kept) and kept[-1] == 19
+
+
+def test_history_shortens_an_oversized_last_turn_and_includes_the_summary():
+    store = ConversationStore(history_tokens=60)
+    session = store.get("s1")
+    session.summary = "The user is planning a trip to Paris."
+    store.add_turn(session, "Tell me everything about Paris", "Paris has many hotels. " * 100)
+
+    history = store.history(session)
+    assert history.startswith("Summary of earlier conversation: The user is planning a trip to Paris.")
+    assert "..." in history and history.endswith("Paris has many hotels. ")
+    # the truncation is proportional to characters, so allow a token or two over
+    assert estimate_tokens(history) <= 62
+
+
+def test_sessions_are_evicted_least_recently_used_and_when_idle(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation.time, "monotonic", lambda: now[0])
+    store = ConversationStore(max_sessions=2, idle_ttl=60)
+
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+    store.get("c")
+    assert len(store) == 2
+    assert store.get("a") is first
+    assert store.get("b") is not None and len(store) == 2
+
+    now[0] += 30
+    store.get("a")
+    now[0] += 45
+    # b and c were idle for 75 seconds, a for 45
+    store.get("d")
+    assert store.get("a") is first and len(store) == 2
+
+
+def test_older_turns_are_summarised_in_the_background():
+    store = ConversationStore(history_tokens=300, recent_turns=2)
+    session = store.get("s1")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def summarize(previous, turns):
+        calls.append((previous, [turn.question for turn in turns]))
+        started.set()
+        release.wait(2)
+        return f"Asked about {', '.join(turn.question for turn in turns)}."
+
+    for question in ("Q1", "Q2", "Q3"):
+        store.add_turn(session, question, "A", summarize)
+    assert started.wait(2)
+    # added while summarising, so it must survive the summary
+    store.add_turn(session, "Q4", "A", summarize)
+    release.set()
+    wait_until_compressed(session)
+
+    assert calls == [("", ["Q1"])]
+    assert session.summary == "Asked about Q1."
+    assert [turn.question for turn in session.turns] == ["Q2", "Q3", "Q4"]
+    assert store.history(session).startswith("Summary of earlier conversation: Asked about Q1.")
+
+
+def test_failed_summary_still_bounds_the_history():
+    store = ConversationStore(recent_turns=2)
+    session = store.get("s1")
+    session.turns = [Turn(f"Q{i}", "A") for i in range(4)]
+
+    def broken(previous, turns):
+        raise ConnectionError("model unavailable")
+
+    store.add_turn(session, "Q4", "A", broken)
+    wait_until_compressed(session)
+    assert session.summary == ""
+    assert [turn.question for turn in session.turns] == ["Q3", "Q4"]
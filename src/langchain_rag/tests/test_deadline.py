@@ -0,0 +1,124 @@
+import time
+import threading
+import httpx
+import openai
+import pytest
+from src.langchain_rag.deadline import DeadlineExceeded, Hedger, deadline, invoke_llm, request_timeout, stage
+
+
+def warmed_hedger(**kwargs):
+    hedger = Hedger(min_samples=3, min_delay=0.02, **kwargs)
+    for _ in range(3):
+        hedger.call(lambda: "warm")
+    return hedger
+
+
+def slow_first_call(seconds):
+    calls = []
+    lock = threading.Lock()
+
+    def search(query):
+        with lock:
+            calls.append(query)
+            attempt = len(calls)
+        if attempt == 1:
+            time.sleep(seconds)
+        return f"{query} #{attempt}"
+
+    return search, calls
+
+
+def test_request_timeout_is_capped(monkeypatch):
+    monkeypatch.setenv("REQUEST_TIMEOUT_MS", "10000")
+    assert request_timeout() == 10.0
+    assert request_timeout("2500") == 2.5
+    assert request_timeout(60000) == 10.0
+    with pytest.raises(ValueError):
+        request_timeout(0)
+    with pytest.raises(ValueError):
+        request_timeout("soon")
+
+
+def test_stage_fails_when_time_is_short():
+    with deadline(1.0, reserve=0.5):
+        with stage("retrieval"):
+            pass
+        time.sleep(0.55)
+        with pytest.raises(DeadlineExceeded) as error:
+            with stage("generation"):
+                pass
+    assert error.value.stage == "generation"
+
+
+def test_slow_call_is_hedged():
+    hedger = warmed_hedger()
+    search, calls = slow_first_call(1.0)
+    start = time.perf_counter()
+    result, info = hedger.call(search, "paris")
+    assert time.perf_counter() - start < 0.5
+    assert result == "paris #2"
+    assert info["hedged"] and info["hedge_won"]
+    assert hedger.stats()["hedge_won"] == 1
+
+
+def test_hedge_ratio_is_capped():
+    hedger = warmed_hedger(max_ratio=0.0)
+    search, calls = slow_first_call(0.2)
+    result, info = hedger.call(search, "paris")
+    assert result == "paris #1"
+    assert not info["hedged"]
+    assert len(calls) == 1
+
+
+def test_deadline_cuts_a_slow_call():
+    hedger = Hedger()
+    start = time.perf_counter()
+    with deadline(0.2, reserve=0.0):
+        with pytest.raises(DeadlineExceeded):
+            hedger.call(time.sleep, 1.0)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_errors_are_raised_when_every_attempt_fails():
+    def broken(query):
+        raise ConnectionError("search unavailable")
+
+    with pytest.raises(ConnectionError):
+        warmed_hedger().call(broken, "paris")
+
+
+class FlakyLLM:
+    def __init__(self, failures, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.timeouts = []
+
+    def invoke(self, prompt, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.delay)
+        if len(self.timeouts) <= self.failures:
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://test"))
+        return prompt.upper()
+
+
+def test_llm_retries_stay_within_the_deadline():
+    assert invoke_llm(FlakyLLM(failures=1), "paris", backoff=0.01) == "PARIS"
+
+    llm = FlakyLLM(failures=5, delay=0.1)
+    start = time.perf_counter()
+    with deadline(0.5, reserve=0.05):
+        with pytest.raises(openai.APITimeoutError):
+            invoke_llm(llm, "paris", attempts=5, backoff=0.1)
+    assert time.perf_counter() - start < 0.6
+    # every attempt is bounded by what is left, never by the full timeout again
+    assert all(later < earlier for earlier, later in zip(llm.timeouts, llm.timeouts[1:]))
+
+
+def test_no_hedge_while_every_worker_is_busy():
+    hedger = Hedger(min_samples=3, min_delay=0.02, max_workers=1)
+    for _ in range(3):
+        hedger.call(lambda: "warm")
+    search, calls = slow_first_call(0.2)
+    result, info = hedger.call(search, "paris")
+    assert not info["hedged"]
+    assert len(calls) == 1
@@ -0,0 +1,104 @@
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from src.langchain_rag.docs_to_storage import EnhancedDocumentUploader, IncompleteUploadError
+from src.langchain_rag.folder_watch import ChangeBatcher, FolderWatcher, PendingChange
+
+
+def test_batcher_waits_for_files_to_settle():
+    batcher = ChangeBatcher(debounce=0.2, max_wait=5, max_files=2)
+    stop = threading.Event()
+
+    start = time.monotonic()
+    for _ in range(3):
+        batcher.add("docs/a.pdf")
+        time.sleep(0.05)
+    assert list(batcher.next_batch(stop)) == ["docs/a.pdf"]
+    # the last event restarts the quiet period
+    assert time.monotonic() - start >= 0.3
+
+    for name in ("c", "b", "c", "d"):
+        batcher.add(f"docs/{name}.pdf")
+    time.sleep(0.25)
+    # repeated events for one file collapse; the oldest files go first
+    assert list(batcher.next_batch(stop)) == ["docs/c.pdf", "docs/b.pdf"]
+    assert list(batcher.next_batch(stop)) == ["docs/d.pdf"]
+
+
+def test_batcher_returns_empty_when_stopped():
+    stop = threading.Event()
+    stop.set()
+    assert ChangeBatcher().next_batch(stop) == {}
+
+
+class FieldsIndexClient:
+    def __init__(self, filterable):
+        self.filterable = filterable
+
+    def get_index(self, name):
+        return SimpleNamespace(fields=[SimpleNamespace(name="source", filterable=self.filterable)])
+
+
+def uploader_for(filterable):
+    uploader = EnhancedDocumentUploader.__new__(EnhancedDocumentUploader)
+    uploader.backend = "azure"
+    uploader.physical_indexes = {"travel": "travel-g1"}
+    uploader.index_client = FieldsIndexClient(filterable)
+    uploader.create_search_index = lambda: None
+    return uploader
+
+
+def test_watch_refuses_an_index_without_filterable_source(tmp_path):
+    uploader_for(True).ensure_incremental_index()
+    with pytest.raises(RuntimeError, match="reindex.py"):
+        uploader_for(False).ensure_incremental_index()
+
+    watcher = FolderWatcher(uploader_for(False), str(tmp_path), polling=True)
+    with pytest.raises(RuntimeError):
+        watcher.start()
+    assert not watcher._observer.is_alive()
+
+
+def test_partly_uploaded_files_keep_their_old_chunks():
+    uploader = uploader_for(True)
+    uploader._index_ready = True
+    uploader.load_files = lambda paths, tags: [SimpleNamespace(source=path) for path in paths]
+    uploader.split_documents = lambda documents: [SimpleNamespace(id=f"{doc.source}#0", source=doc.source)
+                                                  for doc in documents]
+    uploader._embed_and_upload = lambda chunks: {"failed": 1, "failed_sources": ["docs/b.pdf"]}
+    removed = []
+    uploader._remove_chunks = lambda sources, keep_ids: removed.append(sources) or 0
+
+    with pytest.raises(IncompleteUploadError) as error:
+        uploader.process_files(["docs/a.pdf", "docs/b.pdf"])
+    assert error.value.sources == ["docs/b.pdf"]
+    assert removed == [{"docs/a.pdf"}]
+
+
+class FailingUploader:
+    def __init__(self, error):
+        self.error = error
+
+    def process_files(self, paths, tags):
+        raise self.error
+
+
+def test_watcher_retries_only_the_files_that_failed(tmp_path):
+    paths = [str(tmp_path / name) for name in ("a.pdf", "b.pdf")]
+    for path in paths:
+        open(path, "w").close()
+
+    def batch():
+        return {path: PendingChange(time.time(), time.monotonic(), time.monotonic()) for path in paths}
+
+    watcher = FolderWatcher(FailingUploader(IncompleteUploadError([paths[1]])), str(tmp_path), polling=True)
+    watcher.process_batch(batch())
+    assert list(watcher.batcher._pending) == [paths[1]]
+    assert watcher.batcher._pending[paths[1]].attempts == 1
+    assert watcher.batches == 1 and len(watcher.lags) == 1
+
+    watcher = FolderWatcher(FailingUploader(ConnectionError("search down")), str(tmp_path), polling=True)
+    watcher.process_batch(batch())
+    assert sorted(watcher.batcher._pending) == paths
+    assert watcher.batches == 0
@@ -0,0 +1,51 @@
+from src.langchain_rag.chunking import TokenChunker
+from src.langchain_rag.docs_to_storage import EnhancedDocumentUploader
+from src.langchain_rag.ingest_journal import IngestJournal, chunk_key
+from src.langchain_rag.records import DocumentRecord, VectorBatch
+
+
+def test_chunk_key_is_deterministic():
+    key = chunk_key("docs/paris.pdf", "abc", 1, 0, "Hotels in Paris")
+    assert key == chunk_key("docs/paris.pdf", "abc", 1, 0, "Hotels in Paris")
+    assert key != chunk_key("docs/paris.pdf", "abc", 2, 0, "Hotels in Paris")
+    assert key != chunk_key("docs/paris.pdf", "abd", 1, 0, "Hotels in Paris")
+    # an identical copy elsewhere is a separate document
+    assert key != chunk_key("docs/copy/paris.pdf", "abc", 1, 0, "Hotels in Paris")
+
+
+def test_journal_resumes_embeddings_and_uploads(tmp_path):
+    ids = ["a", "b", "c"]
+    journal = IngestJournal.for_run(ids, "model", "index", root=tmp_path)
+    assert not journal.resumed
+
+    journal.record_embeddings(["a", "b"], VectorBatch.from_lists([[0.5, -1.0], [0.25, 2.0]]))
+    journal.record_uploaded(["a"])
+    journal.record_file_done("docs/a.pdf")
+    # a crash mid-append leaves a torn last line
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"event": "uploa')
+
+    resumed = IngestJournal.for_run(reversed(ids), "model", "index", root=tmp_path)
+    assert resumed.resumed
+    assert resumed.uploaded_keys == {"a"}
+    assert resumed.finished_files == {"docs/a.pdf"}
+    saved = {chunk_id: batch.row(row).tolist() for chunk_id, (batch, row) in resumed.embeddings().items()}
+    assert saved == {"a": [0.5, -1.0], "b": [0.25, 2.0]}
+
+    # different settings are a different run
+    assert not IngestJournal.for_run(ids, "other-model", "index", root=tmp_path).resumed
+
+    resumed.complete()
+    assert not resumed.run_dir.exists()
+
+
+def test_identical_copies_keep_their_own_chunks():
+    uploader = EnhancedDocumentUploader.__new__(EnhancedDocumentUploader)
+    uploader.text_splitter = TokenChunker(chunk_tokens=50, overlap_tokens=10)
+    documents = [
+        DocumentRecord("Hotels in Paris near the river.", 0, source, "abc", "paris", "pdf", "2026-01-02T03:04:05Z")
+        for source in ("docs/paris.pdf", "docs/copy/paris.pdf")
+    ]
+    chunks = uploader.split_documents(documents)
+    assert [chunk.source for chunk in chunks] == ["docs/paris.pdf", "docs/copy/paris.pdf"]
+    assert chunks[0].id != chunks[1].id
@@ -0,0 +1,53 @@
+import logging
+import queue
+from src.langchain_rag import logging_pipeline
+from src.langchain_rag.logging_pipeline import DroppingQueueHandler, configure_logging
+
+
+def record(message, **extra):
+    entry = logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_full_queue_drops_and_reports_later():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    for i in range(5):
+        handler.emit(record(f"message {i}"))
+    assert (handler.enqueued, handler.dropped) == (2, 3)
+
+    log_queue.get_nowait()
+    log_queue.get_nowait()
+    handler.emit(record("after the burst"))
+    notice, latest = log_queue.get_nowait(), log_queue.get_nowait()
+    assert notice.getMessage() == "Log queue was full, dropped 3 records"
+    assert latest.getMessage() == "after the burst"
+    assert handler.dropped == 3
+
+
+def test_long_payloads_are_truncated_unless_sampled(monkeypatch):
+    handler = DroppingQueueHandler(queue.Queue(), max_payload_chars=10, sample_rate=0.1)
+    long_answer = "x" * 50
+
+    monkeypatch.setattr(logging_pipeline.random, "random", lambda: 0.5)
+    prepared = handler.prepare(record(long_answer, custom_dimensions={"answer": long_answer, "latency_ms": 12}))
+    assert prepared.msg == "x" * 10 + "... [truncated 40 chars]"
+    assert prepared.custom_dimensions["answer"].startswith("x" * 10 + "...")
+    assert prepared.custom_dimensions["latency_ms"] == 12
+    assert handler.prepare(record("short")).msg == "short"
+
+    # the sampled fraction keeps whole payloads for debugging
+    monkeypatch.setattr(logging_pipeline.random, "random", lambda: 0.05)
+    assert handler.prepare(record(long_answer)).msg == long_answer
+
+
+def test_configure_logging_keeps_existing_root_handlers(monkeypatch, tmp_path):
+    root = logging.getLogger()
+    existing = logging.NullHandler()
+    monkeypatch.setattr(root, "handlers", [existing])
+    monkeypatch.setattr(logging_pipeline, "_root_configured", False)
+
+    configure_logging(log_file=str(tmp_path / "rag.log"))
+    assert root.handlers == [existing]
+    assert not (tmp_path / "rag.log").exists()
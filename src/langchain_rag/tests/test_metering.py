@@ -0,0 +1,72 @@
+import pytest
+from src.langchain_rag.metering import (
+    Budget,
+    BudgetExceededError,
+    Meter,
+    UsageRecord,
+    entry_point,
+    load_budgets,
+)
+
+
+def test_meter_aggregates_per_entry_point_and_window():
+    meter = Meter(window_seconds=60)
+    meter.record(UsageRecord("rag.ask", "chat", "gpt-4o", 100, 20, 0.5, timestamp=0))
+    meter.record(UsageRecord("rag.ask", "chat", "gpt-4o", 50, 10, 1.5, cached=True, timestamp=30))
+    meter.record(UsageRecord("rag.ingest", "embedding", "ada", 400, 0, 0.2, timestamp=70))
+
+    summary = meter.summary()
+
+    assert summary["entry_points"]["rag.ask"]["calls"] == 2
+    assert summary["entry_points"]["rag.ask"]["cached_calls"] == 1
+    assert summary["entry_points"]["rag.ask"]["prompt_tokens"] == 150
+    assert summary["entry_points"]["rag.ask"]["mean_latency_s"] == pytest.approx(1.0)
+    assert [w["window_start"] for w in summary["windows"]] == [0, 60]
+    assert list(summary["windows"][1]["entry_points"]) == ["rag.ingest"]
+
+
+def test_blocking_budget_stops_calls_for_its_entry_point_only():
+    meter = Meter(budgets=[Budget(entry_point="quiz", max_prompt_tokens=100, action="block")])
+
+    with entry_point("quiz"):
+        with meter.measure("chat", "gpt-4o") as usage:
+            usage["prompt_tokens"] = 120
+        with pytest.raises(BudgetExceededError):
+            with meter.measure("chat", "gpt-4o"):
+                pass
+
+    with entry_point("rag.ask"):
+        meter.check_budget()
+
+
+def test_load_budgets_rejects_unknown_action():
+    with pytest.raises(ValueError):
+        load_budgets('[{"entry_point": "*", "max_calls": 1, "action": "explode"}]')
+
+
+def test_budget_window_slides_with_running_totals(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.langchain_rag.metering.time.time", lambda: now[0])
+    meter = Meter(budgets=[Budget(entry_point="quiz", window_seconds=60, max_prompt_tokens=100, action="block")])
+
+    meter.record(UsageRecord("quiz", "chat", "gpt-4o", 60, 0, 0.1, timestamp=950))
+    meter.record(UsageRecord("rag.ask", "chat", "gpt-4o", 500, 0, 0.1, timestamp=960))
+    meter.record(UsageRecord("quiz", "chat", "gpt-4o", 50, 0, 0.1, timestamp=990))
+    with pytest.raises(BudgetExceededError):
+        meter.check_budget("quiz")
+
+    now[0] = 1015.0
+    meter.check_budget("quiz")
+    assert meter._budget_windows[0].totals.prompt_tokens == 50
+    assert meter._budget_windows[0].totals.calls == 1
+
+
+def test_budget_warns_once_per_window_across_threads(caplog):
+    from concurrent.futures import ThreadPoolExecutor
+
+    meter = Meter(budgets=[Budget(entry_point="*", window_seconds=3600, max_calls=1)])
+    with caplog.at_level("WARNING", logger="llm.usage"):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: meter.record(UsageRecord("rag.ask", "chat", "gpt-4o", 1, 1, 0.0)), range(200)))
+
+    assert len([r for r in caplog.records if r.levelname == "WARNING"]) == 1
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from src.langchain_rag import precompute
+from src.langchain_rag.precompute import PrecomputeScheduler, mine_questions, normalize_question
+
+
+def write_log(path, questions):
+    entries = [{"question": question, "answer": "..."} for question in questions]
+    path.write_text(json.dumps(entries), encoding="utf-8")
+
+
+def test_normalize_question():
+    assert normalize_question("  What hotels are in PARIS?! ") == "what hotels are in paris"
+    assert normalize_question("Hôtels in   Dubai…") == "hôtels in dubai"
+    assert normalize_question("???") == ""
+
+
+def test_mine_questions_counts_normalized_questions(tmp_path):
+    log = tmp_path / "answers.json"
+    write_log(log, ["Hotels in Paris?", "hotels in paris", "Hotels in Paris?", "Weather in London", "!!!"])
+    with open(log, "r+", encoding="utf-8") as f:
+        entries = json.load(f)
+        # filtered answers depend on the filter and are not shared
+        entries += [{"question": "Weather in London", "filters": {"title": "London"}}] * 3
+        f.seek(0)
+        json.dump(entries, f)
+
+    popular = mine_questions(str(log), top_n=10, min_count=2)
+    assert popular == [{"key": "hotels in paris", "question": "Hotels in Paris?", "count": 3}]
+    assert len(mine_questions(str(log), top_n=10, min_count=1)) == 2
+
+
+def test_mine_questions_survives_missing_and_partial_logs(tmp_path):
+    assert mine_questions(str(tmp_path / "missing.json")) == []
+    partial = tmp_path / "answers.json"
+    partial.write_text('[{"question": "Hotels in Par', encoding="utf-8")
+    assert mine_questions(str(partial)) == []
+
+
+def test_scheduler_coalesces_requests_into_one_rerun(monkeypatch):
+    runs = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fake_job(rag, store, **kwargs):
+        runs.append(rag)
+        started.set()
+        release.wait(2)
+
+    monkeypatch.setattr(precompute, "precompute_answers", fake_job)
+    monkeypatch.setattr(precompute, "get_precomputed_answers", lambda: None)
+
+    scheduler = PrecomputeScheduler(lambda: "rag")
+    scheduler.schedule()
+    assert started.wait(2)
+    for _ in range(5):
+        scheduler.schedule()
+    release.set()
+
+    deadline = time.monotonic() + 2
+    while scheduler._running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not scheduler._running
+    assert runs == ["rag", "rag"]
+
+
+def test_answers_log_is_replaced_atomically(tmp_path):
+    from src.langchain_rag.main import SimpleTravelRAG
+
+    log = tmp_path / "results" / "answers.json"
+    for question in ("Hotels in Paris?", "Hotels in Paris?"):
+        SimpleTravelRAG._save_to_json(None, {"question": question}, str(log))
+    assert [entry["question"] for entry in json.loads(log.read_text(encoding="utf-8"))] == ["Hotels in Paris?"] * 2
+    assert [path.name for path in log.parent.iterdir()] == ["answers.json"]
+    assert mine_questions(str(log))[0]["count"] == 2
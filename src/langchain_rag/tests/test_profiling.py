@@ -0,0 +1,83 @@
+import threading
+import time
+from src.langchain_rag import profiling
+from src.langchain_rag.profiling import header_requests_profile, profile_request, span
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_nothing_is_profiled_at_sample_rate_zero(monkeypatch, tmp_path):
+    monkeypatch.setenv("RAG_PROFILE_SAMPLE_RATE", "0")
+    monkeypatch.setenv("RAG_PROFILE_DIR", str(tmp_path))
+
+    def no_sampling():
+        raise AssertionError("a rate of 0 must not draw a sample")
+
+    monkeypatch.setattr(profiling.random, "random", no_sampling)
+    with profile_request("ask") as profile:
+        assert profile is None
+        # the shared no-op: no span object, no timing
+        assert span("retrieval") is span("generation") is profiling._NOOP_SPAN
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_forced_profile_writes_every_artifact(monkeypatch, tmp_path):
+    monkeypatch.setenv("RAG_PROFILE_DIR", str(tmp_path))
+    with profile_request("ask", force=True) as profile:
+        with span("retrieval"):
+            busy(0.05)
+        with span("generation"):
+            busy(0.02)
+
+    def artifact(suffix):
+        return tmp_path / f"{profile.profile_id}{suffix}"
+
+    for suffix in (".prof", ".stacks.folded", ".spans.folded", ".alloc.txt"):
+        assert artifact(suffix).stat().st_size > 0, suffix
+
+    spans = dict(line.rsplit(" ", 1) for line in artifact(".spans.folded").read_text().splitlines())
+    assert set(spans) == {"ask", "ask;retrieval", "ask;generation"}
+    assert int(spans["ask;retrieval"]) >= 40000
+    assert "busy" in artifact(".stacks.folded").read_text()
+    assert artifact(".alloc.txt").read_text().startswith("peak traced memory:")
+    assert profiling._active.get() is None
+
+
+def test_header_requests_profile():
+    assert header_requests_profile({"X-Profile": "1"})
+    assert header_requests_profile({"x-profile": " TRUE "})
+    assert header_requests_profile({"X-Profile": "on"})
+    assert not header_requests_profile({"X-Profile": "0"})
+    assert not header_requests_profile({"X-Profile": ""})
+    assert not header_requests_profile({})
+
+
+def test_only_one_request_is_profiled_at_a_time(monkeypatch, tmp_path):
+    monkeypatch.setenv("RAG_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("RAG_PROFILE_MEMORY", "0")
+    started, release = threading.Event(), threading.Event()
+    profiles = {}
+
+    def first_request():
+        with profile_request("upload", force=True) as profile:
+            profiles["first"] = profile
+            started.set()
+            release.wait(2)
+
+    thread = threading.Thread(target=first_request)
+    thread.start()
+    assert started.wait(2)
+    with profile_request("ask", force=True) as profile:
+        profiles["second"] = profile
+    release.set()
+    thread.join(2)
+
+    assert profiles["first"] is not None and profiles["second"] is None
+    assert not (tmp_path / f"{profiles['first'].profile_id}.alloc.txt").exists()
+    # the lock is released again afterwards
+    with profile_request("ask", force=True) as profile:
+        assert profile is not None
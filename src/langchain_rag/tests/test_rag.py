@@ -48,6 +48,38 @@ def test_ask_rag_missing_question():
     assert response_data["status"] == "error"
     assert "required" in response_data["error"]
 
+def test_ask_rag_passes_filters():
+    with patch('src.langchain_rag.function_app.get_rag_system') as mock_get_rag:
+        mock_rag = Mock()
+        mock_rag.ask.return_value = {"question": "Hotels?", "answer": "The Grand", "status": "success"}
+        mock_get_rag.return_value = mock_rag
+
+        filters = {"title": "London Brochure", "page": {"lte": 2}}
+        req = func.HttpRequest(
+            method='POST',
+            body=json.dumps({"question": "Hotels?", "filters": filters}).encode('utf-8'),
+            url='http://localhost/api/ask',
+            headers={'content-type': 'application/json'}
+        )
+
+        response = ask_rag(req)
+
+        assert response.status_code == 200
+        mock_rag.ask.assert_called_once_with("Hotels?", filters=filters, session_id=None)
+
+def test_ask_rag_unknown_filter():
+    req = func.HttpRequest(
+        method='POST',
+        body=json.dumps({"question": "Hotels?", "filters": {"colour": "blue"}}).encode('utf-8'),
+        url='http://localhost/api/ask',
+        headers={'content-type': 'application/json'}
+    )
+
+    response = ask_rag(req)
+
+    assert response.status_code == 400
+    assert "colour" in json.loads(response.get_body().decode())["error"]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,35 @@
+import pytest
+from src.langchain_rag.records import ChunkRecord, VectorBatch
+
+
+def make_chunk(i):
+    return ChunkRecord(
+        id=f"chunk-{i}", content=f"Hotels in Paris {i}", title="Paris Brochure", source="docs/paris.pdf",
+        chunk_id=i, page=1, file_type="pdf", ingested_at="2026-01-02T03:04:05Z", tags=("europe",)
+    )
+
+
+def test_vector_batch_round_trip():
+    batch = VectorBatch.from_lists([[0.5, -1.0, 2.0], [0.25, 0.0, -3.5]])
+    assert len(batch) == 2
+    assert batch.row(1).tolist() == [0.25, 0.0, -3.5]
+    assert VectorBatch.from_bytes(3, batch.to_bytes()).values == batch.values
+    with pytest.raises(ValueError):
+        batch.append([1.0, 2.0])
+    assert len(batch) == 2
+
+
+def test_chunks_expand_vectors_only_on_the_wire():
+    vectors = VectorBatch.from_lists([[0.5, -1.0], [0.25, 2.0]])
+    chunks = [make_chunk(i) for i in range(2)]
+    for row, chunk in enumerate(chunks):
+        chunk.set_vector(vectors, row)
+
+    assert not hasattr(chunks[0], "__dict__")
+    assert chunks[1].vector.tolist() == [0.25, 2.0]
+    document = chunks[1].to_wire()
+    assert document["content_vector"] == [0.25, 2.0]
+    assert document["tags"] == ["europe"]
+    assert ChunkRecord.from_fields(document).fields() == chunks[1].fields()
+    assert "content_vector" not in make_chunk(3).to_wire()
+    assert chunks[0].get("source") == "docs/paris.pdf"
@@ -0,0 +1,116 @@
+import itertools
+import pytest
+from src.langchain_rag import reindex
+from src.langchain_rag.reindex import ReindexError, validate_generation
+from src.langchain_rag.sharding import IndexPointer
+
+
+class FakeSearchClient:
+    def __init__(self, count, hits=True):
+        self.count = count
+        self.hits = hits
+
+    def get_document_count(self):
+        return self.count
+
+    def search(self, search_text, top):
+        return [{"id": "1"}] if self.hits else []
+
+
+class FakeIndexClient:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_index(self, name):
+        self.deleted.append(name)
+
+
+class FakeUploader:
+    """builds a generation of `chunks` chunks whose index then reports `count` documents"""
+
+    chunks = 100
+    count = 100
+    index_client = None
+
+    def __init__(self, index_names):
+        self.search_clients = {name: FakeSearchClient(self.count) for name in index_names}
+
+    def process_documents(self, path, tags):
+        return {"chunks_count": self.chunks, "resume": {"failed": 0}}
+
+
+@pytest.fixture
+def pointer(tmp_path, monkeypatch):
+    pointer = IndexPointer(tmp_path / "pointer.json", check_interval=0)
+    monkeypatch.setenv("SEARCH_INDEXES", "travel")
+    monkeypatch.delenv("RETRIEVER_BACKEND", raising=False)
+    monkeypatch.setattr(reindex, "get_index_pointer", lambda: pointer)
+    counter = itertools.count(1)
+    monkeypatch.setattr(reindex, "generation_name", lambda name: f"{name}-g{next(counter)}")
+    # the live generation holds 100 chunks unless a test says otherwise
+    monkeypatch.setattr(reindex, "_document_count", lambda name: 100)
+    index_client = FakeIndexClient()
+    monkeypatch.setattr(FakeUploader, "index_client", index_client)
+    monkeypatch.setattr(reindex, "_index_client", lambda: index_client)
+    monkeypatch.setattr(reindex, "EnhancedDocumentUploader", FakeUploader)
+    return pointer
+
+
+def uploader(count, hits=True):
+    fake = FakeUploader.__new__(FakeUploader)
+    fake.search_clients = {"travel": FakeSearchClient(count, hits)}
+    return fake
+
+
+@pytest.mark.parametrize("summary, count, hits, live, message", [
+    ({"chunks_count": 100, "resume": {"failed": 3}}, 100, True, 100, "3 chunks were not uploaded"),
+    ({"chunks_count": 100}, 80, True, 100, "holds 80 of 100 chunks"),
+    ({"chunks_count": 50}, 50, True, 100, "refusing to shrink below 90%"),
+    ({"chunks_count": 100}, 100, False, 100, "Probe query returned nothing"),
+])
+def test_validation_rejects_a_bad_generation(pointer, monkeypatch, summary, count, hits, live, message):
+    monkeypatch.setattr(reindex, "_document_count", lambda name: live)
+    with pytest.raises(ReindexError, match=message):
+        validate_generation(uploader(count, hits), summary, ["hotels in Paris"], settle_timeout=0)
+
+
+def test_validation_accepts_a_settled_generation(pointer):
+    report = validate_generation(uploader(95), {"chunks_count": 95}, ["hotels in Paris"], settle_timeout=0)
+    assert report == {"counts": {"travel": 95}, "live_counts": {"travel": 100}, "probes": 1}
+
+
+def test_failed_rebuild_leaves_the_live_generation_serving(pointer, monkeypatch):
+    monkeypatch.setattr(FakeUploader, "count", 10)
+    with pytest.raises(ReindexError):
+        reindex.rebuild("docs", settle_timeout=0)
+    assert pointer.resolve("travel") == "travel"
+    assert pointer.state("travel")["building"] == "travel-g1"
+
+    # the next attempt resumes into the same generation
+    monkeypatch.setattr(FakeUploader, "count", 100)
+    assert reindex.rebuild("docs", settle_timeout=0)["generations"] == {"travel": "travel-g1"}
+    assert pointer.resolve("travel") == "travel-g1"
+
+
+def test_switch_prunes_old_generations_and_rollback_restores_the_previous(pointer):
+    reindex.rebuild("docs", settle_timeout=0)
+    second = reindex.rebuild("docs", settle_timeout=0)
+    assert pointer.resolve("travel") == "travel-g2"
+    # one previous generation is kept for rollback, older ones are deleted
+    assert second["deleted"] == ["travel"]
+    assert FakeUploader.index_client.deleted == ["travel"]
+
+    assert reindex.rollback() == {"travel": "travel-g1"}
+    assert pointer.resolve("travel") == "travel-g1"
+
+
+def test_discard_drops_the_unfinished_generation(pointer, monkeypatch):
+    monkeypatch.setattr(FakeUploader, "count", 10)
+    with pytest.raises(ReindexError):
+        reindex.rebuild("docs", settle_timeout=0)
+
+    assert reindex.discard() == ["travel-g1"]
+    assert FakeUploader.index_client.deleted == ["travel-g1"]
+    assert pointer.state("travel")["building"] is None
+    assert pointer.resolve("travel") == "travel"
+    assert reindex.discard() == []
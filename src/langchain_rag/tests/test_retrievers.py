@@ -0,0 +1,120 @@
+import time
+from typing import List
+import pytest
+from src.langchain_rag.retrievers import FanOutRetriever, TimedAzureAISearchRetriever, build_odata_filter, merge_results
+from langchain_core.documents import Document
+
+
+class FakeShard(TimedAzureAISearchRetriever):
+    results: List[dict] = []
+    delay: float = 0.0
+    error: bool = False
+
+    def _search(self, query: str) -> List[dict]:
+        time.sleep(self.delay)
+        if self.error:
+            raise Exception("Error in search request: <Response [503]>")
+        return [dict(result) for result in self.results]
+
+
+def shard(name, scores, **kwargs):
+    return FakeShard(
+        service_name="test", index_name=name, api_key="test", top_k=3,
+        results=[{"id": f"{name}-{i}", "content": f"{name} {i}", "@search.score": score} for i, score in enumerate(scores)],
+        **kwargs
+    )
+
+
+def docs(shard_name, scores):
+    return [Document(page_content=f"{shard_name} {i}", metadata={"id": f"{shard_name}-{i}", "@search.score": score})
+            for i, score in enumerate(scores)]
+
+
+def test_merge_ranks_scores_across_shards():
+    merged = merge_results({"eu": docs("eu", [12.0, 11.5]), "asia": docs("asia", [0.4])}, top_k=3)
+    assert [doc.metadata["id"] for doc in merged] == ["eu-0", "eu-1", "asia-0"]
+    assert merged[0].metadata["normalized_score"] == 1.0
+    # a weak hit stays weak even when it is the best its shard has
+    assert merged[2].metadata["normalized_score"] < 0.05
+
+
+def test_merge_keeps_the_best_copy_of_a_duplicate():
+    merged = merge_results({"a": docs("x", [2.0]), "b": docs("x", [4.0])}, top_k=3)
+    assert len(merged) == 1
+    assert merged[0].metadata["shard"] == "b"
+
+
+def test_fan_out_answers_without_failed_or_slow_shards():
+    retriever = FanOutRetriever(
+        shards={
+            "eu": shard("eu", [3.0, 1.0]),
+            "down": shard("down", [9.0], error=True),
+            "slow": shard("slow", [9.0], delay=1.0),
+        },
+        top_k=3,
+        timeout=0.3
+    )
+    start = time.perf_counter()
+    results = retriever.invoke("hotels")
+    assert time.perf_counter() - start < 0.8
+    assert [doc.metadata["id"] for doc in results] == ["eu-0", "eu-1"]
+
+
+def test_search_http_call_has_a_timeout(monkeypatch):
+    calls = []
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"value": [{"content": "Paris", "@search.score": 1.0}]}
+
+    def fake_get(url, headers, timeout):
+        calls.append(timeout)
+        return Response()
+
+    monkeypatch.setattr("src.langchain_rag.retrievers.requests.get", fake_get)
+    retriever = TimedAzureAISearchRetriever(service_name="test", index_name="travel", api_key="test", timeout=1.5)
+    assert retriever.invoke("paris")[0].page_content == "Paris"
+    assert calls == [1.5]
+
+
+@pytest.mark.parametrize("filters, expected", [
+    (None, None),
+    ({}, None),
+    ({"source": None, "tags": [], "title": ""}, None),
+    ({"source": "docs/a.pdf"}, "source eq 'docs/a.pdf'"),
+    ({"source": ["docs/a.pdf", "docs/b.pdf"]}, "search.in(source, 'docs/a.pdf|docs/b.pdf', '|')"),
+    ({"source": ["a|b", "c"]}, "(source eq 'a|b' or source eq 'c')"),
+    ({"title": "L'Hotel"}, "title eq 'L''Hotel'"),
+    ({"source": ["O'Brien.pdf", "x.pdf"]}, "search.in(source, 'O''Brien.pdf|x.pdf', '|')"),
+    ({"tags": "europe"}, "tags/any(t: search.in(t, 'europe', '|'))"),
+    ({"tags": ["europe", "city"]}, "tags/any(t: search.in(t, 'europe|city', '|'))"),
+    ({"tags": ["d'Azur"]}, "tags/any(t: search.in(t, 'd''Azur', '|'))"),
+    ({"page": 3}, "(page eq 3)"),
+    ({"page": [1, "2"]}, "(page eq 1 or page eq 2)"),
+    ({"page": {"gte": 1, "lte": 5}}, "page ge 1 and page le 5"),
+    ({"page": {"gt": 1, "lt": 5}}, "page gt 1 and page lt 5"),
+    ({"ingested_after": "2026-01-02T03:04:05Z"}, "ingested_at ge 2026-01-02T03:04:05Z"),
+    ({"ingested_before": "2026-01-02T03:04:05"}, "ingested_at le 2026-01-02T03:04:05Z"),
+    ({"ingested_after": "2026-01-02T03:04:05+02:00"}, "ingested_at ge 2026-01-02T01:04:05Z"),
+    ({"ingested_after": "2026-01-01T00:00:00Z", "ingested_before": "2026-02-01T00:00:00Z"},
+     "ingested_at ge 2026-01-01T00:00:00Z and ingested_at le 2026-02-01T00:00:00Z"),
+    ({"source": "x.pdf", "page": 2, "tags": ["europe"]},
+     "source eq 'x.pdf' and (page eq 2) and tags/any(t: search.in(t, 'europe', '|'))"),
+])
+def test_build_odata_filter(filters, expected):
+    assert build_odata_filter(filters) == expected
+
+
+@pytest.mark.parametrize("filters", [
+    "source eq 'x'",
+    {"author": "me"},
+    {"page": {"from": 1}},
+    {"page": "first"},
+    {"ingested_after": "yesterday"},
+    {"ingested_before": "2026-13-01"},
+])
+def test_build_odata_filter_rejects_bad_filters(filters):
+    with pytest.raises(ValueError):
+        build_odata_filter(filters)
@@ -0,0 +1,28 @@
+import pytest
+from src.langchain_rag.sharding import IndexPointer
+
+
+def test_pointer_switch_and_rollback(tmp_path):
+    pointer = IndexPointer(tmp_path / "pointer.json", check_interval=0)
+    assert pointer.resolve("travel") == "travel"
+    assert pointer.version() == 0
+
+    pointer.mark_building({"travel": "travel-g1"})
+    # building a generation does not change what is served
+    assert pointer.resolve("travel") == "travel"
+    assert pointer.version() == 0
+
+    assert pointer.switch({"travel": "travel-g1"}) == []
+    assert pointer.resolve("travel") == "travel-g1"
+    assert pointer.state("travel")["building"] is None
+    assert pointer.switch({"travel": "travel-g2"}) == ["travel"]
+    assert pointer.state("travel")["history"] == ["travel-g1"]
+    assert pointer.version() == 2
+
+    # another process sees the switch through the file
+    assert IndexPointer(tmp_path / "pointer.json").resolve("travel") == "travel-g2"
+
+    assert pointer.rollback(["travel"]) == {"travel": "travel-g1"}
+    assert pointer.resolve("travel") == "travel-g1"
+    with pytest.raises(ValueError):
+        pointer.rollback(["travel"])
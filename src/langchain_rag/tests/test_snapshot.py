@@ -0,0 +1,92 @@
+import random
+import pytest
+from src.langchain_rag.snapshot import Snapshot, import_snapshot, write_snapshot
+
+
+def make_chunks(count, dimensions=8, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"chunk-{i}",
+            "content": f"Chunk {i} about Paris hôtels " * rng.randint(1, 20),
+            "title": f"Brochure {i % 3}",
+            "source": f"docs/brochure_{i % 3}.pdf",
+            "file_type": "pdf" if i % 2 else None,
+            "ingested_at": "2026-01-02T03:04:05Z",
+            "page": i % 4 + 1 if i % 5 else None,
+            "chunk_id": i,
+            "tags": ["europe", "city"] if i % 2 else [],
+            "content_vector": [rng.uniform(-1, 1) for _ in range(dimensions)],
+        }
+        for i in range(count)
+    ]
+
+
+def test_snapshot_round_trip(tmp_path):
+    chunks = make_chunks(50)
+    path = tmp_path / "corpus.snap"
+    assert write_snapshot(path, chunks, {"embedding_model": "test"}) == 50
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 50
+        assert snapshot.dimensions == 8
+        assert snapshot.header["metadata"] == {"embedding_model": "test"}
+        for original, restored in zip(chunks, snapshot):
+            vector = restored.pop("content_vector")
+            assert restored == {key: value for key, value in original.items() if key != "content_vector"}
+            # float16 keeps about three significant digits
+            assert vector == pytest.approx(original["content_vector"], abs=1e-3)
+        assert snapshot.row(7, vectors=False)["id"] == "chunk-7"
+        assert [len(batch) for batch in snapshot.batches(20, vectors=False)] == [20, 20, 10]
+        records = [record for batch in snapshot.records(20) for record in batch]
+        assert records[7].to_wire()["content_vector"] == snapshot.row(7)["content_vector"]
+        assert records[7].fields() == snapshot.row(7, vectors=False)
+
+
+def test_snapshot_without_vectors(tmp_path):
+    chunks = make_chunks(3)
+    for chunk in chunks:
+        del chunk["content_vector"]
+    path = tmp_path / "keywords.snap"
+    write_snapshot(path, chunks)
+    with Snapshot(path) as snapshot:
+        assert snapshot.dimensions == 0
+        assert "content_vector" not in snapshot.row(0)
+
+
+def test_mismatched_vector_is_rejected(tmp_path):
+    chunks = make_chunks(2)
+    chunks[1]["content_vector"] = chunks[1]["content_vector"][:4]
+    with pytest.raises(ValueError):
+        write_snapshot(tmp_path / "bad.snap", chunks)
+    assert not (tmp_path / "bad.snap").exists()
+
+
+class RejectingUploader:
+    """accepts every chunk except the ids in `rejected`"""
+
+    backend = "azure"
+    embedding_model = "test"
+
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.received = []
+
+    def create_search_index(self):
+        pass
+
+    def upload_to_azure_search(self, chunks):
+        self.received.extend(chunks)
+        return sum(1 for chunk in chunks if chunk.id not in self.rejected)
+
+
+def test_import_counts_acknowledged_chunks_only(tmp_path):
+    path = tmp_path / "corpus.snap"
+    write_snapshot(path, make_chunks(30), {"embedding_model": "test"})
+
+    uploader = RejectingUploader()
+    assert import_snapshot(path, uploader, batch_size=7, workers=2)["chunks"] == 30
+    assert len(uploader.received) == 30
+
+    with pytest.raises(RuntimeError, match="Only 28 of 30 chunks"):
+        import_snapshot(path, RejectingUploader({"chunk-3", "chunk-20"}), batch_size=7, workers=2)
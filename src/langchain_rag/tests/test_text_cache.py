@@ -0,0 +1,56 @@
+from src.langchain_rag import text_cache
+from src.langchain_rag.text_cache import ExtractedTextCache
+
+PAGES = [{"content": "Grand Hotel, Paris. 120 rooms.", "metadata": {"source": "hotels.pdf", "page": 0}}]
+
+
+def test_entries_round_trip_and_count_hits(tmp_path):
+    cache = ExtractedTextCache(str(tmp_path))
+    file_path = tmp_path / "hotels.txt"
+    file_path.write_text("Grand Hotel", encoding="utf-8")
+    file_hash = cache.file_hash(file_path)
+
+    assert cache.get(file_hash, "PyPDFLoader") is None
+    cache.put(file_hash, "PyPDFLoader", PAGES)
+    assert cache.get(file_hash, "PyPDFLoader") == PAGES
+    assert cache.get(file_hash, "Docx2txtLoader") is None
+
+    summary = cache.summary()
+    assert (summary["hits"], summary["misses"], summary["entries"]) == (1, 2, 1)
+    assert summary["bytes_written"] == summary["bytes"] > 0
+
+
+def test_key_includes_the_installed_loader_version(tmp_path, monkeypatch):
+    cache = ExtractedTextCache(str(tmp_path))
+    cache.put("abc", "PyPDFLoader", PAGES)
+    assert text_cache.LOADERS_VERSION != "unknown"
+
+    with monkeypatch.context() as patch:
+        patch.setattr(text_cache, "LOADERS_VERSION", "0.4.0")
+        assert cache.get("abc", "PyPDFLoader") is None
+    with monkeypatch.context() as patch:
+        patch.setattr(text_cache, "LOADER_VERSION", text_cache.LOADER_VERSION + 1)
+        assert cache.get("abc", "PyPDFLoader") is None
+    assert cache.get("abc", "PyPDFLoader") == PAGES
+
+
+def test_unreadable_entries_are_misses(tmp_path):
+    cache = ExtractedTextCache(str(tmp_path))
+    cache.put("abc", "PyPDFLoader", PAGES)
+    entry = next(tmp_path.glob("*/*.json.gz"))
+    entry.write_bytes(b"not gzip")
+    assert cache.get("abc", "PyPDFLoader") is None
+    assert cache.summary()["misses"] == 1
+
+
+def test_summary_since_a_snapshot_counts_one_run(tmp_path):
+    cache = ExtractedTextCache(str(tmp_path))
+    cache.put("abc", "PyPDFLoader", PAGES)
+    cache.get("abc", "PyPDFLoader")
+    cache.get("def", "PyPDFLoader")
+
+    start = cache.counters()
+    cache.get("abc", "PyPDFLoader")
+    run = cache.summary(since=start)
+    assert (run["hits"], run["misses"], run["hit_rate"], run["bytes_written"]) == (1, 0, 1.0, 0)
+    assert cache.summary()["hits"] == 2
@@ -0,0 +1,115 @@
+"""
+Content-addressed cache of extracted document text.
+
+Parsing PDFs/DOCX is the most expensive ingestion step, so the page text and
+metadata a loader produces are stored gzip-compressed on disk, keyed by the
+file's SHA-256, the loader name, LOADER_VERSION and the installed
+langchain_community version. Re-splitting or re-embedding the same files then
+skips parsing entirely, and upgrading the loaders invalidates old entries.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# bump when the way pages are extracted changes, so old entries stop matching
+LOADER_VERSION = 1
+
+
+def _loaders_version() -> str:
+    """the installed langchain_community version: its loaders do the parsing"""
+    try:
+        return metadata.version("langchain-community")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+LOADERS_VERSION = _loaders_version()
+
+
+class ExtractedTextCache:
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = Path(cache_dir or os.getenv("TEXT_CACHE_DIR", ".cache/extracted_text"))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_written = 0
+
+    @staticmethod
+    def file_hash(file_path) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, file_hash: str, loader_name: str) -> Path:
+        key = hashlib.sha256(f"{file_hash}:{loader_name}:{LOADER_VERSION}:{LOADERS_VERSION}".encode()).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def get(self, file_hash: str, loader_name: str) -> Optional[List[Dict[str, Any]]]:
+        path = self._entry_path(file_hash, loader_name)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                pages = json.load(f)
+        except FileNotFoundError:
+            pages = None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable text cache entry {path.name}: {e}")
+            pages = None
+
+        with self._lock:
+            if pages is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return pages
+
+    def put(self, file_hash: str, loader_name: str, pages: List[Dict[str, Any]]):
+        path = self._entry_path(file_hash, loader_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        payload = json.dumps(pages, ensure_ascii=False, separators=(",", ":"), default=str)
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.bytes_written += path.stat().st_size
+
+    def size(self) -> Dict[str, int]:
+        entries, total_bytes = 0, 0
+        for path in self.cache_dir.glob("*/*.json.gz"):
+            entries += 1
+            total_bytes += path.stat().st_size
+        return {"entries": entries, "bytes": total_bytes}
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes_written": self.bytes_written}
+
+    def summary(self, since: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        counters since the cache was created, or since the `counters()` snapshot
+        `since` (the cache outlives a single ingestion run), plus the size on disk
+        """
+        counters = self.counters()
+        if since:
+            counters = {name: value - since.get(name, 0) for name, value in counters.items()}
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "bytes_written": counters["bytes_written"],
+            **self.size(),
+        }
@@ -0,0 +1,335 @@
+"""
+shared gateway for every Azure OpenAI call made by the scripts in this repo.
+
+it owns one pooled sync client and one pooled async client, retries transient
+failures with exponential backoff, and keeps an optional on-disk response cache
+for deterministic calls keyed by (model, messages, parameters). every call is
+reported to the gateway's meter (tokens, latency, cache status). the gateway does
+not depend on any metering package: scripts pass one in, e.g.
+`get_gateway(meter=metering.get_meter())`, to meter calls and check the LLM budgets.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+import openai
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from openai.types.chat import ChatCompletion
+from dotenv import load_dotenv
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+DEFAULT_CACHE_DIR = ".cache/llm"
+
+
+class ResponseCache:
+    """json files on disk, one per request key"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(kind, model, payload):
+        raw = json.dumps([kind, model, payload], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, value):
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class NullMeter:
+    """the default meter: measures nothing"""
+
+    @contextmanager
+    def measure(self, kind, model, enforce=True):
+        yield {"prompt_tokens": 0, "completion_tokens": 0, "cached": False}
+
+
+def is_deterministic(params):
+    return params.get("temperature") == 0 or params.get("seed") is not None
+
+
+class LLMGateway:
+    def __init__(self, api_key=None, api_version=None, azure_endpoint=None,
+                 max_retries=4, backoff_base=0.5, backoff_max=20.0,
+                 max_connections=20, timeout=60.0, cache_dir=None, meter=None):
+        load_dotenv()
+        self.api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        self.api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+        self.azure_endpoint = azure_endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_connections = max_connections
+        self.timeout = timeout
+        # anything with a measure(kind, model, enforce) context manager, like metering.Meter
+        self.meter = meter or NullMeter()
+
+        if cache_dir is None and os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false"):
+            cache_dir = os.getenv("LLM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = AzureOpenAI(
+                        api_key=self.api_key,
+                        api_version=self.api_version,
+                        azure_endpoint=self.azure_endpoint,
+                        max_retries=0,
+                        timeout=self.timeout,
+                        http_client=openai.DefaultHttpxClient(limits=self._limits()),
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = AsyncAzureOpenAI(
+                        api_key=self.api_key,
+                        api_version=self.api_version,
+                        azure_endpoint=self.azure_endpoint,
+                        max_retries=0,
+                        timeout=self.timeout,
+                        http_client=openai.DefaultAsyncHttpxClient(limits=self._limits()),
+                    )
+        return self._async_client
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _call(self, fn, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    async def _acall(self, fn, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+    def _cache_key(self, model, messages, params, cache):
+        use_cache = is_deterministic(params) if cache is None else cache
+        if not use_cache or self.cache is None:
+            return None
+        return ResponseCache.make_key("chat", model, {"messages": messages, **params})
+
+    @staticmethod
+    def _fill_usage(usage, response):
+        if response.usage is not None:
+            usage["prompt_tokens"] = response.usage.prompt_tokens
+            usage["completion_tokens"] = getattr(response.usage, "completion_tokens", 0) or 0
+
+    def _cached_chat(self, key, model):
+        if not key:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        # a cache hit costs nothing, so it is recorded but never blocked by a budget
+        with self.meter.measure("chat", model, enforce=False) as usage:
+            response = ChatCompletion.model_validate(cached)
+            usage["cached"] = True
+            self._fill_usage(usage, response)
+        return response
+
+    def chat(self, model, messages, cache=None, **params):
+        """
+        create a chat completion.
+
+        args:
+            model (str): deployment name
+            messages (list): chat messages
+            cache (bool | None): True/False forces the cache on/off, None caches
+                only deterministic calls (temperature=0 or a fixed seed)
+            **params: any other chat.completions.create argument
+
+        returns:
+            ChatCompletion: the (possibly cached) completion
+        """
+        key = self._cache_key(model, messages, params, cache)
+        cached = self._cached_chat(key, model)
+        if cached is not None:
+            return cached
+
+        with self.meter.measure("chat", model) as usage:
+            response = self._call(self.client.chat.completions.create, model=model, messages=messages, **params)
+            self._fill_usage(usage, response)
+
+        if key:
+            self.cache.put(key, response.model_dump(mode="json"))
+        return response
+
+    async def achat(self, model, messages, cache=None, **params):
+        """async version of chat, sharing the same cache"""
+        key = self._cache_key(model, messages, params, cache)
+        cached = self._cached_chat(key, model)
+        if cached is not None:
+            return cached
+
+        with self.meter.measure("chat", model) as usage:
+            response = await self._acall(
+                self.async_client.chat.completions.create, model=model, messages=messages, **params
+            )
+            self._fill_usage(usage, response)
+
+        if key:
+            self.cache.put(key, response.model_dump(mode="json"))
+        return response
+
+    def stream_chat(self, model, messages, cache=None, **params):
+        """
+        stream a chat completion, yielding content deltas as they arrive.
+
+        a cached completion is replayed as a single delta; a finished stream is
+        stored in the cache like a regular completion.
+        """
+        key = self._cache_key(model, messages, params, cache)
+        cached = self._cached_chat(key, model)
+        if cached is not None:
+            yield cached.choices[0].message.content or ""
+            return
+
+        parts = []
+        finish_reason = None
+        with self.meter.measure("chat", model) as usage:
+            stream = self._call(
+                self.client.chat.completions.create,
+                model=model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **params,
+            )
+            for chunk in stream:
+                if chunk.usage is not None:
+                    self._fill_usage(usage, chunk)
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        if key:
+            self.cache.put(key, {
+                "id": f"cached-{key[:16]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": finish_reason or "stop",
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                }],
+                "usage": {
+                    "prompt_tokens": usage["prompt_tokens"],
+                    "completion_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+                },
+            })
+
+    def embed(self, model, inputs, cache=True):
+        """embed a list of texts; embeddings are deterministic, so cached by default"""
+        vectors = [None] * len(inputs)
+        keys = [None] * len(inputs)
+
+        if cache and self.cache is not None:
+            for i, text in enumerate(inputs):
+                keys[i] = ResponseCache.make_key("embedding", model, text)
+                vectors[i] = self.cache.get(keys[i])
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if len(missing) < len(inputs):
+            with self.meter.measure("embedding", model, enforce=False) as usage:
+                usage["cached"] = True
+        if missing:
+            with self.meter.measure("embedding", model) as usage:
+                response = self._call(
+                    self.client.embeddings.create, model=model, input=[inputs[i] for i in missing]
+                )
+                usage["prompt_tokens"] = response.usage.prompt_tokens if response.usage else 0
+            for i, item in zip(missing, response.data):
+                vectors[i] = item.embedding
+                if keys[i]:
+                    self.cache.put(keys[i], item.embedding)
+        return vectors
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway(meter=None):
+    """
+    process-wide gateway; clients are created on first use, not at import.
+
+    args:
+        meter: when given, replaces the gateway's meter for every later call
+    """
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    if meter is not None:
+        _gateway.meter = meter
+    return _gateway
@@ -0,0 +1,98 @@
+"""
+incremental parser for a streamed JSON document of the form {"<key>": [{...}, {...}]}.
+
+each object in the array is yielded as soon as its closing brace arrives, so the
+caller can use the first item while the model is still generating the rest.
+"""
+import json
+
+
+class JsonArrayStreamParser:
+    def __init__(self, array_key):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._pending_key = None
+        self._array_depth = None
+        self._array_closed = False
+        self._item_start = None
+
+    def feed(self, chunk):
+        """add the next piece of text and return the array items completed by it"""
+        self.text += chunk
+        items = []
+        text = self.text
+
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:pos + 1]
+                continue
+
+            if char in " \t\r\n":
+                continue
+            last_string, self._last_string = self._last_string, None
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":":
+                # a key of the top-level object
+                if self._depth == 1 and last_string is not None:
+                    self._pending_key = json.loads(last_string)
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and not self._array_closed and self._array_depth is None \
+                        and self._depth == 2 and self._pending_key == self.array_key:
+                    self._array_depth = self._depth
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._item_start = pos
+            elif char in "}]":
+                if char == "}" and self._item_start is not None and self._depth == self._array_depth + 1:
+                    items.append(json.loads(text[self._item_start:pos + 1]))
+                    self._item_start = None
+                elif char == "]" and self._depth == self._array_depth:
+                    self._array_depth = None
+                    self._array_closed = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._pending_key = None
+
+        self._pos = len(text)
+        return items
+
+    def close(self):
+        """
+        validate the complete document and return the full array.
+
+        raises:
+            json.JSONDecodeError / KeyError: exactly as a one-shot json.loads(...)[key] would
+        """
+        return json.loads(self.text)[self.array_key]
+
+
+def iter_array_items(chunks, array_key):
+    """yield array items from a stream of text chunks, then validate the whole document"""
+    parser = JsonArrayStreamParser(array_key)
+    yielded = 0
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yielded += 1
+            yield item
+
+    items = parser.close()
+    # anything the incremental scan missed (it should not) still reaches the caller
+    for item in items[yielded:]:
+        yield item
@@ -0,0 +1,91 @@
+"""
+load test for the quiz server: simulates many concurrent players.
+
+each simulated player connects, starts a game, answers every question with a random letter
+after a short think time and records how long the server took to respond.
+
+usage:
+    python -m src.quiz_game.quiz_server --port 8765 &
+    python -m src.quiz_game.load_test --players 2000 --port 8765
+"""
+import math
+import time
+import random
+import asyncio
+import argparse
+from src.quiz_game.question_bank import OPTION_LETTERS
+from src.quiz_game.quiz_server import ANSWER_PROMPT, GAME_OVER, START_PROMPT
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+async def read_until(reader, markers):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        text = line.decode("utf-8", errors="ignore")
+        if text in markers:
+            return text
+
+async def play(host, port, think_time, stats):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await read_until(reader, (START_PROMPT,))
+        writer.write(b"\n")
+        await writer.drain()
+        marker = await read_until(reader, (ANSWER_PROMPT,))
+        stats["first_question"].append(time.perf_counter() - start)
+        while marker == ANSWER_PROMPT:
+            await asyncio.sleep(random.uniform(0, think_time))
+            sent = time.perf_counter()
+            writer.write(f"{random.choice(OPTION_LETTERS)}\n".encode())
+            await writer.drain()
+            marker = await read_until(reader, (ANSWER_PROMPT, GAME_OVER))
+            stats["answers"].append(time.perf_counter() - sent)
+        stats["completed"] += 1
+    finally:
+        writer.close()
+
+async def run_load_test(host, port, players, ramp_up, think_time):
+    stats = {"first_question": [], "answers": [], "completed": 0, "errors": 0}
+
+    async def player(index):
+        await asyncio.sleep(ramp_up * index / max(players, 1))
+        try:
+            await play(host, port, think_time, stats)
+        except (OSError, ConnectionError):
+            stats["errors"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player(i) for i in range(players)))
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+def print_stats(stats, players):
+    print(f"Players: {players}, completed: {stats['completed']}, errors: {stats['errors']}")
+    print(f"Elapsed: {stats['elapsed']:.1f}s, answers: {len(stats['answers'])} "
+          f"({len(stats['answers']) / stats['elapsed']:.0f}/s)")
+    for name in ("first_question", "answers"):
+        values = stats[name]
+        print(f"{name:<15} p50={percentile(values, 50) * 1000:.1f}ms "
+              f"p95={percentile(values, 95) * 1000:.1f}ms p99={percentile(values, 99) * 1000:.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent quiz players")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which players connect")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max seconds a player waits before answering")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_load_test(args.host, args.port, args.players, args.ramp_up, args.think_time))
+    print_stats(stats, args.players)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+persistent, deduplicated bank of validated quiz questions.
+
+games take questions straight from the bank (least-served first) and a
+background thread refills it from the LLM when the number of unserved
+questions drops below the low-water mark, so a game normally starts with no
+LLM call at all.
+"""
+import os
+import re
+import json
+import time
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BANK_PATH = "data/question_bank.sqlite3"
+OPTION_LETTERS = ("A", "B", "C", "D")
+SIMILARITY_THRESHOLD = 0.8
+
+_QUESTION_RE = re.compile(r"^\s*(?:Question\s*:)?\s*(?P<text>.+?)\s*$", re.IGNORECASE)
+_OPTION_RE = re.compile(r"^\s*(?P<letter>[A-D])\s*[).:]\s*(?P<text>.+?)\s*$")
+_ANSWER_RE = re.compile(r"Correct Answer:\s*\(?(?P<letter>[A-D])\b", re.IGNORECASE)
+
+
+def normalize_text(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def similarity(tokens_a, tokens_b):
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def validate_question(question):
+    """
+    check a question dict and return a clean copy.
+
+    raises:
+        ValueError: when the question text, the four options or the answer are missing
+    """
+    if not isinstance(question, dict):
+        raise ValueError("Question must be a JSON object")
+
+    text = str(question.get("question") or "").strip()
+    if not text:
+        raise ValueError("Question text is empty")
+
+    options = question.get("options")
+    if not isinstance(options, dict) or set(options) != set(OPTION_LETTERS):
+        raise ValueError(f"Question needs exactly options A-D: {text}")
+    options = {letter: str(options[letter]).strip() for letter in OPTION_LETTERS}
+    if not all(options.values()):
+        raise ValueError(f"Question has an empty option: {text}")
+
+    correct_answer = str(question.get("correct_answer") or "").strip().upper()
+    if correct_answer not in OPTION_LETTERS:
+        raise ValueError(f"Correct answer must be one of A-D: {text}")
+
+    return {
+        "question": text,
+        "options": options,
+        "correct_answer": correct_answer,
+        "explanation": str(question.get("explanation") or "").strip(),
+    }
+
+
+def parse_text_question(question_text):
+    """parse the plain-text format produced by prompts/best.txt into a question dict"""
+    body, _, answer_part = question_text.partition("Correct Answer:")
+    answer = _ANSWER_RE.search("Correct Answer:" + answer_part)
+
+    text_lines, options = [], {}
+    for line in body.strip().splitlines():
+        option = _OPTION_RE.match(line)
+        if option:
+            options[option.group("letter")] = option.group("text")
+        elif line.strip() and not options:
+            text_lines.append(_QUESTION_RE.match(line).group("text"))
+
+    return validate_question({
+        "question": " ".join(text_lines),
+        "options": options,
+        "correct_answer": answer.group("letter") if answer else "",
+    })
+
+
+def format_text_question(question):
+    """inverse of parse_text_question"""
+    lines = [f"Question: {question['question']}"]
+    lines += [f"{letter}) {question['options'][letter]}" for letter in OPTION_LETTERS]
+    lines.append(f"Correct Answer: {question['correct_answer']}")
+    return "\n".join(lines)
+
+
+class QuestionBank:
+    def __init__(self, path=None, generate=None, low_water=20, refill_batch=10):
+        """
+        args:
+            path (str): sqlite file, defaults to QUESTION_BANK_PATH or data/question_bank.sqlite3
+            generate (callable): generate(count) -> list of question dicts or texts, used to refill
+            low_water (int): refill when fewer unserved questions than this are left
+            refill_batch (int): questions requested per refill
+        """
+        self.path = path or os.getenv("QUESTION_BANK_PATH", DEFAULT_BANK_PATH)
+        self.generate = generate
+        self.low_water = low_water
+        self.refill_batch = refill_batch
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._refill_thread = None
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                normalized TEXT UNIQUE NOT NULL,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                correct_answer TEXT NOT NULL,
+                explanation TEXT NOT NULL DEFAULT '',
+                served_count INTEGER NOT NULL DEFAULT 0,
+                last_served REAL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._tokens = {
+            normalized: frozenset(normalized.split())
+            for (normalized,) in self._conn.execute("SELECT normalized FROM questions")
+        }
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _is_duplicate(self, normalized):
+        if normalized in self._tokens:
+            return True
+        tokens = frozenset(normalized.split())
+        return any(similarity(tokens, existing) >= SIMILARITY_THRESHOLD for existing in self._tokens.values())
+
+    def add(self, questions, served=False):
+        """validate and store new questions, skipping invalid ones and near-duplicates; returns how many were added"""
+        added = 0
+        now = time.time()
+        with self._lock:
+            for item in questions:
+                try:
+                    question = parse_text_question(item) if isinstance(item, str) else validate_question(item)
+                except ValueError:
+                    continue
+                normalized = normalize_text(question["question"])
+                if self._is_duplicate(normalized):
+                    continue
+                self._conn.execute(
+                    "INSERT INTO questions (normalized, question, options, correct_answer, explanation,"
+                    " served_count, last_served, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (normalized, question["question"], json.dumps(question["options"], ensure_ascii=False),
+                     question["correct_answer"], question["explanation"],
+                     int(served), now if served else None, now),
+                )
+                self._tokens[normalized] = frozenset(normalized.split())
+                added += 1
+            self._conn.commit()
+        return added
+
+    def available(self):
+        """number of questions that have never been served"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM questions WHERE served_count = 0").fetchone()[0]
+
+    def take(self, count, refill=True):
+        """
+        serve up to `count` questions, least-served first, and refill in the background if running low.
+
+        a caller that generates its own shortfall live passes refill=False and calls
+        ensure_refill once that is done, so a cold bank does not pay for both at once.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, question, options, correct_answer, explanation FROM questions"
+                " ORDER BY served_count, last_served IS NOT NULL, last_served, RANDOM() LIMIT ?",
+                (count,),
+            ).fetchall()
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE questions SET served_count = served_count + 1, last_served = ? WHERE id = ?",
+                [(now, row[0]) for row in rows],
+            )
+            self._conn.commit()
+
+        if refill:
+            self.ensure_refill()
+        return [
+            {"question": question, "options": json.loads(options),
+             "correct_answer": correct_answer, "explanation": explanation}
+            for _, question, options, correct_answer, explanation in rows
+        ]
+
+    def ensure_refill(self):
+        """start a background refill if the bank is below the low-water mark and none is running"""
+        if self.generate is None or self.available() >= self.low_water:
+            return None
+        with self._lock:
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return self._refill_thread
+            self._refill_thread = threading.Thread(target=self._refill, name="question-bank-refill", daemon=True)
+            self._refill_thread.start()
+            return self._refill_thread
+
+    def _refill(self):
+        # a few rounds at most, so a model that keeps repeating itself can't spin forever
+        for _ in range(3):
+            if self.available() >= self.low_water:
+                return
+            try:
+                added = self.add(self.generate(self.refill_batch))
+            except Exception:
+                logger.exception("Question bank refill failed")
+                return
+            logger.info(f"Question bank refill added {added} questions")
+
+    def wait_for_refill(self, timeout=None):
+        thread = self._refill_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def close(self):
+        self._conn.close()
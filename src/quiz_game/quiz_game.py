@@ -1,53 +1,111 @@
-import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
+from src.quiz_game.question_bank import QuestionBank, format_text_question
 
-load_dotenv()
+PROMPT_FILE = "prompts/best.txt"
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
+@lru_cache(maxsize=None)
+def load_prompt(path=PROMPT_FILE):
+    with open(path, "r") as f:
+        return f.read()
 
 def get_quiz_question():
-    with open("prompts/best.txt", "r") as f:
-        prompt = f.read()
-    
-    response = client.chat.completions.create(
+    prompt = load_prompt()
+
+    response = get_gateway().chat(
         model="gpt-4o",
         messages=[{"role": "user", "content": prompt}],
         max_tokens=500,
         temperature=0.7
     )
-    
+
     return response.choices[0].message.content
 
+def generate_questions(count):
+    return [get_quiz_question() for _ in range(count)]
+
+def parse_question(question_text):
+    """split a generated question into the text shown to the player and the correct letter"""
+    display_text = question_text.split("Correct Answer: ")[0].strip()
+    correct_answer = question_text.split("Correct Answer: ")[-1].strip()
+    return display_text, correct_answer
+
+class QuestionPrefetcher:
+    """
+    generate upcoming questions in the background while the player answers.
+
+    keeps up to `lookahead` questions in flight; taking one immediately starts
+    the next, so after the first question the following one is usually ready.
+    """
+
+    def __init__(self, total, lookahead=2, generate=get_quiz_question):
+        self.remaining = total
+        self.lookahead = lookahead
+        self.generate = generate
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=lookahead, thread_name_prefix="quiz-prefetch")
+        self._fill()
+
+    def _fill(self):
+        while self.remaining > 0 and len(self._pending) < self.lookahead:
+            self._pending.append(self._executor.submit(self.generate))
+            self.remaining -= 1
+
+    def next_question(self):
+        future = self._pending.popleft()
+        self._fill()
+        return future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 def play_quiz():
     score = 0
-    questions = 5 
+    questions = 5
     print("You will be asked", questions, "questions.")
     print("For each question, enter A, B, C, or D as your answer.")
     print("Let's begin!\n")
-    for i in range(questions):
-        print(f"\nQuestion {i+1}:")
-        question_text = get_quiz_question()
-        print(question_text.split("Correct Answer: ")[0].strip())
-        correct_answer = question_text.split("Correct Answer: ")[-1].strip()
-        while True:
-            user_answer = input("\nYour answer (A/B/C/D): ").upper()
-            if user_answer in ['A', 'B', 'C', 'D']:
-                break
-            print("Please enter A, B, C, or D")
-        if user_answer == correct_answer:
-            print("Correct! 🎉")
-            score += 1
-        else:
-            print("Wrong!")
-        print(f"Correct answer: {correct_answer}")
-        print(f"Current score: {score}/{i+1}")
+    bank = QuestionBank(generate=generate_questions)
+    banked = [format_text_question(question) for question in bank.take(questions, refill=False)]
+    if len(banked) == questions:
+        bank.ensure_refill()
+    with QuestionPrefetcher(questions - len(banked)) as prefetcher:
+        for i in range(questions):
+            print(f"\nQuestion {i+1}:")
+            if i < len(banked):
+                question_text = banked[i]
+            else:
+                question_text = prefetcher.next_question()
+                bank.add([question_text], served=True)
+                if i == questions - 1:
+                    # the shortfall is generated; only now refill, so the two don't run at once
+                    bank.ensure_refill()
+            display_text, correct_answer = parse_question(question_text)
+            print(display_text)
+            while True:
+                user_answer = input("\nYour answer (A/B/C/D): ").upper()
+                if user_answer in ['A', 'B', 'C', 'D']:
+                    break
+                print("Please enter A, B, C, or D")
+            if user_answer == correct_answer:
+                print("Correct! 🎉")
+                score += 1
+            else:
+                print("Wrong!")
+            print(f"Correct answer: {correct_answer}")
+            print(f"Current score: {score}/{i+1}")
     print(f"\nGame Over! Your final score: {score}/{questions}")
     print(f"Percentage: {(score/questions)*100:.1f}%")
 
 if __name__ == "__main__":
-    play_quiz() 
\ No newline at end of file
+    get_gateway(meter=get_meter())
+    play_quiz()
\ No newline at end of file
@@ -1,26 +1,25 @@
 import os
 import json
 from typing import Dict, List
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
 from rich.table import Table
 import time
+import queue
+import threading
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
+from src.quiz_game.question_bank import QuestionBank
+from src.quiz_game.json_stream import iter_array_items
 
 
 load_dotenv()
 console = Console()
 
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
-def get_quiz_questions(total_questions = 5):
-    prompt = """Generate a quiz with {total_questions} questions in the following JSON format:
+def build_quiz_prompt(total_questions):
+    return """Generate a quiz with {total_questions} questions in the following JSON format:
 {{
     "questions": [
         {{
@@ -46,25 +45,68 @@ Requirements:
 6. Questions should be diverse and cover different topics
 7. Each question should have a clear and unambiguous correct answer""".format(total_questions=total_questions)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a quiz generator that creates educational questions."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.7,
-            response_format={"type": "json_object"}
-        )
-        
-        questions_data = json.loads(response.choices[0].message.content)
-        return questions_data["questions"]
-        
-    except Exception as e:
-        raise
+def stream_quiz_questions(total_questions = 5):
+    """yield each question as soon as its JSON object is complete in the streamed response"""
+    chunks = get_gateway().stream_chat(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": "You are a quiz generator that creates educational questions."},
+            {"role": "user", "content": build_quiz_prompt(total_questions)}
+        ],
+        max_tokens=2000,
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    )
+    # the whole document is still json.loads-ed and checked for "questions" at the end
+    yield from iter_array_items(chunks, "questions")
+
+def get_quiz_questions(total_questions = 5):
+    return list(stream_quiz_questions(total_questions))
+
+def in_background(items):
+    """consume an iterator on a worker thread so it keeps producing while the player answers"""
+    buffer = queue.Queue()
+    done = object()
+
+    def worker():
+        try:
+            for item in items:
+                buffer.put((item, None))
+        except Exception as e:
+            buffer.put((done, e))
+            return
+        buffer.put((done, None))
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        item, error = buffer.get()
+        if error is not None:
+            raise error
+        if item is done:
+            return
+        yield item
+
+def quiz_question_supply(bank, total_questions):
+    """questions from the bank first, then the shortfall streamed live from the model"""
+    banked = bank.take(total_questions, refill=False)
+    missing = total_questions - len(banked)
+
+    def live_questions():
+        for question in stream_quiz_questions(missing):
+            bank.add([question], served=True)
+            yield question
+        # the shortfall is generated; only now refill, so the two don't run at once
+        bank.ensure_refill()
 
-def display_welcome():
+    if missing > 0:
+        live = in_background(live_questions())
+    else:
+        bank.ensure_refill()
+        live = iter(())
+    yield from banked
+    yield from live
+
+def display_welcome(console=console):
     console.print(Panel.fit(
         "[bold blue]Welcome to the Quiz Game![/bold blue]\n"
         "[yellow]Test your knowledge with our AI-powered questions[/yellow]",
@@ -72,7 +114,7 @@ def display_welcome():
         border_style="blue"
     ))
 
-def display_question(question_number, question):
+def display_question(question_number, question, console=console):
     console.print(Panel(
         f"[bold green]Question {question_number}[/bold green]\n\n{question['question']}",
         title="📝 Question",
@@ -87,7 +129,7 @@ def display_question(question_number, question):
         table.add_row(option, text)
     console.print(table)
 
-def display_score(score, total):
+def display_score(score, total, console=console):
     percentage = (score/total)*100
     console.print(Panel(
         f"[bold yellow]Score: {score}/{total}[/bold yellow]\n"
@@ -96,15 +138,48 @@ def display_score(score, total):
         border_style="yellow"
     ))
 
+def display_answer(question, user_answer, console=console):
+    console.print("\n[bold]Correct Answer:[/bold]")
+    console.print(Panel(
+        f"[bold]{question['correct_answer']}[/bold]\n"
+        f"[italic]{question['explanation']}[/italic]",
+        border_style="blue"
+    ))
+    
+    if user_answer == question['correct_answer']:
+        console.print("[green]Correct! 🎉[/green]")
+    else:
+        console.print("[red]Wrong! 😢[/red]")
+
+def display_final_results(score, questions, console=console):
+    table = Table(title="Final Results")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="magenta")
+    table.add_row("Total Questions", str(questions))
+    table.add_row("Correct Answers", str(score))
+    table.add_row("Percentage", f"{(score/questions)*100:.1f}%")
+    
+    console.print("\n")
+    console.print(table)
+    
+    if score == questions:
+        console.print("[bold green]Perfect Score! You're a genius! 🌟[/bold green]")
+    elif score >= questions * 0.8:
+        console.print("[bold yellow]Great job! You're really smart! 🎯[/bold yellow]")
+    elif score >= questions * 0.6:
+        console.print("[bold blue]Good effort! Keep learning! 📚[/bold blue]")
+    else:
+        console.print("[bold red]Keep practicing! You'll get better! 💪[/bold red]")
+
 def play_quiz():
     score = 0
     questions = 5
     display_welcome()
     
     try:
-        quiz_questions = get_quiz_questions(questions)
+        bank = QuestionBank(generate=get_quiz_questions)
         
-        for i, question in enumerate(quiz_questions, 1):
+        for i, question in enumerate(quiz_question_supply(bank, questions), 1):
             display_question(i, question)
             
             while True:
@@ -117,43 +192,18 @@ def play_quiz():
                     break
                 console.print("[red]Please enter A, B, C, or D[/red]")
             
-            console.print("\n[bold]Correct Answer:[/bold]")
-            console.print(Panel(
-                f"[bold]{question['correct_answer']}[/bold]\n"
-                f"[italic]{question['explanation']}[/italic]",
-                border_style="blue"
-            ))
-            
+            display_answer(question, user_answer)
             if user_answer == question['correct_answer']:
-                console.print("[green]Correct! 🎉[/green]")
                 score += 1
-            else:
-                console.print("[red]Wrong! 😢[/red]")
             
             display_score(score, i)
             time.sleep(1)
         
-        table = Table(title="Final Results")
-        table.add_column("Metric", style="cyan")
-        table.add_column("Value", style="magenta")
-        table.add_row("Total Questions", str(questions))
-        table.add_row("Correct Answers", str(score))
-        table.add_row("Percentage", f"{(score/questions)*100:.1f}%")
-        
-        console.print("\n")
-        console.print(table)
-        
-        if score == questions:
-            console.print("[bold green]Perfect Score! You're a genius! 🌟[/bold green]")
-        elif score >= questions * 0.8:
-            console.print("[bold yellow]Great job! You're really smart! 🎯[/bold yellow]")
-        elif score >= questions * 0.6:
-            console.print("[bold blue]Good effort! Keep learning! 📚[/bold blue]")
-        else:
-            console.print("[bold red]Keep practicing! You'll get better! 💪[/bold red]")
+        display_final_results(score, questions)
             
     except Exception as e:
         console.print("[bold red]An error occurred during the quiz. Please try again later.[/bold red]")
 
 if __name__ == "__main__":
-    play_quiz() 
\ No newline at end of file
+    get_gateway(meter=get_meter())
+    play_quiz()
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""
+asyncio quiz server: thousands of concurrent players in one process.
+
+players connect over TCP (e.g. `nc localhost 8765`) and answer each question
+with A/B/C/D. all sessions share one question supply, backed by the question
+bank and the process-wide LLM gateway, and questions are drawn with the same
+rich panels as the terminal game. a player starts a game with an empty line; a
+dropped player can reconnect and send `RESUME <session id>` instead, until the
+session is evicted.
+
+usage:
+    python -m src.quiz_game.quiz_server --port 8765
+"""
+import io
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+from functools import lru_cache
+from collections import OrderedDict
+from dataclasses import dataclass
+from rich.console import Console
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
+from src.quiz_game.question_bank import QuestionBank, OPTION_LETTERS, validate_question
+from src.quiz_game.quiz_game_enhanced import (
+    get_quiz_questions,
+    display_welcome,
+    display_question,
+    display_answer,
+    display_score,
+    display_final_results,
+)
+
+logger = logging.getLogger(__name__)
+
+START_PROMPT = "Press Enter to start, or send RESUME <session id> to continue a game:\n"
+ANSWER_PROMPT = "Your answer (A/B/C/D):\n"
+GAME_OVER = "Game over, thanks for playing!\n"
+
+def render(display, *args):
+    """run one of the terminal game's display functions and return its output as plain text"""
+    console = Console(file=io.StringIO(), width=72, color_system=None, force_terminal=False, emoji=True)
+    display(*args, console=console)
+    return console.file.getvalue()
+
+@lru_cache(maxsize=4096)
+def score_text(score, answered):
+    return render(display_score, score, answered)
+
+@lru_cache(maxsize=1024)
+def final_text(score, total):
+    return render(display_final_results, score, total) + GAME_OVER
+
+class QuizRound:
+    """one set of questions shared by many sessions; rendered text is cached per round"""
+
+    __slots__ = ("questions", "players", "_rendered")
+
+    def __init__(self, questions):
+        self.questions = tuple(questions)
+        self.players = 0
+        self._rendered = {}
+
+    def question_text(self, index):
+        text = self._rendered.get(index)
+        if text is None:
+            text = self._rendered[index] = render(display_question, index + 1, self.questions[index])
+        return text
+
+    def answer_text(self, index, answer):
+        text = self._rendered.get((index, answer))
+        if text is None:
+            text = self._rendered[(index, answer)] = render(display_answer, self.questions[index], answer)
+        return text
+
+@dataclass(slots=True)
+class QuizSession:
+    session_id: str
+    round: QuizRound
+    position: int = 0
+    score: int = 0
+    last_active: float = 0.0
+
+class SessionStore:
+    """LRU of live sessions, bounded in size and evicted after `idle_ttl` seconds without an answer"""
+
+    def __init__(self, max_sessions=50000, idle_ttl=600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def add(self, session):
+        self._sessions[session.session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def touch(self, session):
+        session.last_active = time.monotonic()
+        self._sessions.move_to_end(session.session_id)
+
+    def remove(self, session_id):
+        self._sessions.pop(session_id, None)
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        # least recently active first, so stop at the first session that is still fresh
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active < self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        return evicted
+
+class QuestionSupply:
+    """hands every new session a shared round, drawing a fresh one every `players_per_round` sessions"""
+
+    def __init__(self, bank, questions_per_game=5, players_per_round=100):
+        self.bank = bank
+        self.questions_per_game = questions_per_game
+        self.players_per_round = players_per_round
+        self._round = None
+        self._lock = asyncio.Lock()
+
+    async def next_round(self):
+        async with self._lock:
+            if self._round is None or self._round.players >= self.players_per_round:
+                self._round = QuizRound(await self._draw())
+            self._round.players += 1
+            return self._round
+
+    async def _draw(self):
+        questions = await asyncio.to_thread(self.bank.take, self.questions_per_game, False)
+        missing = self.questions_per_game - len(questions)
+        if missing > 0:
+            live = []
+            for question in await asyncio.to_thread(get_quiz_questions, missing):
+                try:
+                    live.append(validate_question(question))
+                except ValueError as e:
+                    logger.warning(f"Skipping invalid generated question: {e}")
+            await asyncio.to_thread(self.bank.add, live, True)
+            questions += live
+        # refill only once the shortfall is generated, so a cold bank does not pay for both at once
+        await asyncio.to_thread(self.bank.ensure_refill)
+        if not questions:
+            raise RuntimeError("No valid quiz questions available")
+        return questions
+
+class QuizServer:
+    def __init__(self, supply, store, answer_timeout=300, reap_interval=30):
+        self.supply = supply
+        self.store = store
+        self.answer_timeout = answer_timeout
+        self.reap_interval = reap_interval
+        self.welcome_text = render(display_welcome)
+        self.active_connections = 0
+
+    async def _send(self, writer, text):
+        writer.write(text.encode("utf-8"))
+        await writer.drain()
+
+    async def _read_line(self, reader):
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.answer_timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        return line.decode("utf-8", errors="ignore").strip()
+
+    async def _new_session(self):
+        session = QuizSession(session_id=uuid.uuid4().hex, round=await self.supply.next_round())
+        self.store.add(session)
+        self.store.touch(session)
+        return session
+
+    async def _open_session(self, reader, writer):
+        """the session named by RESUME, or a new one; None when the player left first"""
+        await self._send(writer, self.welcome_text + START_PROMPT)
+        while True:
+            line = await self._read_line(reader)
+            if line is None:
+                return None
+            if not line.upper().startswith("RESUME "):
+                break
+            # looked up before anything is created, so a resume never takes a round slot
+            session = self.store.get(line.split(maxsplit=1)[1].strip())
+            if session is not None:
+                self.store.touch(session)
+                return session
+            await self._send(writer, "Unknown or expired session.\n" + START_PROMPT)
+
+        session = await self._new_session()
+        await self._send(writer, f"Session: {session.session_id}\n")
+        return session
+
+    async def handle(self, reader, writer):
+        self.active_connections += 1
+        try:
+            session = await self._open_session(reader, writer)
+            if session is not None:
+                await self._play(session, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Quiz session failed")
+        finally:
+            self.active_connections -= 1
+            writer.close()
+
+    async def _play(self, session, reader, writer):
+        questions = session.round.questions
+        while session.position < len(questions):
+            await self._send(writer, session.round.question_text(session.position) + ANSWER_PROMPT)
+
+            while True:
+                line = await self._read_line(reader)
+                if line is None:
+                    # disconnected or idle: the session stays resumable until evicted
+                    return
+                answer = line.upper()
+                if answer in OPTION_LETTERS:
+                    break
+                await self._send(writer, "Please enter A, B, C, or D\n" + ANSWER_PROMPT)
+
+            index = session.position
+            if answer == questions[index]["correct_answer"]:
+                session.score += 1
+            session.position += 1
+            self.store.touch(session)
+            await self._send(writer, session.round.answer_text(index, answer) + score_text(session.score, session.position))
+
+        self.store.remove(session.session_id)
+        await self._send(writer, final_text(session.score, len(questions)))
+
+    async def reap_sessions(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            evicted = self.store.evict_idle()
+            if evicted:
+                logger.info(f"Evicted {evicted} idle sessions, {len(self.store)} live")
+
+    async def serve(self, host="0.0.0.0", port=8765, backlog=4096):
+        server = await asyncio.start_server(self.handle, host, port, backlog=backlog)
+        reaper = asyncio.create_task(self.reap_sessions())
+        logger.info(f"Quiz server listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            reaper.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the quiz game to many concurrent players")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--players-per-round", type=int, default=100)
+    parser.add_argument("--max-sessions", type=int, default=50000)
+    parser.add_argument("--idle-ttl", type=int, default=600)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    bank = QuestionBank(generate=get_quiz_questions, low_water=max(20, args.questions * 4))
+    supply = QuestionSupply(bank, args.questions, args.players_per_round)
+    store = SessionStore(args.max_sessions, args.idle_ttl)
+    server = QuizServer(supply, store, answer_timeout=args.idle_ttl)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    get_gateway(meter=get_meter())
+    main()
\ No newline at end of file
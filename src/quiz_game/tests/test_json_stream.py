@@ -0,0 +1,52 @@
+import json
+import pytest
+from src.quiz_game.json_stream import JsonArrayStreamParser, iter_array_items
+
+QUESTIONS = {
+    "meta": {"questions": [{"question": "not this array"}]},
+    "questions": [
+        {"question": "Which brace closes \"}\" an object?", "options": ["A) }", "B) {"], "answer": "A"},
+        {"question": "Escaped \\\\ backslash and a quote \\\" inside", "nested": {"depth": [1, {"x": "]"}]}},
+        {"question": "Last one", "options": []},
+    ],
+}
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_items_split_across_chunks_are_yielded_once_complete(size):
+    text = json.dumps(QUESTIONS)
+    parser = JsonArrayStreamParser("questions")
+    items = []
+    for chunk in chunked(text, size):
+        items += parser.feed(chunk)
+    assert items == QUESTIONS["questions"]
+    assert parser.close() == QUESTIONS["questions"]
+
+
+def test_first_item_arrives_before_the_document_ends():
+    parser = JsonArrayStreamParser("questions")
+    assert parser.feed('{"questions": [{"question": "a {b} [c]"}') == [{"question": "a {b} [c]"}]
+    assert parser.feed(', {"question": "\\"}"') == []
+    assert parser.feed('}]}') == [{"question": '"}'}]
+
+
+def test_iter_array_items_matches_a_one_shot_parse():
+    text = json.dumps(QUESTIONS, indent=2)
+    assert list(iter_array_items(chunked(text, 5), "questions")) == QUESTIONS["questions"]
+
+
+def test_truncated_or_malformed_documents_fail_at_close():
+    parser = JsonArrayStreamParser("questions")
+    assert parser.feed('{"questions": [{"question": "a"}, {"question": "b') == [{"question": "a"}]
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_array_items(['{"questions": [{"question": "a"},', ' oops]}'], "questions"))
+
+    with pytest.raises(KeyError):
+        list(iter_array_items(['{"items": [{"question": "a"}]}'], "questions"))
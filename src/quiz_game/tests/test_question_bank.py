@@ -0,0 +1,106 @@
+import logging
+import pytest
+from src.quiz_game.question_bank import QuestionBank, format_text_question, normalize_text, parse_text_question
+
+
+def question(text, answer="A"):
+    return {
+        "question": text,
+        "options": {"A": "Paris", "B": "Rome", "C": "Oslo", "D": "Lima"},
+        "correct_answer": answer,
+        "explanation": "",
+    }
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuestionBank(path=str(tmp_path / "bank.sqlite3"))
+    yield bank
+    bank.close()
+
+
+def test_duplicates_are_skipped_by_normalized_text_and_similarity(bank):
+    assert normalize_text("What's the capital of France?!") == "what s the capital of france"
+    assert bank.add([question("What is the capital of France?")]) == 1
+
+    # the same text up to case and punctuation
+    assert bank.add([question("what is the CAPITAL of france")]) == 0
+    # 6 of 7 words shared (Jaccard 0.86): a near-duplicate
+    assert bank.add([question("What is the capital city of France?")]) == 0
+    # 5 of 8 words shared (Jaccard 0.62): a different question
+    assert bank.add([question("What is the capital of Norway today?")]) == 1
+    assert len(bank) == 2
+
+
+def test_invalid_questions_are_skipped_and_text_questions_parsed(bank):
+    text = format_text_question(question("Which river flows through Rome?", "B"))
+    assert parse_text_question(text)["correct_answer"] == "B"
+    assert bank.add([text, {"question": "No options"}, {**question("Bad answer"), "correct_answer": "E"}]) == 1
+
+
+def test_take_serves_least_served_questions_first(bank):
+    bank.add([question(f"Question number {word}") for word in ("one", "two", "three")])
+    bank.add([question("An already served question")], served=True)
+
+    first = {q["question"] for q in bank.take(2)}
+    second = {q["question"] for q in bank.take(2)}
+    assert "An already served question" not in first
+    # the remaining unserved question first, then the one served longest ago
+    assert second == {"Question number one", "Question number two", "Question number three"} - first \
+        | {"An already served question"}
+    assert bank.available() == 0
+
+
+def test_refill_errors_are_logged(tmp_path, caplog):
+    def broken(count):
+        raise ConnectionError("model unavailable")
+
+    bank = QuestionBank(path=str(tmp_path / "bank.sqlite3"), generate=broken, low_water=1)
+    with caplog.at_level(logging.ERROR, logger="src.quiz_game.question_bank"):
+        bank.ensure_refill()
+        bank.wait_for_refill(5)
+    assert "Question bank refill failed" in caplog.text
+    assert "model unavailable" in caplog.text
+    bank.close()
+
+
+class RecordingBank(QuestionBank):
+    """a bank whose refill only records when it was asked for"""
+
+    def __init__(self, path, events):
+        super().__init__(path=path, generate=lambda count: [], low_water=10)
+        self.events = events
+
+    def ensure_refill(self):
+        self.events.append("refill")
+
+
+def test_take_can_leave_the_refill_to_the_caller(tmp_path):
+    events = []
+    bank = RecordingBank(str(tmp_path / "bank.sqlite3"), events)
+    bank.take(3, refill=False)
+    assert events == []
+    bank.take(3)
+    assert events == ["refill"]
+    bank.close()
+
+
+def test_a_cold_bank_refills_only_after_the_live_shortfall(tmp_path, monkeypatch):
+    from src.quiz_game import quiz_game_enhanced
+
+    events = []
+
+    def stream(count):
+        for i in range(count):
+            events.append(f"live {i}")
+            yield question(f"Live question number {i}")
+
+    monkeypatch.setattr(quiz_game_enhanced, "stream_quiz_questions", stream)
+    bank = RecordingBank(str(tmp_path / "bank.sqlite3"), events)
+    bank.add([question("A banked question")])
+
+    served = list(quiz_game_enhanced.quiz_question_supply(bank, 3))
+    assert [q["question"] for q in served] == ["A banked question", "Live question number 0", "Live question number 1"]
+    assert events == ["live 0", "live 1", "refill"]
+    assert len(bank) == 3
+    bank.close()
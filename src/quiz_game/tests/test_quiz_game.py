@@ -0,0 +1,51 @@
+import threading
+import time
+from src.quiz_game.quiz_game import QuestionPrefetcher, parse_question
+
+
+class CountingGenerator:
+    def __init__(self, block=False):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+        self.release.wait(2)
+        return f"Question {number}\nCorrect Answer: A"
+
+
+def test_parse_question():
+    assert parse_question("Question: 2+2?\nA) 4\nB) 5\nCorrect Answer: A") == ("Question: 2+2?\nA) 4\nB) 5", "A")
+
+
+def test_prefetcher_keeps_lookahead_questions_in_flight():
+    generate = CountingGenerator(block=True)
+    with QuestionPrefetcher(4, lookahead=2, generate=generate) as prefetcher:
+        time.sleep(0.05)
+        # the first two start straight away, nothing more until one is taken
+        assert generate.calls == 2 and prefetcher.remaining == 2
+        generate.release.set()
+        questions = [prefetcher.next_question()]
+        assert len(prefetcher._pending) == 2 and prefetcher.remaining == 1
+        questions += [prefetcher.next_question() for _ in range(3)]
+    assert sorted(questions) == [f"Question {i}\nCorrect Answer: A" for i in (1, 2, 3, 4)]
+    # never more than the total
+    assert generate.calls == 4 and prefetcher.remaining == 0
+
+
+def test_close_does_not_wait_for_questions_in_flight():
+    generate = CountingGenerator(block=True)
+    prefetcher = QuestionPrefetcher(5, lookahead=2, generate=generate)
+    start = time.perf_counter()
+    prefetcher.close()
+    assert time.perf_counter() - start < 0.5
+    generate.release.set()
+    time.sleep(0.05)
+    # only the questions already in flight were generated, the rest never start
+    assert generate.calls == 2
+    assert prefetcher._executor._shutdown
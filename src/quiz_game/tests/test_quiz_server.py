@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+from src.quiz_game import quiz_server
+from src.quiz_game.question_bank import QuestionBank
+from src.quiz_game.quiz_server import (
+    ANSWER_PROMPT,
+    GAME_OVER,
+    START_PROMPT,
+    QuestionSupply,
+    QuizServer,
+    QuizSession,
+    SessionStore,
+)
+
+
+def question(text, answer="A"):
+    return {
+        "question": text,
+        "options": {"A": "Paris", "B": "Rome", "C": "Oslo", "D": "Lima"},
+        "correct_answer": answer,
+        "explanation": "",
+    }
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuestionBank(path=str(tmp_path / "bank.sqlite3"))
+    bank.add([question("What is the capital of France?"), question("Which river flows through Rome?")])
+    yield bank
+    bank.close()
+
+
+class Player:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def until(self, *markers):
+        lines = []
+        while True:
+            line = (await asyncio.wait_for(self.reader.readline(), 5)).decode("utf-8")
+            lines.append(line)
+            if not line or line in markers:
+                return "".join(lines)
+
+    async def send(self, text):
+        self.writer.write(f"{text}\n".encode("utf-8"))
+        await self.writer.drain()
+
+
+def run_with_server(bank, scenario, players_per_round=100):
+    async def main():
+        server = QuizServer(QuestionSupply(bank, 2, players_per_round), SessionStore())
+        tcp = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = tcp.sockets[0].getsockname()[1]
+
+        async def connect():
+            return Player(*await asyncio.open_connection("127.0.0.1", port))
+
+        async with tcp:
+            return await scenario(server, connect)
+
+    return asyncio.run(main())
+
+
+def test_join_and_answer_every_question(bank):
+    async def scenario(server, connect):
+        player = await connect()
+        assert "Welcome to the Quiz Game" in await player.until(START_PROMPT)
+        await player.send("")
+        first = await player.until(ANSWER_PROMPT)
+        await player.send("x")
+        retry = await player.until(ANSWER_PROMPT)
+        await player.send("a")
+        second = await player.until(ANSWER_PROMPT)
+        await player.send("C")
+        final = await player.until(GAME_OVER)
+        return first, retry, second, final, len(server.store)
+
+    first, retry, second, final, live = run_with_server(bank, scenario)
+    assert "Session: " in first and "Question 1" in first
+    assert "Please enter A, B, C, or D" in retry
+    assert "Correct!" in second and "Question 2" in second
+    assert "Wrong!" in final and "50.0%" in final
+    # a finished game is not resumable
+    assert live == 0
+
+
+def test_resume_continues_the_session_without_taking_a_round_slot(bank):
+    async def scenario(server, connect):
+        player = await connect()
+        await player.until(START_PROMPT)
+        await player.send("")
+        session_id = (await player.until(ANSWER_PROMPT)).split("Session: ")[1].split()[0]
+        await player.send("A")
+        await player.until(ANSWER_PROMPT)
+        player.writer.close()
+
+        rejoined = await connect()
+        await rejoined.until(START_PROMPT)
+        await rejoined.send("RESUME nope")
+        unknown = await rejoined.until(START_PROMPT)
+        await rejoined.send(f"RESUME {session_id}")
+        resumed = await rejoined.until(ANSWER_PROMPT)
+        await rejoined.send("B")
+        final = await rejoined.until(GAME_OVER)
+        return unknown, resumed, final, server.supply._round.players
+
+    unknown, resumed, final, players = run_with_server(bank, scenario)
+    assert "Unknown or expired session." in unknown
+    assert "Question 2" in resumed and "Session: " not in resumed
+    assert "Wrong!" in final and "50.0%" in final
+    assert players == 1
+
+
+def test_live_questions_are_validated_before_they_are_served(bank, monkeypatch):
+    bank.take(2)
+    generated = [question("What is the capital of Norway?", "C"), {"question": "No options"},
+                 {**question("What is 2+2?"), "correct_answer": "E"}]
+    monkeypatch.setattr(quiz_server, "get_quiz_questions", lambda count: generated)
+
+    supply = QuestionSupply(bank, 3)
+    questions = asyncio.run(supply._draw())
+    assert sorted(q["question"] for q in questions[:2]) == ["What is the capital of France?", "Which river flows through Rome?"]
+    assert questions[2:] == [question("What is the capital of Norway?", "C")]
+    assert len(bank) == 3
+
+    monkeypatch.setattr(quiz_server, "get_quiz_questions", lambda count: [{"question": "broken"}])
+    with pytest.raises(RuntimeError):
+        asyncio.run(QuestionSupply(QuestionBank(path=str(bank.path) + ".empty"), 2)._draw())
+
+
+def test_session_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2, idle_ttl=10)
+    sessions = [QuizSession(session_id=str(i), round=None) for i in range(3)]
+    for session in sessions[:2]:
+        store.add(session)
+        store.touch(session)
+    store.get("0")
+    store.add(sessions[2])
+    assert store.get("1") is None
+    assert [store.get(str(i)) is not None for i in (0, 2)] == [True, True]
+
+    sessions[0].last_active, sessions[2].last_active = 100.0, 105.0
+    assert store.evict_idle(now=112.0) == 1
+    assert store.get("0") is None and store.get("2") is sessions[2]
+
+
+def test_draw_refills_the_bank_after_generating_the_shortfall(bank, monkeypatch):
+    events = []
+    monkeypatch.setattr(bank, "ensure_refill", lambda: events.append("refill"))
+
+    def generate(count):
+        events.append(f"live {count}")
+        return [question("What is the capital of Norway?", "C")]
+
+    monkeypatch.setattr(quiz_server, "get_quiz_questions", generate)
+    questions = asyncio.run(QuestionSupply(bank, 3)._draw())
+    assert len(questions) == 3
+    assert events == ["live 1", "refill"]
@@ -0,0 +1,325 @@
+"""
+retrieval benchmark: recall@k and MRR next to latency and prompt size for every
+search mode and top_k, so the retriever used by SimpleTravelRAG is picked on data.
+
+the "bm25" mode runs the in-process keyword index (src/langchain_rag/bm25.py)
+built from the same chunks as the remote index, to compare it with "keyword".
+
+usage:
+    python -m src.rag.benchmark --top-k 1 3 5 10
+    python -m src.rag.benchmark --rescore      # score cached results only
+"""
+import os
+import json
+import math
+import time
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.models import VectorizedQuery
+
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import estimate_tokens, get_meter
+from src.langchain_rag.bm25 import BM25Index
+
+SEARCH_MODES = ("keyword", "vector", "semantic", "hybrid", "bm25")
+DEFAULT_TOP_K = (1, 3, 5, 10)
+QUESTIONS_FILE = Path(__file__).with_name("benchmark_questions.json")
+CACHE_DIR = Path(".cache/rag_benchmark")
+REPORT_FILE = Path("results/retrieval_benchmark.json")
+
+
+class ResultCache:
+    """raw search results on disk, one json file per (index, mode, top_k, query)"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, *key_parts):
+        key = json.dumps(key_parts, ensure_ascii=False)
+        return self.cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, *key_parts):
+        path = self._path(*key_parts)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, value, *key_parts):
+        path = self._path(*key_parts)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def load_questions(path=QUESTIONS_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+
+    for item in questions:
+        if not item.get("question") or not item.get("relevant"):
+            raise ValueError(f"Every benchmark item needs 'question' and 'relevant': {item}")
+    return questions
+
+
+def embed_query(client, cache, embed_model, query):
+    cached = cache.get("embedding", embed_model, query)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    # bypass the gateway cache so the recorded latency is a real round trip
+    vector = client.embed(embed_model, [query], cache=False)[0]
+    result = {
+        "vector": vector,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+    }
+    cache.put(result, "embedding", embed_model, query)
+    return result
+
+
+def run_search(search_client, mode, query, top_k, vector=None, vector_field="content_vector",
+               semantic_config=None, content_key="content"):
+    search_kwargs = {"top": top_k, "select": ["id", "title", content_key]}
+
+    if mode in ("keyword", "semantic", "hybrid"):
+        search_kwargs["search_text"] = query
+    if mode in ("vector", "hybrid"):
+        search_kwargs["vector_queries"] = [
+            VectorizedQuery(vector=vector, k_nearest_neighbors=top_k, fields=vector_field)
+        ]
+    if mode == "semantic":
+        search_kwargs["query_type"] = "semantic"
+        if semantic_config:
+            search_kwargs["semantic_configuration_name"] = semantic_config
+
+    start = time.perf_counter()
+    hits = [
+        {
+            "id": doc.get("id"),
+            "title": doc.get("title"),
+            "score": doc.get("@search.reranker_score") or doc.get("@search.score"),
+            "content": doc.get(content_key) or "",
+        }
+        for doc in search_client.search(**search_kwargs)
+    ]
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    return {"hits": hits, "latency_ms": latency_ms}
+
+
+def load_local_index(search_client, config, cache_dir=CACHE_DIR):
+    """the remote index's chunks in a local BM25 index, built once and kept on disk"""
+    path = Path(cache_dir) / f"bm25_{config['index_name']}.bin"
+    if path.exists():
+        return BM25Index.load(path)
+
+    content_key = config["content_key"]
+    index = BM25Index()
+    index.add(
+        {"id": doc["id"], "title": doc.get("title"), "source": doc.get("source"), "content": doc.get(content_key)}
+        for doc in search_client.search(search_text="*", select=["id", "title", "source", content_key])
+    )
+    index.save(path)
+    return index
+
+
+def run_local_search(index, query, top_k):
+    start = time.perf_counter()
+    hits = [
+        {"id": fields["id"], "title": fields["title"], "score": score, "content": fields["content"] or ""}
+        for score, fields in index.search(query, top_k)
+    ]
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    return {"hits": hits, "latency_ms": latency_ms}
+
+
+def recall_at_k(hit_titles, relevant, k):
+    found = set(hit_titles[:k]) & set(relevant)
+    return len(found) / len(relevant)
+
+
+def reciprocal_rank(hit_titles, relevant):
+    for rank, title in enumerate(hit_titles, 1):
+        if title in relevant:
+            return 1 / rank
+    return 0.0
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def score_run(questions, runs, top_k):
+    recalls, rrs, latencies, prompt_tokens = [], [], [], []
+
+    for item, run in zip(questions, runs):
+        hit_titles = [hit["title"] for hit in run["hits"]]
+        recalls.append(recall_at_k(hit_titles, item["relevant"], top_k))
+        rrs.append(reciprocal_rank(hit_titles[:top_k], item["relevant"]))
+        latencies.append(run["latency_ms"])
+        prompt_tokens.append(sum(estimate_tokens(hit["content"]) for hit in run["hits"][:top_k]))
+
+    n = len(questions)
+    return {
+        "top_k": top_k,
+        "queries": n,
+        "recall_at_k": sum(recalls) / n,
+        "mrr": sum(rrs) / n,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+        "prompt_tokens_mean": sum(prompt_tokens) / n,
+    }
+
+
+def collect_runs(mode, top_k, questions, cache, config, search_client=None, client=None,
+                 rescore=False, local_index=None):
+    runs = []
+    for item in questions:
+        query = item["question"]
+        cached = cache.get(config["index_name"], mode, top_k, query)
+        if cached is not None:
+            runs.append(cached)
+            continue
+        if rescore:
+            raise LookupError(f"No cached {mode}@{top_k} result for: {query}")
+
+        if mode == "bm25":
+            run = run_local_search(local_index, query, top_k)
+            cache.put(run, config["index_name"], mode, top_k, query)
+            runs.append(run)
+            continue
+
+        vector, embed_ms = None, 0.0
+        if mode in ("vector", "hybrid"):
+            embedding = embed_query(client, cache, config["embed_model"], query)
+            vector, embed_ms = embedding["vector"], embedding["latency_ms"]
+
+        run = run_search(
+            search_client, mode, query, top_k,
+            vector=vector,
+            vector_field=config["vector_field"],
+            semantic_config=config["semantic_config"],
+            content_key=config["content_key"],
+        )
+        # the query embedding is part of what a vector search costs per request
+        run["latency_ms"] += embed_ms
+        cache.put(run, config["index_name"], mode, top_k, query)
+        runs.append(run)
+    return runs
+
+
+def recommend(rows, tolerance=0.02):
+    """cheapest configuration whose recall is within `tolerance` of the best one"""
+    scored = [row for row in rows if "error" not in row]
+    if not scored:
+        return None
+    best_recall = max(row["recall_at_k"] for row in scored)
+    candidates = [row for row in scored if row["recall_at_k"] >= best_recall - tolerance]
+    return min(candidates, key=lambda row: (row["latency_p95_ms"], row["prompt_tokens_mean"], -row["mrr"]))
+
+
+def print_report(rows, choice):
+    header = f"{'mode':<10}{'k':>4}{'recall':>9}{'mrr':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'tokens':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        if "error" in row:
+            print(f"{row['mode']:<10}{row['top_k']:>4}  error: {row['error']}")
+            continue
+        print(
+            f"{row['mode']:<10}{row['top_k']:>4}{row['recall_at_k']:>9.3f}{row['mrr']:>7.3f}"
+            f"{row['latency_p50_ms']:>9.1f}{row['latency_p95_ms']:>9.1f}{row['latency_p99_ms']:>9.1f}"
+            f"{row['prompt_tokens_mean']:>9.0f}"
+        )
+    if choice:
+        print(f"\nRecommended retriever: {choice['mode']} with top_k={choice['top_k']}")
+
+
+def save_report(rows, choice, path=REPORT_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"timestamp": datetime.now().isoformat(), "results": rows, "recommended": choice},
+            f, ensure_ascii=False, indent=2,
+        )
+    print(f"Saved to {path}")
+
+
+def run_benchmark(modes, top_ks, questions_path=QUESTIONS_FILE, rescore=False, cache_dir=CACHE_DIR):
+    load_dotenv()
+
+    config = {
+        "index_name": os.getenv("NEW_INDEX_NAME") or os.getenv("INDEX_NAME"),
+        "embed_model": os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002"),
+        "semantic_config": os.getenv("SEMANTIC_CONFIG"),
+        "vector_field": os.getenv("VECTOR_FIELD", "content_vector"),
+        "content_key": os.getenv("CONTENT_KEY", "content"),
+    }
+    questions = load_questions(questions_path)
+    cache = ResultCache(cache_dir)
+
+    search_client, client = None, None
+    if not rescore:
+        search_client = SearchClient(
+            endpoint=os.getenv("SEARCH_ENDPOINT"),
+            index_name=config["index_name"],
+            credential=AzureKeyCredential(os.getenv("SEARCH_KEY")),
+        )
+        client = get_gateway()
+
+    local_index = None
+    if "bm25" in modes and not rescore:
+        local_index = load_local_index(search_client, config, cache_dir)
+
+    rows = []
+    for mode in modes:
+        for top_k in top_ks:
+            print(f"Running {mode} @ top_k={top_k}")
+            try:
+                runs = collect_runs(mode, top_k, questions, cache, config,
+                                    search_client=search_client, client=client, rescore=rescore,
+                                    local_index=local_index)
+            except Exception as e:
+                # one unsupported mode (e.g. no semantic config on the index) must not sink the rest
+                rows.append({"mode": mode, "top_k": top_k, "error": str(e)})
+                continue
+            rows.append({"mode": mode, **score_run(questions, runs, top_k)})
+
+    choice = recommend(rows)
+    print_report(rows, choice)
+    save_report(rows, choice)
+    return rows, choice
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality against latency")
+    parser.add_argument("--modes", nargs="+", choices=SEARCH_MODES, default=list(SEARCH_MODES))
+    parser.add_argument("--top-k", nargs="+", type=int, default=list(DEFAULT_TOP_K))
+    parser.add_argument("--questions", default=str(QUESTIONS_FILE))
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR))
+    parser.add_argument("--rescore", action="store_true",
+                        help="only score cached search results, make no network calls")
+    args = parser.parse_args()
+
+    run_benchmark(args.modes, args.top_k, args.questions, rescore=args.rescore, cache_dir=args.cache_dir)
+
+
+if __name__ == '__main__':
+    get_gateway(meter=get_meter())
+    main()
\ No newline at end of file
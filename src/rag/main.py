@@ -4,9 +4,11 @@ import nbformat
 from nbformat.v4 import new_notebook, new_code_cell, new_output
 from dotenv import load_dotenv
 
-from openai import AzureOpenAI
 from datetime import datetime
 
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
+
 
 
 def create_notebook_with_results(vector_result, semantic_result, query):
@@ -100,7 +102,7 @@ def perform_search(chat_client, query, search_type, search_url, search_key, inde
         if semantic_config:
             rag_params["data_sources"][0]["parameters"]["semantic_configuration"] = semantic_config
 
-    response = chat_client.chat.completions.create(
+    response = chat_client.chat(
         model=chat_model,
         messages=prompt,
         extra_body=rag_params
@@ -139,8 +141,6 @@ def process_query(client, query, search_url, search_key, index_name, embed_model
 def main():
     load_dotenv()
 
-    ai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    ai_key = os.getenv("AZURE_OPENAI_API_KEY")
     chat_model = os.getenv("CHAT_MODEL")
     embed_model = os.getenv("EMBEDDING_MODEL")
     search_url = os.getenv("SEARCH_ENDPOINT")
@@ -148,11 +148,7 @@ def main():
     index_name = os.getenv("INDEX_NAME")
     semantic_cfg = os.getenv("SEMANTIC_CONFIG", "azureml-default")
 
-    client = AzureOpenAI(
-        api_version="2024-12-01-preview",
-        azure_endpoint=ai_endpoint,
-        api_key=ai_key
-    )
+    client = get_gateway()
 
     print("Travel Search Assistant")
     print("Enter your travel questions (type 'quit' to exit):")
@@ -165,4 +161,5 @@ def main():
             process_query(client, query, search_url, search_key, index_name, embed_model, chat_model, semantic_cfg)
 
 if __name__ == '__main__':
-    main()
+    get_gateway(meter=get_meter())
+    main()
\ No newline at end of file
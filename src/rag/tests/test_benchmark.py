@@ -0,0 +1,81 @@
+import pytest
+from src.rag.benchmark import (
+    ResultCache,
+    collect_runs,
+    percentile,
+    recall_at_k,
+    reciprocal_rank,
+    recommend,
+    score_run,
+)
+
+QUESTIONS = [
+    {"question": "Hotels near the Louvre?", "relevant": ["Paris", "Louvre"]},
+    {"question": "Where to eat in Rome?", "relevant": ["Rome"]},
+]
+
+
+def run(titles, latency_ms, content="word " * 8):
+    return {"hits": [{"title": title, "content": content} for title in titles], "latency_ms": latency_ms}
+
+
+def row(mode, top_k, recall, p95, tokens, mrr=0.5):
+    return {"mode": mode, "top_k": top_k, "recall_at_k": recall, "mrr": mrr,
+            "latency_p95_ms": p95, "prompt_tokens_mean": tokens}
+
+
+def test_recall_and_reciprocal_rank():
+    titles = ["London", "Paris", "Rome", "Louvre"]
+    assert recall_at_k(titles, ["Paris", "Louvre"], 1) == 0.0
+    assert recall_at_k(titles, ["Paris", "Louvre"], 2) == 0.5
+    assert recall_at_k(titles, ["Paris", "Louvre"], 4) == 1.0
+    assert reciprocal_rank(titles, ["Rome", "Paris"]) == 0.5
+    assert reciprocal_rank(titles, ["Berlin"]) == 0.0
+
+
+def test_percentile_uses_the_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([40, 10, 30, 20], 50) == 20
+    assert percentile([40, 10, 30, 20], 95) == 40
+    assert percentile([5], 99) == 5
+
+
+def test_score_run_averages_over_questions_and_cuts_at_k():
+    runs = [run(["London", "Paris", "Louvre"], 10.0), run(["Rome", "Paris"], 30.0)]
+
+    at_1 = score_run(QUESTIONS, runs, 1)
+    assert at_1["recall_at_k"] == pytest.approx((0.0 + 1.0) / 2)
+    assert at_1["mrr"] == pytest.approx((0.0 + 1.0) / 2)
+
+    at_3 = score_run(QUESTIONS, runs, 3)
+    assert at_3["recall_at_k"] == pytest.approx((1.0 + 1.0) / 2)
+    assert at_3["mrr"] == pytest.approx((0.5 + 1.0) / 2)
+    assert (at_3["latency_p50_ms"], at_3["latency_p95_ms"]) == (10.0, 30.0)
+    # only the hits that would be put in the prompt are counted
+    assert at_3["prompt_tokens_mean"] == pytest.approx(at_1["prompt_tokens_mean"] * 2.5)
+
+
+def test_recommend_picks_the_cheapest_config_close_to_the_best_recall():
+    rows = [
+        row("hybrid", 10, 0.95, p95=180.0, tokens=2400),
+        row("hybrid", 5, 0.94, p95=150.0, tokens=1200),
+        row("keyword", 5, 0.80, p95=40.0, tokens=1100),
+        row("vector", 5, 0.94, p95=150.0, tokens=1000, mrr=0.4),
+        {"mode": "semantic", "top_k": 5, "error": "no semantic configuration"},
+    ]
+    assert recommend(rows) == rows[3]
+    assert recommend(rows, tolerance=0.2) == rows[2]
+    assert recommend(rows, tolerance=0.0) == rows[0]
+    assert recommend(rows[-1:]) is None
+
+
+def test_rescore_uses_only_cached_runs(tmp_path):
+    cache = ResultCache(tmp_path)
+    config = {"index_name": "travel"}
+    cache.put(run(["Paris"], 12.0), "travel", "keyword", 3, QUESTIONS[0]["question"])
+    cache.put(run(["Rome"], 15.0), "travel", "keyword", 3, QUESTIONS[1]["question"])
+
+    runs = collect_runs("keyword", 3, QUESTIONS, cache, config, rescore=True)
+    assert [r["hits"][0]["title"] for r in runs] == ["Paris", "Rome"]
+    with pytest.raises(LookupError):
+        collect_runs("vector", 3, QUESTIONS, cache, config, rescore=True)
@@ -1,17 +1,9 @@
 import os
-from openai import AzureOpenAI
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
+from src.llm_gateway import get_gateway
+from src.langchain_rag.metering import get_meter
 
 def run_prompt(prompt, model = "gpt-4o"):
-    response = client.chat.completions.create(
+    response = get_gateway().chat(
         model=model,
         messages=[
             {
@@ -54,4 +46,5 @@ def main():
             print(f"Output tokens: {result['output_tokens']}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    get_gateway(meter=get_meter())
+    main()
\ No newline at end of file
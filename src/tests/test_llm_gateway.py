@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from openai.types.chat import ChatCompletion
+from src import llm_gateway
+from src.llm_gateway import LLMGateway, ResponseCache
+from src.langchain_rag.metering import Meter
+
+MESSAGES = [{"role": "user", "content": "What is 2+2?"}]
+
+
+def completion(content):
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15},
+    })
+
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://test"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class FakeCompletions:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.failures:
+            raise self.failures.pop(0)
+        return completion(f"answer {len(self.calls)}")
+
+
+def fake_gateway(tmp_path, failures=(), **kwargs):
+    gateway = LLMGateway(api_key="test", azure_endpoint="https://test", cache_dir=str(tmp_path), **kwargs)
+    completions = FakeCompletions(failures)
+    gateway._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return gateway, completions
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_gateway.time, "sleep", delays.append)
+    return delays
+
+
+def test_transient_errors_are_retried_with_backoff(tmp_path, sleeps):
+    gateway, completions = fake_gateway(tmp_path, failures=[rate_limited("3"), rate_limited()], backoff_base=0.5)
+
+    response = gateway.chat("gpt-4o", MESSAGES, temperature=0.7)
+
+    assert response.choices[0].message.content == "answer 3"
+    # retry-after is honoured, otherwise exponential backoff with jitter
+    assert sleeps[0] == 3.0
+    assert 0.5 <= sleeps[1] <= 1.0
+
+
+def test_retries_give_up_and_other_errors_are_not_retried(tmp_path, sleeps):
+    gateway, completions = fake_gateway(tmp_path, failures=[rate_limited()] * 3, max_retries=2)
+    with pytest.raises(openai.RateLimitError):
+        gateway.chat("gpt-4o", MESSAGES)
+    assert len(completions.calls) == 3
+
+    gateway, completions = fake_gateway(tmp_path, failures=[ValueError("bad request")])
+    with pytest.raises(ValueError):
+        gateway.chat("gpt-4o", MESSAGES)
+    assert len(completions.calls) == 1
+    assert len(sleeps) == 2
+
+
+def test_cache_key_covers_model_messages_and_parameters():
+    key = ResponseCache.make_key("chat", "gpt-4o", {"messages": MESSAGES, "temperature": 0, "max_tokens": 10})
+    assert key == ResponseCache.make_key("chat", "gpt-4o", {"max_tokens": 10, "temperature": 0, "messages": MESSAGES})
+    assert key != ResponseCache.make_key("chat", "gpt-4o-mini", {"messages": MESSAGES, "temperature": 0, "max_tokens": 10})
+    assert key != ResponseCache.make_key("chat", "gpt-4o", {"messages": MESSAGES, "temperature": 0, "max_tokens": 20})
+    assert key != ResponseCache.make_key("embedding", "gpt-4o", {"messages": MESSAGES, "temperature": 0, "max_tokens": 10})
+
+
+def test_deterministic_calls_are_served_from_the_cache(tmp_path):
+    meter = Meter()
+    gateway, completions = fake_gateway(tmp_path, meter=meter)
+
+    first = gateway.chat("gpt-4o", MESSAGES, temperature=0)
+    second = gateway.chat("gpt-4o", MESSAGES, temperature=0)
+    seeded = gateway.chat("gpt-4o", MESSAGES, temperature=0.7, seed=42)
+    gateway.chat("gpt-4o", MESSAGES, temperature=0.7, seed=42)
+
+    assert second.choices[0].message.content == first.choices[0].message.content == "answer 1"
+    assert seeded.choices[0].message.content == "answer 2"
+    assert len(completions.calls) == 2
+    totals = next(iter(meter.summary()["entry_points"].values()))
+    assert (totals["calls"], totals["cached_calls"], totals["prompt_tokens"]) == (4, 2, 48)
+
+
+def test_cache_is_bypassed_for_sampled_or_opted_out_calls(tmp_path, monkeypatch):
+    gateway, completions = fake_gateway(tmp_path)
+    gateway.chat("gpt-4o", MESSAGES, temperature=0.7)
+    gateway.chat("gpt-4o", MESSAGES, temperature=0.7)
+    gateway.chat("gpt-4o", MESSAGES, temperature=0, cache=False)
+    gateway.chat("gpt-4o", MESSAGES, temperature=0, cache=False)
+    assert len(completions.calls) == 4
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setenv("LLM_CACHE", "off")
+    assert LLMGateway(api_key="test", azure_endpoint="https://test").cache is None